@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Pre-rendered Audio Cache
+Content-addressed WAV cache (text + voice + rate -> file) so responses are played
+straight from disk; static prompts are rendered ahead of time and never evicted.
+Responses are spoken sentence by sentence, rendering the next while one plays
+
+Usage:
+    python3 audio_cache.py          # pre-render every static response
+"""
+
+import ast
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import logging
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Set, Tuple
+
+from tts_utils import play_file, speak, synthesize_to_file, tts_manager
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CACHE_DIR = "audio_cache"
+AUDIO_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PINNED_FILE = "pinned.json"
+
+# Responses are rendered and played in chunks of at most a sentence, so the first
+# audio is ready after one short synthesis however long the response is
+SENTENCE_BREAK = re.compile(r'(?<=[.!?;])\s+')
+CLAUSE_BREAK = re.compile(r'(?<=,)\s+')
+MAX_CHUNK_CHARS = 120
+
+# Modules whose constant spoken strings are pre-rendered by the build step
+STATIC_RESPONSE_SOURCES = ["jts_recall_engine.py", "main.py", "main_jts.py"]
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def split_sentences(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Cut text into sentences, splitting long ones at commas ("0.3 mg/kg" stays whole)"""
+    chunks: List[str] = []
+    for sentence in SENTENCE_BREAK.split(_normalize(text)):
+        if len(sentence) <= max_chars:
+            if sentence:
+                chunks.append(sentence)
+            continue
+        current = ''
+        for clause in CLAUSE_BREAK.split(sentence):
+            if current and len(current) + 1 + len(clause) > max_chars:
+                chunks.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}".strip()
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+class AudioCache:
+    """
+    Directory of rendered WAV files named by the hash of (text, voice, rate)
+
+    Files are evicted least-recently-played first once the directory grows past
+    max_bytes, except pinned ones (the pre-rendered static responses). Recency
+    survives restarts through the files' modification times.
+    """
+
+    def __init__(self, directory: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES,
+                 voice: Optional[str] = None, rate: Optional[str] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.voice = voice
+        self.rate = rate
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._pinned: Set[str] = set()
+        pinned_path = os.path.join(directory, PINNED_FILE)
+        if os.path.exists(pinned_path):
+            try:
+                with open(pinned_path, 'r', encoding='utf-8') as f:
+                    self._pinned = set(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable {pinned_path}: {e}")
+
+        # key -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        files = [entry for entry in os.scandir(directory) if entry.name.endswith('.wav')]
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            self._entries[entry.name[:-4]] = entry.stat().st_size
+        self.total_bytes = sum(self._entries.values())
+
+    def key(self, text: str) -> str:
+        """Content address of a rendering: the text plus everything that changes how it sounds"""
+        voice = self.voice or tts_manager.voice_preference
+        material = json.dumps([_normalize(text), voice, self.rate])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.wav')
+
+    def get(self, text: str) -> Optional[str]:
+        """Path of the cached rendering of text, or None"""
+        key = self.key(text)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                os.utime(path)  # Recency for the next run; under the lock so render() can't evict it first
+            except OSError:  # Removed behind our back
+                self.total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return path
+
+    def render(self, text: str, pin: bool = False) -> Optional[str]:
+        """Path of a rendering of text, synthesizing and caching it if needed (None if TTS failed)"""
+        path = self.get(text)
+        key = self.key(text)
+        if path is None:
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp.wav"
+            if not synthesize_to_file(_normalize(text), tmp_path):
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return None
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.total_bytes += os.path.getsize(path) - self._entries.get(key, 0)
+                self._entries[key] = os.path.getsize(path)
+                self._entries.move_to_end(key)
+                self._evict()
+        if pin:
+            with self._lock:
+                self._pinned.add(key)
+        return path
+
+    def _evict(self) -> None:
+        """Drop least recently used, unpinned files until the cache fits (call with the lock held)"""
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            self.total_bytes -= self._entries.pop(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def save_pinned(self) -> None:
+        """Persist which renderings are pinned"""
+        pinned_path = os.path.join(self.directory, PINNED_FILE)
+        with self._lock:
+            pinned = sorted(self._pinned & set(self._entries))
+        tmp_path = pinned_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(pinned, f)
+        os.replace(tmp_path, pinned_path)
+
+    def render_chunks(self, text: str, pin: bool = False) -> bool:
+        """Render every sentence chunk of text (what speak() will play); False if any failed"""
+        return all([self.render(chunk, pin) for chunk in split_sentences(text)])
+
+    def prerender(self, texts: Iterable[str]) -> int:
+        """Render and pin every text; returns how many are available"""
+        rendered = sum(1 for text in dict.fromkeys(texts) if self.render_chunks(text, pin=True))
+        self.save_pinned()
+        return rendered
+
+    def speak(self, text: str, cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Speak text chunk by chunk from the cache, rendering the next chunk while one plays
+
+        Chunks that cannot be rendered are spoken with live TTS. Returns False if
+        playback was stopped by setting cancel (barge-in) or failed.
+        """
+        chunks = split_sentences(text)
+        if not chunks:
+            return True
+        cancel = cancel or threading.Event()
+        rendered: "queue.Queue[Tuple[str, Optional[str]]]" = queue.Queue(maxsize=1)
+
+        def render_ahead():
+            for chunk in chunks:
+                path = None
+                try:
+                    path = self.render(chunk)
+                except Exception as e:
+                    logger.error(f"Rendering '{chunk}' failed: {e}")
+                # Blocks while the previous chunk is still waiting to be played
+                while not cancel.is_set():
+                    try:
+                        rendered.put((chunk, path), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                else:
+                    return
+
+        if len(chunks) > 1:
+            threading.Thread(target=render_ahead, name="tts-render", daemon=True).start()
+        else:
+            rendered.put((chunks[0], self.render(chunks[0])))
+
+        ok = True
+        for _ in chunks:
+            item = None
+            while item is None and not cancel.is_set():
+                try:
+                    item = rendered.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            if item is None:
+                return False
+            chunk, path = item
+            if path and play_file(path, cancel):
+                continue
+            if cancel.is_set():
+                return False
+            ok = speak(chunk) and ok
+        return ok
+
+
+def _constant_strings(node: ast.AST) -> List[str]:
+    """String literals a spoken-text expression can evaluate to"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, ast.IfExp):
+        return _constant_strings(node.body) + _constant_strings(node.orelse)
+    return []
+
+
+def static_responses(sources: Iterable[str] = STATIC_RESPONSE_SOURCES) -> List[str]:
+    """
+    Every constant string the assistants speak
+
+    Collects literal arguments of speak()/speak_response() calls, returned literals
+    and literals assigned to response variables in the given modules, plus the
+    airway decision-tree prompts.
+    """
+    from airway_tree import build_tree
+
+    texts: List[str] = []
+    for source in sources:
+        if not os.path.exists(source):
+            continue
+        with open(source, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=source)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                name = getattr(node.func, 'id', None) or getattr(node.func, 'attr', None)
+                if name in ('speak', '_speak', 'speak_async', 'speak_cached', 'speak_response'):
+                    for arg in node.args:
+                        texts.extend(_constant_strings(arg))
+            elif isinstance(node, ast.Return) and node.value is not None:
+                texts.extend(_constant_strings(node.value))
+            elif isinstance(node, ast.Assign):
+                if any(getattr(target, 'id', '').endswith('response') for target in node.targets):
+                    texts.extend(_constant_strings(node.value))
+
+    stack, seen = [build_tree()], set()
+    while stack:
+        node = stack.pop()
+        if id(node) not in seen:
+            seen.add(id(node))
+            texts.append(node.prompt)
+            stack.extend(node.responses.values())
+
+    # Keep sentences only: skip empty strings and identifiers returned from helpers
+    return [text for text in dict.fromkeys(texts) if ' ' in text.strip() or text.endswith(('.', '!', '?'))]
+
+
+_cache: Optional[AudioCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """Return the process-wide audio cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AudioCache()
+        return _cache
+
+
+def speak_cached(text: str, cancel: Optional[threading.Event] = None) -> bool:
+    """Speak text through the shared audio cache (see AudioCache.speak())"""
+    return get_audio_cache().speak(text, cancel)
+
+
+def main():
+    """Pre-render every static response into the audio cache"""
+    logging.basicConfig(level=logging.INFO)
+    texts = static_responses(sys.argv[1:] or STATIC_RESPONSE_SOURCES)
+    cache = get_audio_cache()
+    print(f"🔊 Pre-rendering {len(texts)} static responses...")
+    rendered = cache.prerender(texts)
+    print(f"✅ {rendered}/{len(texts)} responses in {cache.directory} ({cache.total_bytes / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Persistent Audio Capture
+Keeps one microphone stream open for the life of the program and feeds utterances
+to a single reusable Vosk recognizer, so queries no longer pay for device setup;
+an energy/zero-crossing VAD decides where utterances start and end
+"""
+
+import json
+import queue
+import threading
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyaudio
+from vosk import KaldiRecognizer
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAMES_PER_BUFFER = 2048  # 128 ms per chunk at 16 kHz
+CAPTURE_QUEUE_SECONDS = 30  # Lets recognition fall well behind on a long utterance without losing audio
+MAX_UTTERANCE_SECONDS = 15
+PARTIAL_STABLE_SECONDS = 0.2  # A partial hypothesis unchanged this long is worth acting on
+
+# While our own speech plays it leaks into the microphone: only louder, longer
+# speech than usual counts as the medic talking over it (barge-in)
+BARGE_IN_THRESHOLD = 12.0
+BARGE_IN_MIN_ENERGY = 1000.0 ** 2  # Speaker echo at the mic stays below this; a close-talking medic does not
+BARGE_IN_START_MS = 160
+
+
+def find_best_microphone(pa: pyaudio.PyAudio) -> Optional[int]:
+    """Pick an input device, preferring the built-in microphone"""
+    best_device = None
+
+    for i in range(pa.get_device_count()):
+        info = pa.get_device_info_by_index(i)
+        if info['maxInputChannels'] > 0:  # Has input capability
+            name = info['name'].lower()
+            # Prefer built-in microphone (usually more reliable)
+            if 'imac' in name or 'built-in' in name or 'internal' in name:
+                return i
+            # Fallback to any input device
+            if best_device is None:
+                best_device = i
+
+    return best_device
+
+
+class VoiceActivityDetector:
+    """
+    Frame energy + zero-crossing voice activity detector for 16-bit mono PCM
+
+    Audio is cut into short frames; a frame counts as speech when its energy is
+    well above the adaptive noise floor and its zero-crossing rate is speech-like
+    (hiss and clicks cross zero far more often), unless it is loud enough on its
+    own. An utterance opens after a few consecutive speech frames, carrying a
+    short pre-roll so word onsets are not clipped, and closes after end_silence_ms
+    of trailing non-speech.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_ms: int = 16, threshold: float = 6.0,
+                 min_energy: float = 100.0 ** 2, max_zcr: float = 0.35, start_ms: int = 48,
+                 end_silence_ms: int = 300, preroll_ms: int = 200,
+                 max_utterance_seconds: float = MAX_UTTERANCE_SECONDS):
+        self.frame_length = sample_rate * frame_ms // 1000
+        self.threshold = threshold
+        self.min_energy = min_energy
+        self.max_zcr = max_zcr
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.max_frames = int(max_utterance_seconds * 1000 / frame_ms)
+        self.noise_energy = min_energy  # Adapted on non-speech frames, kept across utterances
+        self._preroll: Deque[bytes] = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self._pending = b''
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the current utterance (the noise floor is kept)"""
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._utterance_frames = 0
+        self._preroll.clear()
+        self._pending = b''
+
+    def _classify(self, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Speech/non-speech decision and energy for each row of int16 samples"""
+        samples = frames.astype(np.float32)
+        energy = np.mean(samples * samples, axis=1)
+        zcr = np.mean(np.signbit(samples[:, 1:]) != np.signbit(samples[:, :-1]), axis=1)
+        threshold = max(self.noise_energy, self.min_energy) * self.threshold
+        return (energy > threshold) & ((zcr < self.max_zcr) | (energy > threshold * 4)), energy
+
+    def process(self, data: bytes) -> Tuple[bytes, bool]:
+        """
+        Feed one chunk of captured audio
+
+        Returns the audio that belongs to the utterance (pre-roll included when one
+        opens) and whether the utterance ended within this chunk; frames after the
+        end are discarded.
+        """
+        data = self._pending + data
+        frame_bytes = self.frame_length * 2
+        usable = len(data) - len(data) % frame_bytes
+        self._pending = data[usable:]
+        if not usable:
+            return b'', False
+
+        frames = np.frombuffer(data[:usable], dtype=np.int16).reshape(-1, self.frame_length)
+        is_speech, energy = self._classify(frames)
+
+        speech: List[bytes] = []
+        for i in range(len(frames)):
+            frame = data[i * frame_bytes:(i + 1) * frame_bytes]
+
+            if not self.in_speech:
+                if is_speech[i]:
+                    self._speech_run += 1
+                else:
+                    self._speech_run = 0
+                    # Track the noise floor: follow drops at once, rises slowly
+                    self.noise_energy = min(energy[i], 0.95 * self.noise_energy + 0.05 * energy[i])
+                self._preroll.append(frame)
+                if self._speech_run >= self.start_frames:
+                    self.in_speech = True
+                    self._silence_run = 0
+                    self._utterance_frames = len(self._preroll)
+                    speech.extend(self._preroll)
+                    self._preroll.clear()
+                continue
+
+            speech.append(frame)
+            self._utterance_frames += 1
+            self._silence_run = 0 if is_speech[i] else self._silence_run + 1
+            if self._silence_run >= self.end_frames or self._utterance_frames >= self.max_frames:
+                self.reset()
+                return b''.join(speech), True
+
+        return b''.join(speech), False
+
+
+class AudioCapture:
+    """
+    Long-lived microphone stream with a capture thread and a reusable recognizer
+
+    The input device is chosen and opened once by start(). The stream runs in
+    callback mode: PortAudio's capture thread hands every chunk to _on_audio(),
+    which pushes it into a bounded queue, so reading the device never waits on
+    recognition; listen() consumes the queue, runs it through the VAD and feeds
+    only the utterance to a recognizer that is Reset() between utterances instead
+    of being recreated.
+
+    If the queue fills up the oldest chunk is dropped. Device overruns (reported in
+    the callback's status flags; the chunk itself is kept) and chunks dropped while
+    listening are counted, see get_stats().
+    """
+
+    def __init__(self, model, sample_rate: int = SAMPLE_RATE, device_index: Optional[int] = None,
+                 frames_per_buffer: int = FRAMES_PER_BUFFER, buffer_seconds: float = CAPTURE_QUEUE_SECONDS,
+                 words: bool = False, vad: Optional[VoiceActivityDetector] = None,
+                 grammar: Optional[List[str]] = None):
+        self.sample_rate = sample_rate
+        self.device_index = device_index
+        self.frames_per_buffer = frames_per_buffer
+        if grammar:
+            # Constrained decoding: only these phrases (plus "[unk]") can be recognized
+            self.recognizer = KaldiRecognizer(model, sample_rate, json.dumps(grammar))
+        else:
+            self.recognizer = KaldiRecognizer(model, sample_rate)
+        if words:
+            self.recognizer.SetWords(True)  # Enable word timing for better accuracy
+        self.vad = vad or VoiceActivityDetector(sample_rate)
+        self.barge_in_vad = VoiceActivityDetector(sample_rate, threshold=BARGE_IN_THRESHOLD,
+                                                  min_energy=BARGE_IN_MIN_ENERGY, start_ms=BARGE_IN_START_MS)
+
+        max_chunks = max(1, int(buffer_seconds * sample_rate / frames_per_buffer))
+        # (chunk, captured while echo_gate() was true)
+        self._queue: "queue.Queue[Tuple[bytes, bool]]" = queue.Queue(maxsize=max_chunks)
+        self._pa: Optional[pyaudio.PyAudio] = None
+        self._stream = None
+        self._capturing = threading.Event()
+        self._listening = threading.Event()
+        # Echo gating, see listen(): echo_gate() is true while we are playing audio,
+        # on_barge_in() is called when the medic speaks over it
+        self.echo_gate: Optional[Callable[[], bool]] = None
+        self.on_barge_in: Optional[Callable[[], None]] = None
+        self.gated_chunks = 0
+
+        self.chunks_captured = 0
+        self.overflows = 0  # Device overruns: the device had more audio than it could hand over
+        self.dropped_chunks = 0  # Queue overflows during listen(): recognition fell too far behind
+        self.max_queued = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._stream is not None
+
+    def start(self) -> None:
+        """Select the microphone and open the input stream (no-op if already running)"""
+        if self._stream is not None:
+            return
+
+        self._pa = pyaudio.PyAudio()
+        if self.device_index is None:
+            self.device_index = find_best_microphone(self._pa)
+            if self.device_index is None:
+                self._pa.terminate()
+                self._pa = None
+                raise RuntimeError("No microphone found!")
+
+        logger.info(f"Using microphone device: {self.device_index}")
+        self._capturing.set()
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._on_audio
+        )
+        self._stream.start_stream()
+
+    def _on_audio(self, data: bytes, frame_count: int, time_info: Dict[str, float], status: int) -> Tuple[None, int]:
+        """Stream callback (PortAudio's capture thread): queue every chunk, counting device overruns"""
+        if status & pyaudio.paInputOverflow:
+            self.overflows += 1
+
+        self.chunks_captured += 1
+        # Judge echo when the audio is captured, not when recognition catches up with it
+        item = (data, self.echo_gate is not None and self.echo_gate())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Keep the newest audio: drop the oldest chunk
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            # Between listen() calls stale audio is discarded anyway; only count real losses
+            if self._listening.is_set():
+                self.dropped_chunks += 1
+            self._queue.put_nowait(item)
+        self.max_queued = max(self.max_queued, self._queue.qsize())
+        return None, pyaudio.paContinue if self._capturing.is_set() else pyaudio.paComplete
+
+    def read_chunk(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """Next captured chunk, or None if none arrived within timeout"""
+        item = self._read(timeout)
+        return item[0] if item else None
+
+    def _read(self, timeout: Optional[float]) -> Optional[Tuple[bytes, bool]]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def flush(self) -> None:
+        """Discard queued audio (e.g. captured while the system was speaking)"""
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Capture counters: chunks read, device overruns, chunks dropped, queue depth, echo-gated chunks"""
+        return {
+            'chunks_captured': self.chunks_captured,
+            'overflows': self.overflows,
+            'dropped_chunks': self.dropped_chunks,
+            'queued': self._queue.qsize(),
+            'max_queued': self.max_queued,
+            'gated_chunks': self.gated_chunks,
+            'queue_capacity': self._queue.maxsize
+        }
+
+    def listen(self, silence_timeout: Optional[float] = None,
+               on_partial: Optional[Callable[[str], None]] = None,
+               partial_stable_seconds: float = PARTIAL_STABLE_SECONDS) -> str:
+        """
+        Recognize the next utterance
+
+        Audio buffered before the call is discarded. Returns the recognized text, or
+        "" if silence_timeout seconds of audio pass without an utterance starting
+        (time spent gated on our own playback does not count).
+        If on_partial is given it is called (on this thread) with the hypothesis so
+        far each time it has stayed unchanged for partial_stable_seconds of speech.
+
+        Audio captured while echo_gate() was true is dropped unless barge_in_vad hears speech
+        over the playback; then on_barge_in() is called and the utterance opens
+        with the audio that triggered it.
+        """
+        self.start()
+        self.flush()
+        self.vad.reset()
+        self.barge_in_vad.reset()
+        self.recognizer.Reset()
+        self._listening.set()
+        try:
+            parts: List[str] = []
+            waited = 0.0
+            hypothesis, stable_for, reported = "", 0.0, False
+            recent: Deque[bytes] = deque(maxlen=max(2, int(0.5 * self.sample_rate / self.frames_per_buffer)))
+            backlog: Deque[bytes] = deque()
+            while True:
+                if backlog:
+                    data = backlog.popleft()
+                else:
+                    item = self._read(timeout=1.0)
+                    if item is None:
+                        continue
+                    data, echo = item
+                    if echo and not self.vad.in_speech:
+                        recent.append(data)
+                        self.barge_in_vad.process(data)
+                        if self.on_barge_in is None or not self.barge_in_vad.in_speech:
+                            self.gated_chunks += 1
+                            continue
+                        logger.info("✋ Barge-in")
+                        self.on_barge_in()
+                        backlog.extend(recent)
+                        recent.clear()
+                        self.barge_in_vad.reset()
+                        continue
+                    if recent:  # Playback ended without a barge-in
+                        recent.clear()
+                        self.barge_in_vad.reset()
+
+                speech, ended = self.vad.process(data)
+                # Kaldi only sees the utterance; it may still finalize segments of it early
+                if speech and self.recognizer.AcceptWaveform(speech):
+                    parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+                elif speech and on_partial is not None:
+                    partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+                    current = ' '.join(part for part in parts + [partial] if part).strip()
+                    if current != hypothesis:
+                        hypothesis, stable_for, reported = current, 0.0, False
+                    else:
+                        stable_for += len(speech) / (2 * self.sample_rate)
+                        if hypothesis and not reported and stable_for >= partial_stable_seconds:
+                            on_partial(hypothesis)
+                            reported = True
+
+                if ended:
+                    parts.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+                    text = ' '.join(part for part in parts if part).strip()
+                    if text:  # Only return if we got actual text
+                        return text
+                    # Noise that looked like speech: keep listening
+                    parts = []
+                    hypothesis, stable_for, reported = "", 0.0, False
+                    self.recognizer.Reset()
+                elif not self.vad.in_speech:
+                    waited += len(data) / (2 * self.sample_rate)
+                    if silence_timeout is not None and waited > silence_timeout:
+                        return ""
+        finally:
+            self._listening.clear()
+
+    def close(self) -> None:
+        """Stop capturing and release the audio device"""
+        self._capturing.clear()
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+        self.flush()
+        if self.overflows or self.dropped_chunks:
+            logger.warning(f"Audio capture lost data: {self.overflows} device overruns, "
+                           f"{self.dropped_chunks} chunks dropped from the queue")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+"""
+Persisted BM25 Index
+Build-time BM25 index for the JTS corpus, written as one compact binary file
+and memory-mapped at startup so the Pi2 never rebuilds it on boot
+
+Usage:
+    python3 bm25_index.py jts_focused_corpus.json
+"""
+
+import abc
+import array
+import heapq
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+import logging
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from corpus_io import corpus_stem, iter_records
+from topk import select_top_k
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'JTSBM25\x00'
+INDEX_VERSION = 3
+# Per-document text digest, used to carry unchanged documents across rebuilds
+DIGEST_SIZE = 16
+
+# magic, version, corpus sha256, num_docs, num_terms, num_postings, term blob length,
+# avgdl, k1, b, epsilon (-1 when IDFs were not floored)
+_HEADER = struct.Struct('<8sI32sIIIIdddd')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase whitespace tokenization used by every BM25 caller in this repo"""
+    return text.lower().split()
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in chunks so large corpora are not held in memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def doc_digest(text: str) -> bytes:
+    """Fingerprint of a document's text, stored in the index for patching"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+def default_index_path(corpus_path: str) -> str:
+    """Index file that sits next to its corpus (jts_focused_corpus.json -> .bm25)"""
+    return corpus_stem(corpus_path) + '.bm25'
+
+
+def _align(f, boundary: int = 8) -> None:
+    """Pad the file so the next array starts on an aligned offset"""
+    pad = -f.tell() % boundary
+    if pad:
+        f.write(b'\x00' * pad)
+
+
+def _settle_top(top: List[Tuple[float, int]], top_scores: Dict[int, float]) -> float:
+    """Refresh lagging entries at the root of a running top-n min-heap; returns the true n-th best score"""
+    while top[0][0] != top_scores[top[0][1]]:
+        doc_id = top[0][1]
+        heapq.heapreplace(top, (top_scores[doc_id], doc_id))
+    return top[0][0]
+
+
+class _PostingsBM25(abc.ABC):
+    """
+    BM25Okapi scoring over a term -> postings (doc_id, tf) index
+
+    Subclasses provide _postings(term) -> (idf, doc_ids, tfs, max_impact) and the
+    precomputed per-document length normalisation in self._norms, so a query only
+    costs the total length of its terms' postings lists. max_impact is the largest
+    tf / (tf + norm) in the postings list, i.e. the term's score upper bound / weight.
+    """
+
+    corpus_size = 0
+    k1 = 1.5
+    b = 0.75
+
+    @abc.abstractmethod
+    def _postings(self, term: str) -> Optional[Tuple[float, Sequence[int], Sequence[int], float]]:
+        """(idf, doc ids, term frequencies, max impact) of a term, or None if it does not occur"""
+
+    def term_postings(self, term: str) -> Tuple[Sequence[int], Sequence[int]]:
+        """(doc ids, term frequencies) of a term; empty if it does not occur"""
+        entry = self._postings(term)
+        return (entry[1], entry[2]) if entry else ((), ())
+
+    @staticmethod
+    def _length_norms(doc_lengths: Sequence[int], avgdl: float, k1: float, b: float) -> array.array:
+        """k1 * (1 - b + b * |d| / avgdl) for every document"""
+        avgdl = avgdl or 1.0
+        return array.array('d', (k1 * (1 - b + b * dl / avgdl) for dl in doc_lengths))
+
+    def get_sparse_scores(self, query_tokens: Sequence[str]) -> Dict[int, float]:
+        """BM25 scores of the documents that contain at least one query term"""
+        scores: Dict[int, float] = {}
+        k1_plus_1 = self.k1 + 1
+        norms = self._norms
+
+        for term, qtf in Counter(query_tokens).items():
+            entry = self._postings(term)
+            if entry is None:
+                continue
+            idf, doc_ids, tfs, _ = entry
+            weight = idf * qtf * k1_plus_1
+            for doc_id, tf in zip(doc_ids, tfs):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * tf / (tf + norms[doc_id])
+
+        return scores
+
+    def get_scores(self, query_tokens: Sequence[str]) -> List[float]:
+        """BM25 score of every document (dense list, same order as the corpus)"""
+        dense = [0.0] * self.corpus_size
+        for doc_id, score in self.get_sparse_scores(query_tokens).items():
+            dense[doc_id] = score
+        return dense
+
+    def _max_score_accumulate(self, query_tokens: Sequence[str], n: int) -> Dict[int, float]:
+        """
+        MaxScore-style early termination
+
+        Terms are visited in decreasing order of their score upper bound. Once the
+        current n-th best partial score reaches the sum of the upper bounds still to
+        come, no unseen document can enter the top n, so the remaining terms only
+        update documents that are already candidates (binary-searching their
+        postings when that is cheaper than a scan). Exact up to ties.
+        """
+        if n <= 0:
+            return self.get_sparse_scores(query_tokens)
+        k1_plus_1 = self.k1 + 1
+        terms = []
+        for term, qtf in Counter(query_tokens).items():
+            entry = self._postings(term)
+            if entry is None:
+                continue
+            idf, doc_ids, tfs, max_impact = entry
+            weight = idf * qtf * k1_plus_1
+            if weight < 0:
+                # Upper bounds only hold for non-negative term weights
+                return self.get_sparse_scores(query_tokens)
+            terms.append((weight * max_impact, weight, doc_ids, tfs))
+        terms.sort(key=lambda t: t[0], reverse=True)
+
+        remaining = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + terms[i][0]
+
+        scores: Dict[int, float] = {}
+        # Running min-heap of the n best (score, doc_id) so far. Scores only grow, so an
+        # entry may lag behind top_scores[doc_id] until _settle_top() refreshes it
+        top: List[Tuple[float, int]] = []
+        top_scores: Dict[int, float] = {}
+        # Lower bound on the n-th best score (the heap root, possibly lagging); a score at or
+        # below it can neither enter the heap nor belong to a document already in it
+        floor = -math.inf
+        pruning = False
+        norms = self._norms
+        for i, (_, weight, doc_ids, tfs) in enumerate(terms):
+            if not pruning and len(top) >= n:
+                # Partial scores only grow and the bound only shrinks: once true, true for every later term
+                pruning = _settle_top(top, top_scores) >= remaining[i]
+            if pruning:
+                if len(scores) < len(doc_ids):
+                    for doc_id in scores:
+                        pos = bisect_left(doc_ids, doc_id)
+                        if pos < len(doc_ids) and doc_ids[pos] == doc_id:
+                            tf = tfs[pos]
+                            scores[doc_id] += weight * tf / (tf + norms[doc_id])
+                else:
+                    for doc_id, tf in zip(doc_ids, tfs):
+                        if doc_id in scores:
+                            scores[doc_id] += weight * tf / (tf + norms[doc_id])
+            else:
+                for doc_id, tf in zip(doc_ids, tfs):
+                    score = scores[doc_id] = scores.get(doc_id, 0.0) + weight * tf / (tf + norms[doc_id])
+                    if score <= floor:
+                        continue
+                    if doc_id in top_scores:
+                        top_scores[doc_id] = score
+                    elif len(top) < n:
+                        heapq.heappush(top, (score, doc_id))
+                        top_scores[doc_id] = score
+                        if len(top) == n:
+                            floor = top[0][0]
+                    else:
+                        if score > _settle_top(top, top_scores):
+                            _, evicted = heapq.heapreplace(top, (score, doc_id))
+                            del top_scores[evicted]
+                            top_scores[doc_id] = score
+                        floor = top[0][0]
+
+        return scores
+
+    def top_n_ids(self, query_tokens: Sequence[str], n: int = 5,
+                  early_termination: bool = False) -> List[Tuple[int, float]]:
+        """Best n (doc_id, score) pairs, highest first; ties go to the lower doc id"""
+        if early_termination:
+            scores = self._max_score_accumulate(query_tokens, n)
+        else:
+            scores = self.get_sparse_scores(query_tokens)
+        return select_top_k(scores.items(), n, key=lambda item: (item[1], -item[0]))
+
+    def get_top_n(self, query_tokens: Sequence[str], documents: Sequence, n: int = 5,
+                  early_termination: bool = False) -> List:
+        """Top n documents containing at least one query term, best first"""
+        return [documents[doc_id] for doc_id, _ in self.top_n_ids(query_tokens, n, early_termination)]
+
+
+class InvertedBM25(_PostingsBM25):
+    """
+    In-memory inverted-index BM25, a drop-in replacement for rank_bm25.BM25Okapi
+
+    IDF follows BM25Okapi (negative IDFs floored to epsilon * average IDF); pass
+    epsilon=None to keep the raw Robertson IDF as SimpleBM25 always has.
+    """
+
+    def __init__(self, corpus: Iterable[Sequence[str]], k1: float = 1.5, b: float = 0.75,
+                 epsilon: Optional[float] = 0.25):
+        postings: Dict[str, Tuple[array.array, array.array]] = {}
+        doc_len = array.array('I')
+        for doc_id, tokens in enumerate(corpus):
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array.array('I'), array.array('I'))
+                entry[0].append(doc_id)
+                entry[1].append(tf)
+        self._init_index(postings, doc_len, k1, b, epsilon)
+
+    @classmethod
+    def from_postings(cls, postings: Dict[str, Tuple[array.array, array.array]], doc_len: array.array,
+                      k1: float = 1.5, b: float = 0.75, epsilon: Optional[float] = 0.25) -> 'InvertedBM25':
+        """Build from ready-made term -> (sorted doc ids, tfs) postings and document lengths"""
+        index = cls.__new__(cls)
+        index._init_index(postings, doc_len, k1, b, epsilon)
+        return index
+
+    def _init_index(self, postings: Dict[str, Tuple[array.array, array.array]], doc_len: array.array,
+                    k1: float, b: float, epsilon: Optional[float]) -> None:
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(doc_len)
+        self.doc_len = doc_len
+        self.avgdl = (sum(self.doc_len) / self.corpus_size) if self.corpus_size else 0.0
+        self._index = postings
+
+        self.idf: Dict[str, float] = {}
+        for term, (doc_ids, _) in postings.items():
+            df = len(doc_ids)
+            self.idf[term] = math.log(self.corpus_size - df + 0.5) - math.log(df + 0.5)
+        if epsilon is not None and self.idf:
+            # fsum is exact, so the floor does not depend on term order (full build vs patch)
+            eps = epsilon * (math.fsum(self.idf.values()) / len(self.idf))
+            for term, idf in self.idf.items():
+                if idf < 0:
+                    self.idf[term] = eps
+
+        self._norms = self._length_norms(self.doc_len, self.avgdl, k1, b)
+        self._max_impact = {
+            term: max(tf / (tf + self._norms[doc_id]) for doc_id, tf in zip(doc_ids, tfs))
+            for term, (doc_ids, tfs) in postings.items()
+        }
+
+    def _postings(self, term: str) -> Optional[Tuple[float, Sequence[int], Sequence[int], float]]:
+        entry = self._index.get(term)
+        if entry is None:
+            return None
+        return self.idf[term], entry[0], entry[1], self._max_impact[term]
+
+    def doc_freq(self, term: str) -> int:
+        """Number of documents containing term"""
+        entry = self._index.get(term)
+        return len(entry[0]) if entry else 0
+
+
+def write_index_file(index: InvertedBM25, index_path: str, corpus_hash: str,
+                     doc_digests: Optional[Sequence[bytes]] = None) -> None:
+    """
+    Write an in-memory index to disk
+
+    Layout (all arrays 8-byte aligned, native little-endian):
+        header, term offsets, term blob (sorted UTF-8), IDF table, max impact table,
+        postings offsets, posting doc ids, posting term frequencies, doc lengths,
+        doc text digests (all zero when not given, so nothing is reused on patch)
+    """
+    if sys.byteorder != 'little' or array.array('I').itemsize != 4:
+        raise RuntimeError("BM25 index format requires a little-endian platform with 32-bit unsigned ints")
+
+    # Terms are sorted by their encoded bytes so lookups can bisect the raw blob
+    encoded_terms = sorted((term.encode('utf-8'), term) for term in index.idf)
+
+    term_offsets = array.array('I', [0])
+    term_blob = bytearray()
+    idf_values = array.array('d')
+    max_impacts = array.array('d')
+    posting_offsets = array.array('I', [0])
+    posting_docs = array.array('I')
+    posting_tfs = array.array('I')
+    for encoded, term in encoded_terms:
+        idf, doc_ids, tfs, max_impact = index._postings(term)
+        term_blob += encoded
+        term_offsets.append(len(term_blob))
+        idf_values.append(idf)
+        max_impacts.append(max_impact)
+        posting_docs.extend(doc_ids)
+        posting_tfs.extend(tfs)
+        posting_offsets.append(len(posting_docs))
+
+    digest_blob = b''.join(doc_digests) if doc_digests is not None else bytes(DIGEST_SIZE * index.corpus_size)
+
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, bytes.fromhex(corpus_hash),
+                             index.corpus_size, len(encoded_terms), len(posting_docs), len(term_blob),
+                             index.avgdl, index.k1, index.b,
+                             index.epsilon if index.epsilon is not None else -1.0))
+        for chunk in (term_offsets.tobytes(), bytes(term_blob), idf_values.tobytes(), max_impacts.tobytes(),
+                      posting_offsets.tobytes(), posting_docs.tobytes(), posting_tfs.tobytes(),
+                      index.doc_len.tobytes(), digest_blob):
+            _align(f)
+            f.write(chunk)
+    os.replace(tmp_path, index_path)
+
+    logger.info(f"BM25 index written to {index_path}: {index.corpus_size} documents, "
+                f"{len(encoded_terms)} terms, {len(posting_docs)} postings")
+
+
+def build_index_file(tokenized_docs: Sequence[Sequence[str]], index_path: str, corpus_hash: str,
+                     k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25) -> None:
+    """Build an index from tokenized documents and write it to disk"""
+    write_index_file(InvertedBM25(tokenized_docs, k1=k1, b=b, epsilon=epsilon), index_path, corpus_hash)
+
+
+class MappedBM25Index(_PostingsBM25):
+    """
+    Read-only BM25 index backed by an mmap of a file written by write_index_file()
+
+    Exposes the same get_scores()/get_top_n() calls as rank_bm25.BM25Okapi, reading
+    postings straight out of the mapped file.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._file = open(index_path, 'rb')
+        self._mm = None
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            if len(self._mm) < _HEADER.size:
+                raise ValueError(f"{index_path} is too short for a BM25 index header")
+            (magic, self.version, corpus_digest, self.corpus_size, self.num_terms,
+             num_postings, blob_len, self.avgdl, self.k1, self.b, self.epsilon) = _HEADER.unpack_from(self._mm, 0)
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"{index_path} is not a BM25 index file")
+            if not 1 <= self.version <= INDEX_VERSION:
+                raise ValueError(f"{index_path} has unsupported BM25 index version {self.version}")
+            self.corpus_hash = corpus_digest.hex()
+
+            # (byte length, memoryview format) of each section, in file order
+            sections = [
+                (4 * (self.num_terms + 1), 'I'),  # term offsets
+                (blob_len, None),  # term blob
+                (8 * self.num_terms, 'd'),  # IDF
+                (8 * self.num_terms, 'd'),  # max impact
+                (4 * (self.num_terms + 1), 'I'),  # posting offsets
+                (4 * num_postings, 'I'),  # posting doc ids
+                (4 * num_postings, 'I'),  # posting term frequencies
+                (4 * self.corpus_size, 'I'),  # doc lengths
+                (DIGEST_SIZE * self.corpus_size if self.version >= 3 else 0, None),  # doc digests
+            ]
+            starts = []
+            offset = _HEADER.size
+            for nbytes, _ in sections:
+                offset += -offset % 8
+                starts.append(offset)
+                offset += nbytes
+            # Checked before any slicing: a truncated file would otherwise map short arrays
+            if offset != len(self._mm):
+                raise ValueError(f"{index_path} is {len(self._mm)} bytes, its header describes {offset}")
+
+            view = memoryview(self._mm)
+            self._views = [view]  # Every export of the map, so close() can release them
+            arrays = []
+            for start, (nbytes, fmt) in zip(starts, sections):
+                section = view[start:start + nbytes]
+                self._views.append(section)
+                if fmt:
+                    section = section.cast(fmt)
+                    self._views.append(section)
+                arrays.append(section)
+
+            (self._term_offsets, self._term_blob, self._idf, self._max_impact, self._posting_offsets,
+             self._posting_docs, self._posting_tfs, self.doc_len, self._doc_digests) = arrays
+            self._term_blob_start = starts[1]
+        except Exception:
+            # Truncated or corrupt file: don't leak the handles on the way to a rebuild
+            self.close()
+            raise
+
+        self._norms = self._length_norms(self.doc_len, self.avgdl, self.k1, self.b)
+
+    def close(self) -> None:
+        """Release the memory map"""
+        for v in getattr(self, '_views', []):
+            v.release()
+        self._views = []
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def doc_digest(self, doc_id: int) -> bytes:
+        """Text digest of a document (see doc_digest())"""
+        return self._doc_digests[doc_id * DIGEST_SIZE:(doc_id + 1) * DIGEST_SIZE].tobytes()
+
+    def _term_at(self, i: int) -> bytes:
+        return self._term_blob[self._term_offsets[i]:self._term_offsets[i + 1]].tobytes()
+
+    def iter_terms(self) -> Iterator[Tuple[str, int]]:
+        """(term, document frequency) for every indexed term, in sorted order"""
+        for i in range(self.num_terms):
+            yield self._term_at(i).decode('utf-8'), self._posting_offsets[i + 1] - self._posting_offsets[i]
+
+    def terms_containing(self, fragment: str) -> List[str]:
+        """Every indexed term that contains fragment, found by scanning the raw term blob"""
+        key = fragment.encode('utf-8')
+        start, end = self._term_blob_start, self._term_blob_start + len(self._term_blob)
+        term_ids = []
+        found = self._mm.find(key, start, end)
+        while found >= 0:
+            # Terms are stored back to back: keep only matches inside a single term
+            pos = found - start
+            term_id = bisect_right(self._term_offsets, pos) - 1
+            if pos + len(key) <= self._term_offsets[term_id + 1] and (not term_ids or term_ids[-1] != term_id):
+                term_ids.append(term_id)
+            found = self._mm.find(key, found + 1, end)
+        return [self._term_at(term_id).decode('utf-8') for term_id in term_ids]
+
+    def _term_id(self, term: str) -> int:
+        """Binary search the sorted term blob; -1 if the term is not in the corpus"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_terms and self._term_at(lo) == key:
+            return lo
+        return -1
+
+    def _postings(self, term: str) -> Optional[Tuple[float, Sequence[int], Sequence[int], float]]:
+        term_id = self._term_id(term)
+        if term_id < 0:
+            return None
+        start, end = self._posting_offsets[term_id], self._posting_offsets[term_id + 1]
+        return (self._idf[term_id], self._posting_docs[start:end], self._posting_tfs[start:end],
+                self._max_impact[term_id])
+
+
+def patch_index(old: MappedBM25Index, texts: Iterable[str]) -> Tuple[InvertedBM25, List[bytes], int]:
+    """
+    Build the index for a new version of a corpus from the index of an old one
+
+    Documents whose text is unchanged keep their postings and lengths from the old
+    index (renumbered to their new position); only added or edited documents are
+    tokenized. IDFs, norms and bounds are recomputed for the new collection, so the
+    result is identical to a full build. Texts are consumed in one streaming pass.
+    Returns (index, document digests, number of reused documents).
+    """
+    old_ids: Dict[bytes, List[int]] = {}
+    for old_id in range(old.corpus_size):
+        old_ids.setdefault(old.doc_digest(old_id), []).append(old_id)
+
+    remap = [-1] * old.corpus_size
+    doc_len = array.array('I')
+    digests: List[bytes] = []
+    added: Dict[str, Tuple[List[int], List[int]]] = {}
+    reused = 0
+    for new_id, text in enumerate(texts):
+        digest = doc_digest(text)
+        digests.append(digest)
+        candidates = old_ids.get(digest)
+        if candidates:
+            old_id = candidates.pop()
+            remap[old_id] = new_id
+            doc_len.append(old.doc_len[old_id])
+            reused += 1
+            continue
+        tokens = tokenize(text)
+        doc_len.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            entry = added.get(term)
+            if entry is None:
+                entry = added[term] = ([], [])
+            entry[0].append(new_id)
+            entry[1].append(tf)
+
+    # Renumber every old posting in one pass, then cut it into per-term lists
+    postings: Dict[str, Tuple[List[int], List[int]]] = {}
+    if reused:
+        offsets = old._posting_offsets.tolist()
+        new_doc_ids = [remap[d] for d in old._posting_docs]
+        old_tfs = old._posting_tfs.tolist()
+        term_blob = old._term_blob.tobytes()
+        term_offsets = old._term_offsets.tolist()
+        for term_id in range(old.num_terms):
+            start, end = offsets[term_id], offsets[term_id + 1]
+            doc_ids, tfs = new_doc_ids[start:end], old_tfs[start:end]
+            if -1 in doc_ids:
+                kept = [i for i, d in enumerate(doc_ids) if d >= 0]
+                if not kept:
+                    continue
+                doc_ids, tfs = [doc_ids[i] for i in kept], [tfs[i] for i in kept]
+            term = term_blob[term_offsets[term_id]:term_offsets[term_id + 1]].decode('utf-8')
+            postings[term] = (doc_ids, tfs)
+
+    for term, (doc_ids, tfs) in added.items():
+        entry = postings.get(term)
+        if entry is None:
+            postings[term] = (doc_ids, tfs)
+        else:
+            entry[0].extend(doc_ids)
+            entry[1].extend(tfs)
+
+    # Renumbering and appended documents can leave a postings list out of order
+    for term, (doc_ids, tfs) in postings.items():
+        if any(doc_ids[i] > doc_ids[i + 1] for i in range(len(doc_ids) - 1)):
+            order = sorted(range(len(doc_ids)), key=doc_ids.__getitem__)
+            doc_ids, tfs = [doc_ids[i] for i in order], [tfs[i] for i in order]
+        postings[term] = (array.array('I', doc_ids), array.array('I', tfs))
+
+    epsilon = old.epsilon if old.epsilon >= 0 else None
+    index = InvertedBM25.from_postings(postings, doc_len, k1=old.k1, b=old.b, epsilon=epsilon)
+    return index, digests, reused
+
+
+def load_or_build_index(corpus_path: str, corpus: Optional[Sequence[Dict]] = None,
+                        index_path: Optional[str] = None, corpus_hash: Optional[str] = None) -> MappedBM25Index:
+    """
+    Map the persisted index for a corpus file, rebuilding it first if it is
+    missing, from an older format, or was built from a different corpus file
+
+    A stale index in the current format is patched rather than rebuilt, so only
+    documents added or changed since it was written are re-tokenized.
+    """
+    index_path = index_path or default_index_path(corpus_path)
+    corpus_hash = corpus_hash or file_sha256(corpus_path)
+
+    stale = None
+    if os.path.exists(index_path):
+        try:
+            index = MappedBM25Index(index_path)
+            if index.version == INDEX_VERSION and index.corpus_hash == corpus_hash:
+                logger.info(f"Mapped BM25 index from {index_path}")
+                return index
+            if index.version == INDEX_VERSION:
+                stale = index
+            else:
+                index.close()
+            logger.info(f"BM25 index {index_path} is stale, rebuilding...")
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable BM25 index {index_path}: {e}")
+
+    # Without an in-memory corpus, stream the file (JSONL is never loaded whole)
+    records = corpus if corpus is not None else iter_records(corpus_path)
+    texts = (entry['text'] for entry in records)
+    if stale is not None:
+        index, digests, reused = patch_index(stale, texts)
+        stale.close()
+        logger.info(f"Patched BM25 index: reused {reused} of {index.corpus_size} documents")
+    else:
+        digests = []
+
+        def tokenized():
+            for text in texts:
+                digests.append(doc_digest(text))
+                yield tokenize(text)
+
+        index = InvertedBM25(tokenized())
+
+    write_index_file(index, index_path, corpus_hash, digests)
+    return MappedBM25Index(index_path)
+
+
+def main():
+    """Build (or refresh) the persisted index for each corpus given on the command line"""
+    logging.basicConfig(level=logging.INFO)
+    corpus_files = sys.argv[1:] or ['jts_focused_corpus.json']
+
+    for corpus_path in corpus_files:
+        if not os.path.exists(corpus_path):
+            print(f"❌ Corpus not found: {corpus_path}")
+            continue
+        with load_or_build_index(corpus_path) as index:
+            print(f"✅ {default_index_path(corpus_path)}: {index.corpus_size} documents, {index.num_terms} terms")
+
+
+if __name__ == "__main__":
+    main()
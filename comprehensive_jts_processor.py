@@ -2,23 +2,55 @@
 """
 Comprehensive JTS Processor for P2 Clinical Assist
 Extracts ALL JTS protocols from the complete library (~100 PDFs)
+
+Usage:
+    python3 comprehensive_jts_processor.py [--workers N]
 """
 
+import argparse
 import json
 import re
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import logging
 import fitz  # PyMuPDF
+from bm25_index import load_or_build_index
+from corpus_io import JSONLWriter, iter_records
+from corpus_store import load_or_build_store
+from pdf_manifest import PDFManifest, config_fingerprint
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Comprehensive corpus, one JSON record per line
+COMPREHENSIVE_CORPUS_FILE = "jts_comprehensive_corpus.jsonl"
+
+# Processor copy used by each extraction worker process (set by _init_worker)
+_worker_processor = None
+
+
+def _init_worker(processor: 'ComprehensiveJTSProcessor') -> None:
+    """Give a worker process its own copy of the processor's configuration"""
+    global _worker_processor
+    _worker_processor = processor
+
+
+def _process_pdf_worker(pdf_file: Path) -> Tuple[str, List[Dict[str, Any]]]:
+    """Extract one PDF's clinical sections in a worker process"""
+    return pdf_file.name, _worker_processor.process_pdf(pdf_file)
+
+
 class ComprehensiveJTSProcessor:
-    def __init__(self, pdf_directory: str = "../jts_pdfs"):
+    def __init__(self, pdf_directory: str = "../jts_pdfs", max_workers: Optional[int] = None,
+                 manifest_path: str = "jts_comprehensive_manifest.json"):
         self.pdf_directory = Path(pdf_directory)
-        self.comprehensive_corpus = []
+        # Extraction processes; None uses every core, 1 extracts in-process
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Per-PDF sections from earlier runs, reused while the PDF is unchanged
+        self.manifest_path = manifest_path
         self.protocol_categories = {
             'airway': ['airway', 'intubation', 'ventilation', 'respiratory'],
             'cardiac': ['cardiac', 'heart', 'ecg', 'defibrillation', 'cpr'],
@@ -40,17 +72,9 @@ class ComprehensiveJTSProcessor:
         }
         
     def extract_text_from_pdf(self, pdf_path: Path) -> str:
-        """Extract text from PDF using PyMuPDF"""
-        try:
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()
-            return text
-        except Exception as e:
-            logger.warning(f"Failed to extract text from {pdf_path}: {e}")
-            return ""
+        """Extract text from PDF using PyMuPDF (errors propagate so a failed PDF is retried next run)"""
+        with fitz.open(pdf_path) as doc:
+            return "".join([page.get_text() for page in doc])
     
     def categorize_protocol(self, filename: str, text: str) -> List[str]:
         """Categorize protocol based on filename and content"""
@@ -220,59 +244,107 @@ class ComprehensiveJTSProcessor:
         
         return score
     
-    def process_all_jts_protocols(self) -> List[Dict[str, Any]]:
-        """Process ALL JTS protocols in the directory"""
+    def process_pdf(self, pdf_file: Path) -> Optional[List[Dict[str, Any]]]:
+        """Extract the clinical sections from one PDF (None if processing failed)"""
+        try:
+            text = self.extract_text_from_pdf(pdf_file)
+            if not text:
+                return []
+            return self.extract_clinical_sections(text, pdf_file.name)
+        except Exception as e:
+            logger.error(f"Error processing {pdf_file.name}: {e}")
+            return None
+    
+    def iter_pdf_sections(self, pdf_files: List[Path]) -> Iterator[Tuple[str, Optional[List[Dict[str, Any]]]]]:
+        """
+        Yield (filename, sections) for each PDF in input order as extraction finishes
+
+        PDFs are extracted in up to max_workers processes; results are still
+        yielded in pdf_files order so the corpus is identical for any worker count.
+        """
+        workers = min(self.max_workers, len(pdf_files))
+        if workers <= 1:
+            for pdf_file in pdf_files:
+                yield pdf_file.name, self.process_pdf(pdf_file)
+            return
+        
+        logger.info(f"Extracting with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            yield from executor.map(_process_pdf_worker, pdf_files)
+    
+    def iter_corpus_sections(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every clinical section of the library, PDF by PDF in filename order
+
+        Unchanged PDFs are replayed from the manifest; new or changed ones are
+        extracted by the worker pool. Only one PDF's sections are held at a time.
+        """
         logger.info(f"Processing JTS protocols from {self.pdf_directory}")
         
         if not self.pdf_directory.exists():
             logger.error(f"PDF directory not found: {self.pdf_directory}")
-            return []
+            return
         
-        # Get all PDF files
-        pdf_files = list(self.pdf_directory.glob("*.pdf"))
+        # Get all PDF files (sorted so the corpus order does not depend on the filesystem)
+        pdf_files = sorted(self.pdf_directory.glob("*.pdf"))
         logger.info(f"Found {len(pdf_files)} PDF files")
         
-        total_sections = 0
+        # Reuse sections of unchanged PDFs; only new or changed PDFs are extracted
+        manifest = PDFManifest(self.manifest_path, config_fingerprint(self.protocol_categories))
+        removed = manifest.prune(pdf_files)
+        if removed:
+            logger.info(f"Dropping {len(removed)} removed PDFs: {', '.join(removed)}")
         
+        changed_files = [pdf_file for pdf_file in pdf_files if not manifest.is_current(pdf_file)]
+        logger.info(f"{len(pdf_files) - len(changed_files)} PDFs unchanged, extracting {len(changed_files)}")
+        
+        # Extraction results arrive in changed_files order, which is a subsequence of pdf_files
+        extracted = self.iter_pdf_sections(changed_files)
+        changed_names = {pdf_file.name for pdf_file in changed_files}
         for pdf_file in pdf_files:
-            try:
-                logger.info(f"Processing {pdf_file.name}")
-                
-                # Extract text
-                text = self.extract_text_from_pdf(pdf_file)
-                if not text:
-                    continue
-                
-                # Extract clinical sections
-                sections = self.extract_clinical_sections(text, pdf_file.name)
-                self.comprehensive_corpus.extend(sections)
-                
-                total_sections += len(sections)
-                logger.info(f"Extracted {len(sections)} clinical sections from {pdf_file.name}")
-                
-            except Exception as e:
-                logger.error(f"Error processing {pdf_file.name}: {e}")
+            if pdf_file.name not in changed_names:
+                yield from manifest.load(pdf_file)
                 continue
+            
+            filename, sections = next(extracted)
+            if sections is None:
+                continue
+            manifest.update(pdf_file, sections)
+            logger.info(f"Extracted {len(sections)} clinical sections from {filename}")
+            yield from sections
         
-        # Sort by priority score
-        self.comprehensive_corpus.sort(key=lambda x: x.get('priority_score', 0), reverse=True)
+        manifest.save()
+    
+    def process_all_jts_protocols(self, output_path: str = COMPREHENSIVE_CORPUS_FILE) -> int:
+        """
+        Process ALL JTS protocols into the JSONL corpus, highest priority_score first; returns the section count
+
+        Sections are streamed to a scratch file as they are extracted, then copied to
+        the corpus in priority order (ties keep extraction order), so only a
+        (priority, offset) pair per section is held in memory.
+        """
+        keys: List[Tuple[float, int]] = []
+        with tempfile.TemporaryFile() as scratch:
+            for section in self.iter_corpus_sections():
+                keys.append((-section.get('priority_score', 0), scratch.tell()))
+                scratch.write(json.dumps(section, ensure_ascii=False).encode('utf-8') + b'\n')
+            
+            # Sort by priority score
+            keys.sort()
+            with JSONLWriter(output_path) as writer:
+                for _, offset in keys:
+                    scratch.seek(offset)
+                    writer.write(json.loads(scratch.readline()))
+            total_sections = writer.count
         
         logger.info(f"Total clinical sections extracted: {total_sections}")
-        return self.comprehensive_corpus
+        logger.info(f"Saved comprehensive corpus to {output_path}")
+        return total_sections
     
-    def save_comprehensive_corpus(self, output_path: str = "jts_comprehensive_corpus.json") -> None:
-        """Save comprehensive corpus to file"""
-        try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(self.comprehensive_corpus, f, indent=2, ensure_ascii=False)
-            logger.info(f"Saved comprehensive corpus to {output_path}")
-        except Exception as e:
-            logger.error(f"Failed to save comprehensive corpus: {e}")
-    
-    def get_corpus_statistics(self) -> Dict[str, Any]:
-        """Get statistics about the comprehensive corpus"""
+    def get_corpus_statistics(self, corpus_path: str = COMPREHENSIVE_CORPUS_FILE) -> Dict[str, Any]:
+        """Get statistics about the comprehensive corpus (read back one entry at a time)"""
         stats = {
-            'total_entries': len(self.comprehensive_corpus),
+            'total_entries': 0,
             'categories': {},
             'protocol_types': {},
             'avg_priority_score': 0.0,
@@ -280,41 +352,46 @@ class ComprehensiveJTSProcessor:
             'procedure_count': 0
         }
         
-        if not self.comprehensive_corpus:
-            return stats
-        
-        # Count categories
-        for entry in self.comprehensive_corpus:
-            categories = entry.get('categories', [])
-            for category in categories:
+        priority_total = 0.0
+        for entry in iter_records(corpus_path):
+            stats['total_entries'] += 1
+            
+            # Count categories
+            for category in entry.get('categories', []):
                 stats['categories'][category] = stats['categories'].get(category, 0) + 1
-        
-        # Count protocol types
-        for entry in self.comprehensive_corpus:
+            
+            # Count protocol types
             protocol_type = entry.get('protocol_type', 'unknown')
             stats['protocol_types'][protocol_type] = stats['protocol_types'].get(protocol_type, 0) + 1
-        
-        # Calculate average priority score
-        priority_scores = [entry.get('priority_score', 0) for entry in self.comprehensive_corpus]
-        stats['avg_priority_score'] = sum(priority_scores) / len(priority_scores)
-        
-        # Count medications and procedures
-        for entry in self.comprehensive_corpus:
+            
+            priority_total += entry.get('priority_score', 0)
+            
+            # Count medications and procedures
             clinical_info = entry.get('clinical_info', {})
             stats['medication_count'] += len(clinical_info.get('medications', []))
             stats['procedure_count'] += len(clinical_info.get('procedures', []))
         
+        # Calculate average priority score
+        if stats['total_entries']:
+            stats['avg_priority_score'] = priority_total / stats['total_entries']
+        
         return stats
 
 def main():
     """Main processing function"""
-    processor = ComprehensiveJTSProcessor()
+    parser = argparse.ArgumentParser(description="Build the comprehensive JTS corpus from the PDF library")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="PDF extraction processes (default: one per core)")
+    args = parser.parse_args()
+    
+    processor = ComprehensiveJTSProcessor(max_workers=args.workers)
     
-    # Process all JTS protocols
-    comprehensive_corpus = processor.process_all_jts_protocols()
+    # Process all JTS protocols, streaming them to the corpus file
+    processor.process_all_jts_protocols()
     
-    # Save comprehensive corpus
-    processor.save_comprehensive_corpus()
+    # Build the corpus store and BM25 index now so the recall engine can map them at boot
+    load_or_build_store(COMPREHENSIVE_CORPUS_FILE).close()
+    load_or_build_index(COMPREHENSIVE_CORPUS_FILE).close()
     
     # Get and display statistics
     stats = processor.get_corpus_statistics()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Shared JTS Corpus Index
+Maps the JTS corpus store and its persisted BM25 index once per process and hands
+the same instance to every component (recall engine, dose extractor, query tools),
+so the corpus is never held in memory more than once on the Pi2
+"""
+
+import os
+import threading
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from bm25_index import MappedBM25Index, file_sha256, load_or_build_index, tokenize
+from corpus_store import CorpusRecord, CorpusStore, load_or_build_store
+
+logger = logging.getLogger(__name__)
+
+# Corpus files in order of preference (comprehensive corpus first)
+DEFAULT_CORPUS_FILES = [
+    "jts_comprehensive_corpus.jsonl",
+    "jts_comprehensive_corpus.json",
+    "jts_focused_corpus.json",
+    "jts_rescue_medicine_cleaned.json",
+]
+
+
+def find_default_corpus() -> str:
+    """Return the preferred corpus file that exists on disk"""
+    for corpus_file in DEFAULT_CORPUS_FILES:
+        if os.path.exists(corpus_file):
+            return corpus_file
+    raise FileNotFoundError("No corpus files found! Please run comprehensive_jts_processor.py first.")
+
+
+class CorpusIndex:
+    """A loaded corpus plus its BM25 index, with search/get-doc/iterate access"""
+
+    def __init__(self, corpus_file: str):
+        self.corpus_file = corpus_file
+
+        logger.info(f"Loading JTS corpus from {corpus_file}...")
+        # Both files are keyed on the corpus JSON hash; hash it once for both
+        corpus_hash = file_sha256(corpus_file)
+        self.documents: CorpusStore = load_or_build_store(corpus_file, corpus_hash=corpus_hash)
+        self.bm25: MappedBM25Index = load_or_build_index(corpus_file, self.documents, corpus_hash=corpus_hash)
+        logger.info(f"Corpus index ready: {len(self.documents)} documents")
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __iter__(self) -> Iterator[CorpusRecord]:
+        return iter(self.documents)
+
+    def get_doc(self, doc_id: int) -> CorpusRecord:
+        """Return one corpus entry by position"""
+        return self.documents[doc_id]
+
+    def search_tokens(self, query_tokens: Sequence[str], n: int = 5, early_termination: bool = False) -> List[CorpusRecord]:
+        """Top n corpus entries for already-tokenized query terms"""
+        return self.bm25.get_top_n(query_tokens, self.documents, n=n, early_termination=early_termination)
+
+    def search(self, query: str, n: int = 5, early_termination: bool = False) -> List[CorpusRecord]:
+        """Top n corpus entries for a free-text query"""
+        return self.search_tokens(tokenize(query), n=n, early_termination=early_termination)
+
+    def close(self) -> None:
+        """Release the mapped store and index"""
+        self.bm25.close()
+        self.documents.close()
+
+
+_instances: Dict[str, CorpusIndex] = {}
+_instances_lock = threading.Lock()
+
+
+def get_corpus_index(corpus_file: Optional[str] = None) -> CorpusIndex:
+    """
+    Return the process-wide CorpusIndex for a corpus file, loading it on first use
+
+    Args:
+        corpus_file: Corpus JSON path; defaults to the preferred corpus on disk
+    """
+    corpus_file = corpus_file or find_default_corpus()
+    key = os.path.abspath(corpus_file)
+
+    with _instances_lock:
+        index = _instances.get(key)
+        if index is None:
+            index = _instances[key] = CorpusIndex(corpus_file)
+        return index
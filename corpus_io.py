@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Streaming Corpus I/O
+JSON Lines readers/writers for the corpus processors and indexers: records are
+written one per line as they are produced and read back lazily, optionally
+gzip- or zstd-compressed (chosen by the .gz / .zst file extension)
+"""
+
+import gzip
+import io
+import json
+import os
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+
+def _open_text(path: PathLike, mode: str):
+    """Open a text stream, compressed according to the file extension"""
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required for {path} (pip install zstandard)")
+        raw = open(path, mode + 'b')
+        stream = (zstandard.ZstdCompressor().stream_writer(raw) if mode == 'w'
+                  else zstandard.ZstdDecompressor().stream_reader(raw))
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _strip_compression(path: PathLike) -> str:
+    name = str(path)
+    for suffix in ('.gz', '.zst'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _is_jsonl(path: PathLike) -> bool:
+    return _strip_compression(path).endswith('.jsonl')
+
+
+def corpus_stem(path: PathLike) -> str:
+    """Corpus path without its format/compression extensions, for naming derived files"""
+    return os.path.splitext(_strip_compression(path))[0]
+
+
+class JSONLWriter:
+    """
+    Write records one JSON object per line
+
+    Output goes to a temporary file that replaces the target on a clean close,
+    so readers never see a half-written corpus.
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = str(path)
+        self._tmp_path = _tmp_name(self.path)
+        self._file = _open_text(self._tmp_path, 'w')
+        self.count = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Append one record"""
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write('\n')
+        self.count += 1
+
+    def write_all(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Append every record from an iterable; returns how many were written"""
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def close(self, commit: bool = True) -> None:
+        """Finish the file; with commit=False the partial output is discarded"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if commit:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+def _tmp_name(path: str) -> str:
+    """Temporary name that keeps the compression extension"""
+    head, sep, ext = path.rpartition('.')
+    return f"{head}.tmp.{ext}" if sep else path + '.tmp'
+
+
+def write_jsonl(path: PathLike, records: Iterable[Dict[str, Any]]) -> int:
+    """Stream records to a JSONL file; returns how many were written"""
+    with JSONLWriter(path) as writer:
+        return writer.write_all(records)
+
+
+def iter_jsonl(path: PathLike) -> Iterator[Dict[str, Any]]:
+    """Lazily read records from a JSONL file, one line at a time"""
+    with _open_text(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_records(path: PathLike) -> Iterator[Dict[str, Any]]:
+    """
+    Records of a corpus file in either format
+
+    JSONL files are streamed; legacy .json files (a list of records) still have
+    to be parsed whole.
+    """
+    if _is_jsonl(path):
+        yield from iter_jsonl(path)
+        return
+    with _open_text(path, 'r') as f:
+        yield from json.load(f)
+
+
+def iter_keyed_records(path: PathLike, key: str = 'id') -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (key, record) pairs from a keyed collection
+
+    JSONL files carry the key inside each record; legacy .json files are a single
+    {key: record} object.
+    """
+    if _is_jsonl(path):
+        for record in iter_jsonl(path):
+            yield record.pop(key), record
+        return
+    with _open_text(path, 'r') as f:
+        yield from json.load(f).items()
+
+
+def find_category_files(directory: PathLike, suffix: str = '_guidelines') -> Dict[str, Path]:
+    """category -> file for per-category collections, preferring JSONL over legacy JSON"""
+    files: Dict[str, Path] = {}
+    for extension in ('.json', '.jsonl'):
+        for path in sorted(Path(directory).glob(f"*{suffix}{extension}")):
+            files[path.name[:-len(suffix + extension)]] = path
+    return files
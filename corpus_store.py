@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Columnar Corpus Store
+Compact on-disk form of a JTS corpus file: one UTF-8 text blob with an offsets
+array, source/section interned to small integer IDs, numeric fields as typed
+columns. Memory-mapped at startup so the Pi2 skips the JSON parse entirely
+
+Usage:
+    python3 corpus_store.py jts_focused_corpus.json
+"""
+
+import array
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import logging
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from bm25_index import file_sha256
+from corpus_io import corpus_stem, iter_records
+
+logger = logging.getLogger(__name__)
+
+STORE_MAGIC = b'JTSCORP\x00'
+STORE_VERSION = 1
+
+# magic, version, corpus sha256, num docs, schema length
+_HEADER = struct.Struct('<8sI32sII')
+
+# Column kinds
+BLOB = 'blob'        # UTF-8 strings: offsets ('I', n + 1) + blob
+INTERN = 'intern'    # repeated strings: ids ('I', n) into the schema's string table
+INT = 'int'          # 'q', n
+FLOAT = 'float'      # 'd', n
+JSON = 'json'        # anything else, JSON-encoded like BLOB; empty entry = field absent
+
+# Above this many distinct values a string field is stored as a blob
+_MAX_INTERNED = 65536
+
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+
+
+def default_store_path(corpus_path: str) -> str:
+    """Store file that sits next to a corpus file"""
+    return corpus_stem(corpus_path) + '.store'
+
+
+class _FieldStats:
+    """What the first pass learns about one field"""
+
+    __slots__ = ('count', 'types', 'distinct')
+
+    def __init__(self):
+        self.count = 0
+        self.types = set()
+        # Hashes of string values, enough to tell low- from high-cardinality fields
+        self.distinct = set()
+
+    def add(self, value: Any) -> None:
+        self.count += 1
+        self.types.add(type(value))
+        if type(value) is str and self.distinct is not None:
+            self.distinct.add(hash(value))
+            if len(self.distinct) > _MAX_INTERNED:
+                self.distinct = None
+
+    def kind(self, num_docs: int) -> str:
+        """Pick the column encoding for this field"""
+        if self.count != num_docs or len(self.types) != 1:
+            return JSON
+        value_type = next(iter(self.types))
+        if value_type is str:
+            # Intern low-cardinality strings (source, section, protocol_type, ...)
+            if self.distinct is not None and 2 * len(self.distinct) <= num_docs:
+                return INTERN
+            return BLOB
+        if value_type is int:
+            return INT
+        if value_type is float:
+            return FLOAT
+        return JSON
+
+
+class _ColumnWriter:
+    """Spools one field's arrays to temporary files during the second pass"""
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.parts = [tempfile.TemporaryFile()]
+        self.strings: Dict[str, int] = {}
+        if kind in (BLOB, JSON):
+            self.parts.append(tempfile.TemporaryFile())
+            self.blob_len = 0
+            self.parts[0].write(_U32.pack(0))
+
+    def add(self, entry: Dict) -> None:
+        if self.kind in (BLOB, JSON):
+            if self.name in entry:
+                value = entry[self.name]
+                encoded = (value if self.kind == BLOB else json.dumps(value, ensure_ascii=False)).encode('utf-8')
+                self.parts[1].write(encoded)
+                self.blob_len += len(encoded)
+            self.parts[0].write(_U32.pack(self.blob_len))
+        elif self.kind == INTERN:
+            self.parts[0].write(_U32.pack(self.strings.setdefault(entry[self.name], len(self.strings))))
+        elif self.kind == INT:
+            self.parts[0].write(_I64.pack(entry[self.name]))
+        else:
+            self.parts[0].write(_F64.pack(entry[self.name]))
+
+    def schema(self) -> Dict[str, Any]:
+        field = {'name': self.name, 'kind': self.kind, 'sizes': [part.tell() for part in self.parts]}
+        if self.kind == INTERN:
+            field['strings'] = list(self.strings)
+        return field
+
+    def copy_to(self, f) -> None:
+        for part in self.parts:
+            f.write(b'\x00' * (-f.tell() % 8))
+            part.seek(0)
+            shutil.copyfileobj(part, f)
+            part.close()
+
+
+def write_store_file(corpus: Union[Iterable[Dict], Callable[[], Iterable[Dict]]], store_path: str,
+                     corpus_hash: str) -> None:
+    """
+    Write a corpus to disk in columnar form
+
+    `corpus` is a sequence of records or a function returning a fresh iterator
+    over them (e.g. a streaming JSONL reader). It is read twice, once to pick
+    each field's encoding and once to spool the columns, so only one record is
+    held in memory at a time.
+
+    Layout (all arrays 8-byte aligned, native little-endian):
+        header, schema JSON, then each field's arrays in schema order
+    """
+    if sys.byteorder != 'little' or array.array('I').itemsize != 4:
+        raise RuntimeError("Corpus store format requires a little-endian platform with 32-bit unsigned ints")
+    records = corpus if callable(corpus) else (lambda: corpus)
+
+    # Pass 1: fields in first-seen order (record views keep the JSON key order) and their types
+    stats: Dict[str, _FieldStats] = {}
+    num_docs = 0
+    for entry in records():
+        num_docs += 1
+        for name, value in entry.items():
+            field_stats = stats.get(name)
+            if field_stats is None:
+                field_stats = stats[name] = _FieldStats()
+            field_stats.add(value)
+
+    # Pass 2: spool each column
+    columns = [_ColumnWriter(name, field_stats.kind(num_docs)) for name, field_stats in stats.items()]
+    for entry in records():
+        for column in columns:
+            column.add(entry)
+
+    schema = [column.schema() for column in columns]
+    schema_bytes = json.dumps(schema, ensure_ascii=False).encode('utf-8')
+
+    tmp_path = store_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(STORE_MAGIC, STORE_VERSION, bytes.fromhex(corpus_hash), num_docs, len(schema_bytes)))
+        f.write(schema_bytes)
+        for column in columns:
+            column.copy_to(f)
+    os.replace(tmp_path, store_path)
+
+    logger.info(f"Corpus store written to {store_path}: {num_docs} documents, "
+                f"{', '.join(f['name'] + '=' + f['kind'] for f in schema)}")
+
+
+class CorpusRecord(Mapping):
+    """Read-only dict-like view of one corpus entry; fields are decoded on access"""
+
+    __slots__ = ('_store', '_doc_id')
+
+    def __init__(self, store: 'CorpusStore', doc_id: int):
+        self._store = store
+        self._doc_id = doc_id
+
+    def __getitem__(self, key: str) -> Any:
+        return self._store._get_field(self._doc_id, key)
+
+    def __contains__(self, key: object) -> bool:
+        return self._store._has_field(self._doc_id, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self._store.field_names if self._store._has_field(self._doc_id, name))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"CorpusRecord({dict(self)!r})"
+
+
+class CorpusStore(Sequence):
+    """
+    Read-only corpus backed by an mmap of a file written by write_store_file()
+
+    Behaves like the list of dicts it replaces: len(), indexing and iteration
+    yield CorpusRecord views that support [], get(), keys() and `in`.
+    """
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        self._file = open(store_path, 'rb')
+        self._mm = None
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse()
+        except Exception:
+            # Truncated or corrupt file: don't leak the handles on the way to a rebuild
+            self.close()
+            raise
+
+    def _parse(self) -> None:
+        """Check the header and section sizes against the file, then map each column"""
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"{self.store_path} is too short for a corpus store header")
+        magic, self.version, corpus_digest, self._num_docs, schema_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != STORE_MAGIC:
+            raise ValueError(f"{self.store_path} is not a corpus store file")
+        if self.version != STORE_VERSION:
+            raise ValueError(f"{self.store_path} has unsupported corpus store version {self.version}")
+        self.corpus_hash = corpus_digest.hex()
+
+        offset = _HEADER.size
+        if offset + schema_len > len(self._mm):
+            raise ValueError(f"{self.store_path} is truncated inside its schema")
+        schema = json.loads(str(self._mm[offset:offset + schema_len], 'utf-8'))
+        offset += schema_len
+        if not isinstance(schema, list) or not all(isinstance(field, dict) for field in schema):
+            raise ValueError(f"{self.store_path} has a malformed schema")
+
+        # Every array size follows from the document count; checked before any slicing
+        n = self._num_docs
+        expected = {BLOB: [4 * (n + 1), None], JSON: [4 * (n + 1), None], INTERN: [4 * n], INT: [8 * n], FLOAT: [8 * n]}
+        for field in schema:
+            sizes = expected.get(field.get('kind'))
+            if sizes is None or not isinstance(field.get('sizes'), list) or len(field['sizes']) != len(sizes) or any(
+                    want is not None and size != want for size, want in zip(field['sizes'], sizes)):
+                raise ValueError(f"{self.store_path} has a malformed column {field['name']!r}")
+            for size in field['sizes']:
+                offset += -offset % 8 + size
+        if offset != len(self._mm):
+            raise ValueError(f"{self.store_path} is {len(self._mm)} bytes, its header describes {offset}")
+
+        view = memoryview(self._mm)
+        offset = _HEADER.size + schema_len
+        self._views = [view]
+
+        def take(nbytes: int, fmt: Optional[str]):
+            nonlocal offset
+            offset += -offset % 8
+            section = view[offset:offset + nbytes]
+            offset += nbytes
+            self._views.append(section)
+            if fmt:
+                section = section.cast(fmt)
+                self._views.append(section)
+            return section
+
+        self.field_names: List[str] = [field['name'] for field in schema]
+        self._getters: Dict[str, Callable[[int], Any]] = {}
+        self._optional: Dict[str, Any] = {}
+        for field in schema:
+            kind, sizes = field['kind'], field['sizes']
+            if kind in (BLOB, JSON):
+                offsets, blob = take(sizes[0], 'I'), take(sizes[1], None)
+                getter = self._blob_getter(offsets, blob, kind == JSON)
+                if kind == JSON:
+                    self._optional[field['name']] = offsets
+            elif kind == INTERN:
+                getter = self._intern_getter(take(sizes[0], 'I'), field['strings'])
+            else:
+                getter = take(sizes[0], 'q' if kind == INT else 'd').__getitem__
+            self._getters[field['name']] = getter
+
+    @staticmethod
+    def _blob_getter(offsets, blob, is_json: bool) -> Callable[[int], Any]:
+        def get(doc_id: int) -> Any:
+            value = str(blob[offsets[doc_id]:offsets[doc_id + 1]], 'utf-8')
+            return json.loads(value) if is_json else value
+        return get
+
+    @staticmethod
+    def _intern_getter(ids, strings: List[str]) -> Callable[[int], str]:
+        return lambda doc_id: strings[ids[doc_id]]
+
+    def _has_field(self, doc_id: int, name: object) -> bool:
+        if name not in self._getters:
+            return False
+        offsets = self._optional.get(name)
+        return offsets is None or offsets[doc_id] != offsets[doc_id + 1]
+
+    def _get_field(self, doc_id: int, name: str) -> Any:
+        if not self._has_field(doc_id, name):
+            raise KeyError(name)
+        return self._getters[name](doc_id)
+
+    def __len__(self) -> int:
+        return self._num_docs
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [CorpusRecord(self, i) for i in range(*index.indices(self._num_docs))]
+        if index < 0:
+            index += self._num_docs
+        if not 0 <= index < self._num_docs:
+            raise IndexError("corpus index out of range")
+        return CorpusRecord(self, index)
+
+    def __iter__(self) -> Iterator[CorpusRecord]:
+        return (CorpusRecord(self, i) for i in range(self._num_docs))
+
+    def text(self, doc_id: int) -> str:
+        """Text of one entry without building a record view"""
+        return self._getters['text'](doc_id)
+
+    def close(self) -> None:
+        """Release the memory map"""
+        self._getters = {}
+        for v in reversed(getattr(self, '_views', [])):
+            v.release()
+        self._views = []
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_or_build_store(corpus_path: str, corpus: Optional[Sequence] = None,
+                        store_path: Optional[str] = None, corpus_hash: Optional[str] = None) -> CorpusStore:
+    """
+    Map the columnar store for a corpus file, rebuilding it first if it is
+    missing, from an older format, or was built from a different corpus file
+    """
+    store_path = store_path or default_store_path(corpus_path)
+    corpus_hash = corpus_hash or file_sha256(corpus_path)
+
+    if os.path.exists(store_path):
+        try:
+            store = CorpusStore(store_path)
+            if store.version == STORE_VERSION and store.corpus_hash == corpus_hash:
+                logger.info(f"Mapped corpus store from {store_path}")
+                return store
+            store.close()
+            logger.info(f"Corpus store {store_path} is stale, rebuilding...")
+        except (ValueError, KeyError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable corpus store {store_path}: {e}")
+
+    # Without an in-memory corpus, stream the file (JSONL is never loaded whole)
+    write_store_file(corpus if corpus is not None else (lambda: iter_records(corpus_path)), store_path, corpus_hash)
+    return CorpusStore(store_path)
+
+
+def main():
+    """Build (or refresh) the columnar store for each corpus given on the command line"""
+    logging.basicConfig(level=logging.INFO)
+    corpus_files = sys.argv[1:] or ['jts_focused_corpus.json']
+
+    for corpus_path in corpus_files:
+        if not os.path.exists(corpus_path):
+            print(f"❌ Corpus not found: {corpus_path}")
+            continue
+        with load_or_build_store(corpus_path) as store:
+            print(f"✅ {default_store_path(corpus_path)}: {len(store)} documents, fields: {', '.join(store.field_names)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 
 import json
 import os
-import re
+
+from dose_calculator import DoseFormulaError, DoseRange, compile_formula, dose_cap, parse_weight
 
 # Path to the protocol JSON files (assume already extracted to Pi2)
 PROTOCOL_DIR = "./protocol_modules"
@@ -26,18 +27,24 @@ def find_matching_entry(query, knowledge_base):
             return entry
     return None
 
-# Evaluate dose based on weight (assume weight is always mentioned in query like '80 kg')
+# Evaluate dose based on weight (assume weight is always mentioned in query like '80 kg' or '176 lbs')
 def extract_weight(query):
-    match = re.search(r"(\d+)\s?kg", query.lower())
-    return int(match.group(1)) if match else 70  # default to 70kg if not specified
+    weight = parse_weight(query)
+    return weight if weight is not None else 70  # default to 70kg if not specified
 
-# Generate response
+# Generate response (dose_formula is parsed once into a safe expression, see dose_calculator.py;
+# an optional max_dose, in the entry's dose unit or per kg, caps the result)
 def generate_response(entry, weight):
     try:
-        dose = eval(entry.get("dose_formula", "0"), {}, {"weight": weight})
-        response = entry["response_template"].format(dose=round(dose, 1), route=entry.get("route", ""))
+        dose = compile_formula(entry.get("dose_formula", "0"))(weight=weight)
+        cap = dose_cap({'unit': entry.get("unit", "mg"), 'max_dose': entry.get("max_dose"), 'max_unit': entry.get("max_unit")}, weight)
+        if isinstance(dose, DoseRange):
+            dose = dose.capped(cap).rounded(1)
+        else:
+            dose = round(min(dose, cap) if cap is not None else dose, 1)
+        response = entry["response_template"].format(dose=dose, route=entry.get("route", ""))
         return response
-    except:
+    except (DoseFormulaError, AttributeError, KeyError, IndexError, TypeError, ValueError, ZeroDivisionError):
         return "Unable to calculate dose. Please check the input."
 
 # Main loop
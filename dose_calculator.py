@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Weight-based Dose Calculator
+Dose formulas are parsed once into a safe expression tree (no eval); doses are
+ranges with unit conversion and max-dose caps, and a whole drug panel is
+computed for a patient weight in one vectorized call
+
+Usage:
+    python3 dose_calculator.py 80kg    # adult dose panel from the dose table
+"""
+
+import ast
+import operator
+import re
+import sys
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LB_TO_KG = 0.453592
+
+# Units of mass, in milligrams
+MASS_UNITS = {'mcg': 0.001, 'mg': 1.0, 'g': 1000.0}
+
+# Units of body weight, in kilograms
+WEIGHT_UNITS = {
+    'kg': 1.0, 'kgs': 1.0, 'kilo': 1.0, 'kilos': 1.0, 'kilogram': 1.0, 'kilograms': 1.0,
+    'lb': LB_TO_KG, 'lbs': LB_TO_KG, 'pound': LB_TO_KG, 'pounds': LB_TO_KG,
+}
+
+WEIGHT_PATTERN = re.compile(
+    rf"(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>{'|'.join(sorted(WEIGHT_UNITS, key=len, reverse=True))})\b",
+    re.IGNORECASE)
+
+# Names a dose formula may use
+FORMULA_VARIABLES = ('weight', 'age')
+
+
+class DoseFormulaError(ValueError):
+    """A dose formula that is not plain arithmetic on the allowed names and functions"""
+
+
+def to_kg(value: float, unit: str = 'kg') -> float:
+    """Body weight in kilograms"""
+    factor = WEIGHT_UNITS.get(unit.lower())
+    if factor is None:
+        raise ValueError(f"Unknown weight unit: {unit}")
+    return value * factor
+
+
+def parse_weight(text: str) -> Optional[float]:
+    """Patient weight in kilograms from text like '80 kg' or '176 lbs'"""
+    match = WEIGHT_PATTERN.search(text)
+    if not match:
+        return None
+    return to_kg(float(match.group('value')), match.group('unit'))
+
+
+class DoseRange:
+    """
+    Closed interval of doses with interval arithmetic
+
+    Multiplying or dividing by a range takes the extremes of every end-to-end
+    product, so ranges combine correctly with ranged weights or factors too.
+    """
+
+    __slots__ = ('low', 'high')
+
+    def __init__(self, low: float, high: Optional[float] = None):
+        high = low if high is None else high
+        self.low = min(low, high)
+        self.high = max(low, high)
+
+    @staticmethod
+    def of(value: "Amount") -> "DoseRange":
+        return value if isinstance(value, DoseRange) else DoseRange(value)
+
+    def _combine(self, other: "Amount", op: Callable[[float, float], float]) -> "DoseRange":
+        other = DoseRange.of(other)
+        ends = [op(a, b) for a in (self.low, self.high) for b in (other.low, other.high)]
+        return DoseRange(min(ends), max(ends))
+
+    def __add__(self, other: "Amount") -> "DoseRange":
+        other = DoseRange.of(other)
+        return DoseRange(self.low + other.low, self.high + other.high)
+
+    def __sub__(self, other: "Amount") -> "DoseRange":
+        other = DoseRange.of(other)
+        return DoseRange(self.low - other.high, self.high - other.low)
+
+    def __mul__(self, other: "Amount") -> "DoseRange":
+        return self._combine(other, operator.mul)
+
+    def __truediv__(self, other: "Amount") -> "DoseRange":
+        other = DoseRange.of(other)
+        if other.low <= 0 <= other.high:
+            raise ZeroDivisionError("Dose range divided by a range containing zero")
+        return self._combine(other, operator.truediv)
+
+    def __radd__(self, other: "Amount") -> "DoseRange":
+        return self + other
+
+    def __rsub__(self, other: "Amount") -> "DoseRange":
+        return DoseRange.of(other) - self
+
+    def __rmul__(self, other: "Amount") -> "DoseRange":
+        return self * other
+
+    def __rtruediv__(self, other: "Amount") -> "DoseRange":
+        return DoseRange.of(other) / self
+
+    def __neg__(self) -> "DoseRange":
+        return DoseRange(-self.high, -self.low)
+
+    def __pos__(self) -> "DoseRange":
+        return self
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (int, float)):
+            other = DoseRange(other)
+        return isinstance(other, DoseRange) and (self.low, self.high) == (other.low, other.high)
+
+    def __hash__(self) -> int:
+        return hash((self.low, self.high))
+
+    def __repr__(self) -> str:
+        return f"DoseRange({self.low!r}, {self.high!r})"
+
+    def __str__(self) -> str:
+        return f"{self.low:g}" if self.low == self.high else f"{self.low:g}-{self.high:g}"
+
+    def capped(self, max_dose: Optional[float]) -> "DoseRange":
+        """The range with both ends limited to max_dose"""
+        if max_dose is None:
+            return self
+        return DoseRange(min(self.low, max_dose), min(self.high, max_dose))
+
+    def rounded(self, digits: int = 1) -> "DoseRange":
+        return DoseRange(round(self.low, digits), round(self.high, digits))
+
+
+Amount = Union[float, DoseRange]
+
+
+def _min(*values: Amount) -> Amount:
+    """min() that works end by end on ranges (min(weight * 0.1, 2) caps at 2 mg)"""
+    if not any(isinstance(value, DoseRange) for value in values):
+        return min(values)
+    ranges = [DoseRange.of(value) for value in values]
+    return DoseRange(min(r.low for r in ranges), min(r.high for r in ranges))
+
+
+def _max(*values: Amount) -> Amount:
+    """max() that works end by end on ranges"""
+    if not any(isinstance(value, DoseRange) for value in values):
+        return max(values)
+    ranges = [DoseRange.of(value) for value in values]
+    return DoseRange(max(r.low for r in ranges), max(r.high for r in ranges))
+
+
+def _round(value: Amount, digits: int = 0) -> Amount:
+    return value.rounded(digits) if isinstance(value, DoseRange) else round(value, digits)
+
+
+_BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_UNARY_OPS = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+_FUNCTIONS = {'min': _min, 'max': _max, 'round': _round, 'range': DoseRange}
+
+Evaluator = Callable[[Dict[str, Amount]], Amount]
+
+
+class DoseFormula:
+    """
+    A dose formula such as "min(weight * 0.1, 2)" or "weight * range(1, 2)"
+
+    The source is parsed once into a tree of closures; only numbers, the names in
+    FORMULA_VARIABLES, + - * /, and min/max/round/range() are accepted, so a
+    formula from a protocol file cannot run arbitrary code.
+    """
+
+    def __init__(self, source: str, variables: Sequence[str] = FORMULA_VARIABLES):
+        self.source = source
+        self.variables = tuple(variables)
+        self.used: Set[str] = set()
+        try:
+            tree = ast.parse(source.strip(), mode='eval')
+        except SyntaxError as e:
+            raise DoseFormulaError(f"Invalid dose formula {source!r}: {e.msg}") from None
+        self._evaluate = self._compile(tree.body)
+
+    def _compile(self, node: ast.AST) -> Evaluator:
+        """Closure that evaluates one node of the formula"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = node.value
+            return lambda env: value
+        if isinstance(node, ast.Name) and node.id in self.variables:
+            name = node.id
+            self.used.add(name)
+            return lambda env: env[name]
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            op = _BINARY_OPS[type(node.op)]
+            left, right = self._compile(node.left), self._compile(node.right)
+            return lambda env: op(left(env), right(env))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            op = _UNARY_OPS[type(node.op)]
+            operand = self._compile(node.operand)
+            return lambda env: op(operand(env))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in _FUNCTIONS and not node.keywords):
+            function = _FUNCTIONS[node.func.id]
+            args = [self._compile(arg) for arg in node.args]
+            return lambda env: function(*(arg(env) for arg in args))
+        raise DoseFormulaError(f"Unsupported expression in dose formula {self.source!r}: {ast.dump(node)[:60]}")
+
+    def __call__(self, **variables: Amount) -> Amount:
+        missing = self.used - set(variables)
+        if missing:
+            raise DoseFormulaError(f"Dose formula {self.source!r} needs {', '.join(sorted(missing))}")
+        return self._evaluate(variables)
+
+    def __repr__(self) -> str:
+        return f"DoseFormula({self.source!r})"
+
+
+@lru_cache(maxsize=256)
+def compile_formula(source: str) -> DoseFormula:
+    """Parsed formula for a source string (each distinct formula is parsed once)"""
+    return DoseFormula(source)
+
+
+def convert_mass(value: Amount, from_unit: str, to_unit: str) -> Amount:
+    """Convert a dose between mcg, mg and g"""
+    try:
+        factor = MASS_UNITS[from_unit.lower()] / MASS_UNITS[to_unit.lower()]
+    except KeyError as e:
+        raise ValueError(f"Unknown mass unit: {e.args[0]}") from None
+    return value * factor
+
+
+def weight_based_dose(per_kg: Amount, weight_kg: float, max_dose: Optional[float] = None) -> DoseRange:
+    """Total dose for a patient: per-kg dose (or range) times weight, capped at max_dose"""
+    return (DoseRange.of(per_kg) * weight_kg).capped(max_dose)
+
+
+def _cap_limit(spec: Dict[str, Any]) -> Optional[Tuple[float, bool]]:
+    """
+    (max dose in the record's own unit, whether it is per kg) for a record's cap
+
+    Only single-dose caps are limits on one dose: a cap per day, per hour or per
+    minute ("100 mg/kg/day", "max rate 2mg/min") is a different quantity and is
+    ignored, as is any cap on a dose that is itself a rate (an infusion).
+    """
+    if spec.get('max_dose') is None or '/' in spec['unit']:
+        return None
+    unit = spec['unit']
+    cap_unit, _, per = (spec.get('max_unit') or unit).partition('/')
+    if per not in ('', 'kg'):
+        return None
+    try:
+        return convert_mass(spec['max_dose'], cap_unit, unit), per == 'kg'
+    except ValueError:
+        return None
+
+
+def dose_cap(spec: Dict[str, Any], weight_kg: Optional[float] = None) -> Optional[float]:
+    """
+    Max single dose of a dose-table record in the record's own unit
+
+    A per-kg cap ("max 3 mg/kg") needs the patient's weight; None if the record
+    has no cap that applies to one dose.
+    """
+    limit = _cap_limit(spec)
+    if limit is None:
+        return None
+    cap, per_kg = limit
+    if per_kg:
+        return cap * weight_kg if weight_kg else None
+    return cap
+
+
+class DosePanel:
+    """
+    Doses of many drugs computed for a patient weight at once
+
+    Specs are dose-table records (see dose_table.py): dose_min/dose_max in unit,
+    per_kg, and an optional max_dose in max_unit (see dose_cap). Their numbers are packed into
+    arrays once, so compute() is a handful of vector operations however many
+    drugs the panel holds.
+    """
+
+    def __init__(self, specs: Iterable[Dict[str, Any]]):
+        self.specs = list(specs)
+        self.units = [spec['unit'] for spec in self.specs]
+        self.low = np.array([spec['dose_min'] for spec in self.specs], dtype=np.float64)
+        self.high = np.array([spec['dose_max'] for spec in self.specs], dtype=np.float64)
+        self.per_kg = np.array([bool(spec['per_kg']) for spec in self.specs], dtype=bool)
+        limits = [_cap_limit(spec) for spec in self.specs]
+        # Absolute caps and per-kg caps (scaled by weight in compute); inf where a spec has none
+        self.cap = np.array([limit[0] if limit and not limit[1] else np.inf for limit in limits], dtype=np.float64)
+        self.cap_per_kg = np.array([limit[0] if limit and limit[1] else np.inf for limit in limits], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def compute_arrays(self, weight_kg: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(low, high, capped) totals for every spec; doses that are not per kg pass through"""
+        factor = np.where(self.per_kg, weight_kg, 1.0)
+        low = self.low * factor
+        high = self.high * factor
+        cap = np.minimum(self.cap, self.cap_per_kg * weight_kg)
+        capped = high > cap
+        return np.minimum(low, cap), np.minimum(high, cap), capped
+
+    def compute(self, weight_kg: float) -> List[Dict[str, Any]]:
+        """Total dose of every spec for a patient, as dicts (drug, dose range, unit, capped, ...)"""
+        low, high, capped = self.compute_arrays(weight_kg)
+        return [{
+            'drug': spec['drug'],
+            'indication': spec.get('indication'),
+            'dose': DoseRange(float(lo), float(hi)),
+            'unit': unit,
+            'capped': bool(was_capped),
+            'route': spec.get('route'),
+            'source': spec.get('source'),
+            'page': spec.get('page')
+        } for spec, unit, lo, hi, was_capped in zip(self.specs, self.units, low, high, capped)]
+
+
+def main():
+    """Print the adult dose panel of the dose table for a patient weight"""
+    logging.basicConfig(level=logging.WARNING)
+    from dose_table import ADULT_POPULATION, get_dose_table
+
+    weight_kg = parse_weight(' '.join(sys.argv[1:])) if len(sys.argv) > 1 else None
+    if weight_kg is None:
+        print("Usage: python3 dose_calculator.py <weight> (e.g. 80kg, 176 lbs)")
+        return
+    table = get_dose_table()
+    specs = [record for record in (table.best(drug, population=ADULT_POPULATION) for drug in table.by_drug) if record]
+    panel = DosePanel(specs)
+    print(f"💊 Adult dose panel for {weight_kg:.1f} kg ({len(panel)} drugs):")
+    for dose in panel.compute(weight_kg):
+        cap = " (max dose)" if dose['capped'] else ''
+        print(f"   {dose['drug']:<20} {dose['dose'].rounded(1)} {dose['unit']} {dose['route'] or ''}{cap}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Structured Dose Table
+Walks the JTS corpus once at build time and writes every drug dose it can read
+(drug, indication, dose range, unit, max dose, route, frequency, source PDF, page)
+to structured_treatments.json; at runtime dosing questions are hash lookups.
+Extracted records are unreviewed, and never served, until a clinician sets "reviewed": true in the file
+
+Usage:
+    python3 dose_table.py [corpus_file]    # (re)build structured_treatments.json
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from corpus_index import find_default_corpus
+from corpus_io import iter_records
+from dose_calculator import DoseRange, dose_cap, weight_based_dose
+
+logger = logging.getLogger(__name__)
+
+DOSE_TABLE_FILE = "structured_treatments.json"
+
+# Canonical drug name -> names it appears under in the corpus
+DRUG_ALIASES = {
+    'ketamine': ['ketamine', 'ketalar'],
+    'morphine': ['morphine'],
+    'fentanyl': ['fentanyl'],
+    'hydromorphone': ['hydromorphone', 'dilaudid'],
+    'midazolam': ['midazolam', 'versed'],
+    'diazepam': ['diazepam', 'valium'],
+    'lorazepam': ['lorazepam', 'ativan'],
+    'propofol': ['propofol'],
+    'etomidate': ['etomidate'],
+    'rocuronium': ['rocuronium'],
+    'succinylcholine': ['succinylcholine'],
+    'vecuronium': ['vecuronium'],
+    'txa': ['txa', 'tranexamic acid', 'tranexamic'],
+    'epinephrine': ['epinephrine', 'adrenaline'],
+    'norepinephrine': ['norepinephrine', 'levophed'],
+    'atropine': ['atropine'],
+    'adenosine': ['adenosine'],
+    'amiodarone': ['amiodarone'],
+    'lidocaine': ['lidocaine'],
+    'naloxone': ['naloxone', 'narcan'],
+    'calcium chloride': ['calcium chloride'],
+    'calcium gluconate': ['calcium gluconate'],
+    'magnesium sulfate': ['magnesium sulfate'],
+    'sodium bicarbonate': ['sodium bicarbonate'],
+    'dextrose': ['dextrose'],
+    'glucagon': ['glucagon'],
+    'ondansetron': ['ondansetron', 'zofran'],
+    'diphenhydramine': ['diphenhydramine', 'benadryl'],
+    'methylprednisolone': ['methylprednisolone', 'solu-medrol'],
+    'labetalol': ['labetalol'],
+    'ketorolac': ['ketorolac', 'toradol'],
+    'acetaminophen': ['acetaminophen', 'tylenol'],
+    'cefazolin': ['cefazolin', 'ancef'],
+    'ceftriaxone': ['ceftriaxone'],
+    'ertapenem': ['ertapenem'],
+    'moxifloxacin': ['moxifloxacin'],
+    'metronidazole': ['metronidazole', 'flagyl'],
+    'clindamycin': ['clindamycin'],
+    'tramadol': ['tramadol'],
+    'promethazine': ['promethazine', 'phenergan'],
+    'procainamide': ['procainamide'],
+    'vasopressin': ['vasopressin'],
+    'aminocaproic acid': ['aminocaproic acid', 'eaca'],
+    'haloperidol': ['haloperidol', 'haldol'],
+    'dexamethasone': ['dexamethasone'],
+    'nitroglycerin': ['nitroglycerin'],
+    'aspirin': ['aspirin'],
+    'insulin': ['insulin'],
+    'thyroxine': ['thyroxine', 'thyroxin', 'levothyroxine'],
+    'dopamine': ['dopamine'],
+    'phenylephrine': ['phenylephrine', 'neosynephrine'],
+}
+
+# Canonical indication -> words that signal it near a dose
+INDICATION_KEYWORDS = {
+    'pain': ['pain', 'analgesia', 'analgesic'],
+    'sedation': ['sedation', 'sedative', 'anxiety', 'agitation', 'combative'],
+    'induction': ['induction', 'rsi', 'intubation', 'paralysis', 'paralytic'],
+    'maintenance': ['maintenance'],
+    'hemorrhage': ['hemorrhage', 'bleeding', 'blood loss'],
+    'cardiac arrest': ['cardiac arrest', 'arrest', 'pulseless', 'vf', 'ventricular fibrillation'],
+    'anaphylaxis': ['anaphylaxis', 'anaphylactic', 'allergic'],
+    'seizure': ['seizure', 'seizures', 'status epilepticus'],
+    'hypotension': ['hypotension', 'shock', 'pressor'],
+    'bradycardia': ['bradycardia'],
+    'tachycardia': ['tachycardia', 'svt'],
+    'nausea': ['nausea', 'vomiting'],
+    'overdose': ['overdose', 'narcotic', 'opioid'],
+    'infection': ['infection', 'antibiotic', 'wound', 'fracture'],
+    'hyperkalemia': ['hyperkalemia'],
+    'hypoglycemia': ['hypoglycemia', 'blood glucose'],
+}
+
+GENERAL_INDICATION = 'general'
+
+# Canonical patient population -> words that signal it near a dose
+POPULATION_KEYWORDS = {
+    'pediatric': ['pediatric', 'pediatrics', 'peds', 'children', 'child', 'infant', 'infants', 'neonate', 'broselow'],
+    'adult': ['adult', 'adults', 'adolescents'],
+    'canine': ['canine', 'k9', 'dog', 'dogs', 'mwd'],
+}
+ADULT_POPULATION = 'adult'
+# Sources that are entirely about one population (military working dog guidelines)
+SOURCE_POPULATIONS = {'MWD': 'canine'}
+
+
+def _alternation(phrases: Iterable[str]) -> str:
+    return '|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+_DRUG_NAMES = {alias: drug for drug, aliases in DRUG_ALIASES.items() for alias in aliases}
+_INDICATIONS = {word: indication for indication, words in INDICATION_KEYWORDS.items() for word in words}
+_POPULATIONS = {word: population for population, words in POPULATION_KEYWORDS.items() for word in words}
+
+DRUG_PATTERN = re.compile(rf"\b(?:{_alternation(_DRUG_NAMES)})\b", re.IGNORECASE)
+INDICATION_PATTERN = re.compile(rf"\b(?:{_alternation(_INDICATIONS)})\b", re.IGNORECASE)
+POPULATION_PATTERN = re.compile(rf"\b(?:{_alternation(_POPULATIONS)})\b", re.IGNORECASE)
+
+# "0.3 mg/kg", "1-2 mg/kg", "2g", "5 to 10 mg/hour", "2-20mcg/kg/min" (not "50MG/ML", "4mg/___mL" or "mg/dL")
+DOSE_PATTERN = re.compile(
+    r'(?<![\d.])(?P<min>\d*\.?\d+)(?:\s*(?:-|–|‐|to)\s*(?P<max>\d*\.?\d+))?\s*'
+    r'(?P<unit>mcg|mg|g|meq|units?)(?P<per_kg>\s*/\s*kg)?'
+    r'(?P<per_time>\s*/\s*(?:min(?:ute)?|hr|h|hour|day))?\b(?!\s*/\s*[\d_\s]*(?:d?l|ml|cc)\b)',
+    re.IGNORECASE)
+# A drug named right after its dose ("10 units of regular insulin")
+DOSE_OF_PATTERN = re.compile(r'\s+of\s+(?:[a-z]+\s+)?', re.IGNORECASE)
+# Formulary tables list product strengths ("Generic Brand Doses Comments ... Benadryl 25MG, 50MG"), not doses
+FORMULARY_PATTERN = re.compile(r'\bGeneric\s*/?\s*Brand\b', re.IGNORECASE)
+ROUTE_PATTERN = re.compile(r'\b(?:IV|IO|IM|IN|PO|SL|PR|SubQ|SQ|SC|ETT|intranasal(?:ly)?)\b')
+FREQUENCY_PATTERN = re.compile(
+    r'\b(?:q\s*\d+(?:\s*-\s*\d+)?\s*(?:h|hrs?|hours?|min(?:utes)?)\b|'
+    r'every\s+\d+(?:\s*(?:-|to)\s*\d+)?\s*(?:min(?:utes)?|h(?:ou)?rs?|hours?)|'
+    r'over\s+\d+(?:\s*(?:-|to)\s*\d+)?\s*(?:min(?:utes)?|h(?:ou)?rs?|hours?)|'
+    r'prn|as needed|once|single dose|may repeat(?: \d+ times?| once)?)',
+    re.IGNORECASE)
+
+# Caps and limits ("max 6mg", "not to exceed 10 mg") are not doses; one right after a dose is its cap.
+# The cap keeps its full unit ("mg/kg", "mg/day", "mcg/kg/min") so daily and rate limits are not read as single doses
+_LIMIT = r'\b(?:max(?:imum)?|not to exceed|up to)\b'
+LIMIT_PATTERN = re.compile(rf'{_LIMIT}[^\d]{{0,25}}$', re.IGNORECASE)
+CAP_PATTERN = re.compile(
+    rf'{_LIMIT}(?P<qualifier>[^\d]{{0,25}}?)(?P<value>\d*\.?\d+)\s*(?P<unit>mcg|mg|g)\b'
+    r'(?P<per>(?:\s*(?:/|\bper\b)\s*(?:kg|dose|min(?:ute)?|hr|h|hour|day|24\s*h(?:ou)?rs?)\b)*)'
+    r'(?:\s*(?:within|in|over)\s+(?:an?\s+)?(?P<hours>\d+)[\s-]*h(?:ou)?rs?\b)?',
+    re.IGNORECASE)
+_CAP_PER_NAMES = {'minute': 'min', 'hour': 'hr', 'h': 'hr'}
+
+# Bullets, sub-bullets and sentence ends delimit the clause a dose belongs to
+CLAUSE_BREAK = re.compile(r'•| o |;|\.\s+(?=[A-Z])|\n')
+
+# How far before a dose its drug / indication / population may be named
+DRUG_WINDOW = 150
+INDICATION_WINDOW = 100
+POPULATION_WINDOW = 300
+# A drug named this close to the start of a paragraph is the page's subject (drug monographs)
+HEADING_CHARS = 80
+# Words of a route or frequency that may follow the dose within its clause
+ROUTE_WINDOW = 40
+FREQUENCY_WINDOW = 60
+CAP_WINDOW = 40
+CONTEXT_CHARS = 160
+
+_ROUTE_NAMES = {'intranasal': 'IN', 'intranasally': 'IN', 'subq': 'SQ', 'sc': 'SQ'}
+_UNIT_NAMES = {'units': 'unit', 'meq': 'mEq'}
+_TIME_NAMES = {'minute': 'min', 'hour': 'hr', 'h': 'hr'}
+_FREQUENCY_NAMES = {'prn': 'as needed'}
+
+
+def _clause_bounds(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Start and end of the bullet/sentence that contains text[start:end]"""
+    clause_start = 0
+    for match in CLAUSE_BREAK.finditer(text, 0, start):
+        clause_start = match.end()
+    following = CLAUSE_BREAK.search(text, end)
+    return clause_start, following.start() if following else len(text)
+
+
+def _nearest_before(pattern: "re.Pattern", text: str, position: int, window: int) -> Optional[str]:
+    """The last match of pattern in the window before position"""
+    last = None
+    for match in pattern.finditer(text, max(0, position - window), position):
+        last = match.group(0)
+    return last
+
+
+def _beside_dose(text: str, start: int, end: int, after: bool) -> str:
+    """text[start:end] cut at the first (after a dose) or last (before it) other drug or dose it names"""
+    snippet = text[start:end]
+    others = [match for pattern in (DRUG_PATTERN, DOSE_PATTERN) for match in pattern.finditer(snippet)]
+    if not others:
+        return snippet
+    if after:
+        return snippet[:min(match.start() for match in others)]
+    return snippet[max(match.end() for match in others):]
+
+
+def _dose_drug(text: str, match: "re.Match", clause_start: int, clause_end: int) -> Optional[str]:
+    """Drug a dose belongs to: the nearest one named before it in its clause, else one named right after it"""
+    drug_name = _nearest_before(DRUG_PATTERN, text, match.start(), min(DRUG_WINDOW, match.start() - clause_start))
+    if drug_name is None:
+        following = DRUG_PATTERN.search(text, match.end(), clause_end)
+        if following and DOSE_OF_PATTERN.fullmatch(text, match.end(), following.start()):
+            drug_name = following.group(0)
+    return drug_name
+
+
+def _routes(text: str) -> Optional[str]:
+    """Routes named in text, normalized and joined ('IV/IO')"""
+    routes = []
+    for match in ROUTE_PATTERN.finditer(text):
+        route = _ROUTE_NAMES.get(match.group(0).lower(), match.group(0).upper())
+        if route not in routes:
+            routes.append(route)
+    return '/'.join(routes) or None
+
+
+def _cap_unit(cap: "re.Match") -> str:
+    """
+    Full unit of a CAP_PATTERN match ("mg", "mg/kg", "mg/day", "mg/8hr", "mg/total")
+
+    "per dose" is dropped since a cap is per dose anyway; daily, total and
+    per-period limits keep a suffix so they are not applied to a single dose.
+    """
+    unit = cap.group('unit').lower()
+    for per in re.split(r'/|\bper\b', cap.group('per').lower())[1:]:
+        per = ' '.join(per.split())
+        if per.startswith('24'):
+            per = 'day'
+        if per != 'dose':
+            unit += f"/{_CAP_PER_NAMES.get(per, per)}"
+    qualifier = cap.group('qualifier').lower()
+    if 'daily' in qualifier and not unit.endswith('/day'):
+        unit += '/day'
+    if 'total' in qualifier or 'cumulative' in qualifier:
+        unit += '/total'
+    if cap.group('hours'):
+        unit += f"/{cap.group('hours')}hr"
+    return unit
+
+
+def extract_doses(text: str, source: str = '', page: Any = None) -> Iterator[Dict[str, Any]]:
+    """
+    Dose records read from one corpus paragraph
+
+    Each dose is attributed to the drug named in its own clause (or, if the clause
+    names none, the drug the paragraph is about), to the indication named in its
+    clause or just before, and to the nearest population named before it (else the
+    one in the protocol title, else adult). Routes are read only beside the dose.
+    Formulary tables are skipped: their numbers are product strengths.
+    """
+    text = ' '.join(text.split())
+    if FORMULARY_PATTERN.search(text):
+        return
+    heading = DRUG_PATTERN.search(text, 0, HEADING_CHARS)
+    source_population = next((population for marker, population in SOURCE_POPULATIONS.items()
+                              if marker in source), None)
+    # Protocol titles are in capitals and, in the PDF text, not always at the start
+    title = next((match.group(0) for match in POPULATION_PATTERN.finditer(text)
+                  if match.group(0).isupper() and _POPULATIONS[match.group(0).lower()] != ADULT_POPULATION), None)
+    title_population = _POPULATIONS[title.lower()] if title else ADULT_POPULATION
+    for match in DOSE_PATTERN.finditer(text):
+        if LIMIT_PATTERN.search(text, max(0, match.start() - 30), match.start()):
+            continue
+        dose_min = float(match.group('min'))
+        dose_max = float(match.group('max')) if match.group('max') else dose_min
+        if dose_min <= 0 or dose_max < dose_min:
+            continue
+
+        clause_start, clause_end = _clause_bounds(text, match.start(), match.end())
+        drug_name = _dose_drug(text, match, clause_start, clause_end)
+        if drug_name is None:
+            if heading is None or DRUG_PATTERN.search(text, clause_start, clause_end):
+                continue
+            drug_name = heading.group(0)
+        # Indication: named earlier in the clause, else later in it, else just before the clause
+        indication_word = _nearest_before(INDICATION_PATTERN, text, match.start(), match.start() - clause_start)
+        if indication_word is None:
+            following = INDICATION_PATTERN.search(text, match.end(), clause_end)
+            indication_word = (following.group(0) if following
+                               else _nearest_before(INDICATION_PATTERN, text, match.start(), INDICATION_WINDOW))
+        population_word = _nearest_before(POPULATION_PATTERN, text, match.start(), POPULATION_WINDOW)
+        population = source_population or (_POPULATIONS[population_word.lower()] if population_word else title_population)
+        route = (_routes(_beside_dose(text, match.end(), min(clause_end, match.end() + ROUTE_WINDOW), after=True))
+                 or _routes(_beside_dose(text, max(clause_start, match.start() - ROUTE_WINDOW), match.start(), after=False)))
+        frequency = FREQUENCY_PATTERN.search(text, match.end(), min(clause_end, match.end() + FREQUENCY_WINDOW))
+        # The cap must start close to the dose, but its unit may run past the window
+        cap = CAP_PATTERN.search(text, match.end(), clause_end)
+        if cap and cap.start() > match.end() + CAP_WINDOW:
+            cap = None
+
+        unit = match.group('unit').lower()
+        unit = _UNIT_NAMES.get(unit, unit)
+        if match.group('per_time'):
+            per_time = match.group('per_time').split('/')[-1].strip().lower()
+            unit = f"{unit}/{_TIME_NAMES.get(per_time, per_time)}"
+
+        yield {
+            'drug': _DRUG_NAMES[drug_name.lower()],
+            'indication': _INDICATIONS[indication_word.lower()] if indication_word else GENERAL_INDICATION,
+            'population': population,
+            'dose_min': dose_min,
+            'dose_max': dose_max,
+            'unit': unit,
+            'per_kg': bool(match.group('per_kg')),
+            'max_dose': float(cap.group('value')) if cap else None,
+            'max_unit': _cap_unit(cap) if cap else None,
+            'route': route,
+            'frequency': _FREQUENCY_NAMES.get(frequency.group(0).lower(), frequency.group(0).lower()) if frequency else None,
+            'source': source,
+            'page': page,
+            'reviewed': False,
+            'context': text[max(clause_start, match.start() - CONTEXT_CHARS // 2):min(clause_end, match.end() + CONTEXT_CHARS // 2)].strip()
+        }
+
+
+def _record_key(record: Dict[str, Any]) -> Tuple:
+    return tuple(value for name, value in record.items() if name not in ('context', 'reviewed'))
+
+
+def _reviewed_keys(path: str) -> Set[Tuple]:
+    """Keys of the records a clinician has marked reviewed in an existing dose table"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {_record_key(record) for record in json.load(f) if record.get('reviewed')}
+    except (OSError, ValueError):
+        return set()
+
+
+def build_dose_table(corpus_file: Optional[str] = None, output_file: str = DOSE_TABLE_FILE) -> List[Dict[str, Any]]:
+    """Extract the dose records of a whole corpus and write them to output_file (keeping 'reviewed' marks)"""
+    corpus_file = corpus_file or find_default_corpus()
+    reviewed = _reviewed_keys(output_file)
+    records: List[Dict[str, Any]] = []
+    seen = set()
+    for entry in iter_records(corpus_file):
+        for record in extract_doses(entry.get('text', ''), entry.get('source', ''), entry.get('page')):
+            key = _record_key(record)
+            if key not in seen:
+                seen.add(key)
+                record['reviewed'] = key in reviewed
+                records.append(record)
+
+    tmp_path = output_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_file)
+    logger.info(f"Dose table written to {output_file}: {len(records)} doses from {corpus_file}")
+    return records
+
+
+class DoseTable:
+    """
+    Reviewed dose records hashed by drug and by (drug, indication)
+
+    Unreviewed records are heuristic extractions and are never served: lookups
+    only see records a clinician has marked reviewed. Records keep corpus order
+    within each key, so the first one is the dose the protocol states first.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = [record for record in records if record.get('reviewed')]
+        self.unreviewed = len(records) - len(self.records)
+        self.by_drug: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.by_drug_indication: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        for record in self.records:
+            self.by_drug[record['drug']].append(record)
+            self.by_drug_indication[(record['drug'], record['indication'])].append(record)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def lookup(self, drug: str, indication: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Doses of a drug, for one indication if given"""
+        drug = _DRUG_NAMES.get(drug.lower(), drug.lower())
+        if indication is None:
+            return self.by_drug.get(drug, [])
+        return self.by_drug_indication.get((drug, indication), [])
+
+    def best(self, drug: str, indication: Optional[str] = None,
+             population: str = ADULT_POPULATION) -> Optional[Dict[str, Any]]:
+        """
+        The dose to quote for a population: the first stated for the indication, else the first for the drug
+
+        A single dose is preferred over an infusion rate.
+        """
+        candidates = [record for record in (self.lookup(drug, indication) if indication else []) + self.lookup(drug)
+                      if record['population'] == population]
+        return next((record for record in candidates if '/' not in record['unit']),
+                    candidates[0] if candidates else None)
+
+    @staticmethod
+    def drugs_in(text: str) -> List[str]:
+        """Canonical names of the drugs mentioned in text, in order"""
+        return list(dict.fromkeys(_DRUG_NAMES[match.group(0).lower()] for match in DRUG_PATTERN.finditer(text)))
+
+    @staticmethod
+    def indication_in(text: str) -> Optional[str]:
+        """Canonical indication mentioned in text, if any"""
+        match = INDICATION_PATTERN.search(text)
+        return _INDICATIONS[match.group(0).lower()] if match else None
+
+
+def load_dose_table(path: str = DOSE_TABLE_FILE, corpus_file: Optional[str] = None) -> DoseTable:
+    """Load the dose table, building it from the corpus if it is missing or empty"""
+    records: List[Dict[str, Any]] = []
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable dose table {path}: {e}")
+    if not records:
+        try:
+            records = build_dose_table(corpus_file, path)
+        except FileNotFoundError as e:
+            logger.warning(f"No dose table available: {e}")
+    table = DoseTable(records)
+    if table.unreviewed:
+        logger.info(f"Dose table: {len(table)} reviewed records served, {table.unreviewed} unreviewed withheld")
+    return table
+
+
+def dose_range(record: Dict[str, Any]) -> str:
+    """Dose of a record without its unit ("0.3", "1-2")"""
+    if record['dose_min'] == record['dose_max']:
+        return f"{record['dose_min']:g}"
+    return f"{record['dose_min']:g}-{record['dose_max']:g}"
+
+
+def dose_unit(record: Dict[str, Any]) -> str:
+    """Full unit of a record ("mg", "mg/kg", "mcg/kg/min")"""
+    unit, _, per_time = record['unit'].partition('/')
+    per_kg = '/kg' if record['per_kg'] else ''
+    per_time = f"/{per_time}" if per_time else ''
+    return f"{unit}{per_kg}{per_time}"
+
+
+def format_dose(record: Dict[str, Any], weight_kg: Optional[float] = None) -> str:
+    """Spoken form of a dose record, with the total for the patient's weight if it is weight-based"""
+    dose = dose_range(record)
+    unit, _, per_time = record['unit'].partition('/')
+    per_time = f"/{per_time}" if per_time else ''
+    route = f" {record['route']}" if record['route'] else ''
+    drug = record['drug'].upper() if len(record['drug']) <= 3 else record['drug'].title()
+    response = f"{drug} {dose} {dose_unit(record)}{route}."
+    if record['per_kg'] and weight_kg:
+        cap = dose_cap(record, weight_kg)
+        total = weight_based_dose(DoseRange(record['dose_min'], record['dose_max']), weight_kg, cap).rounded(1)
+        capped = " (max dose)" if cap is not None and record['dose_max'] * weight_kg > cap else ''
+        response += f" For {weight_kg:.0f}kg patient: {total} {unit}{per_time}{route}{capped}."
+    if record['frequency']:
+        response += f" {record['frequency'].capitalize()}."
+    return response
+
+
+_instance: Optional[DoseTable] = None
+_instance_lock = threading.Lock()
+
+
+def get_dose_table() -> DoseTable:
+    """Return the process-wide dose table, loading (or building) it on first use"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = load_dose_table()
+        return _instance
+
+
+def main():
+    """Build the dose table from the corpus"""
+    logging.basicConfig(level=logging.INFO)
+    corpus_file = sys.argv[1] if len(sys.argv) > 1 else None
+    records = build_dose_table(corpus_file)
+    table = DoseTable(records)
+    print(f"✅ {len(records)} doses for {len(table.by_drug)} drugs written to {DOSE_TABLE_FILE}")
+
+
+if __name__ == "__main__":
+    main()
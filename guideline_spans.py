@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Guideline Span Index
+Compiled pattern registry for the decision engine's extractors, and the per-guideline
+span index (doses, steps, assessment criteria) built from it once at index time
+"""
+
+import re
+from typing import Any, Dict, List, Pattern
+
+# Bump when a pattern changes, so persisted span indexes are rebuilt
+SPAN_VERSION = 1
+
+_NUMBER = r'\d+(?:\.\d+)?'
+
+# Drugs whose weight-based doses are indexed
+DOSE_DRUGS = ['ketamine', 'morphine', 'fentanyl', 'midazolam']
+
+
+def _dose_patterns(drug: str) -> List[Pattern]:
+    """'<drug> 1 mg/kg', '1 mg/kg <drug>', '<drug> 1 to 2 mg/kg', '1 to 2 mg/kg <drug>'"""
+    name = re.escape(drug)
+    return [re.compile(p) for p in (
+        rf'{name}\s*\(?\s*(?P<min>{_NUMBER})\s*(?P<unit>mg/kg)\s*\)?',
+        rf'(?P<min>{_NUMBER})\s*(?P<unit>mg/kg)\s*{name}',
+        rf'{name}\s*(?P<min>{_NUMBER})\s*to\s*(?P<max>{_NUMBER})\s*(?P<unit>mg/kg)',
+        rf'(?P<min>{_NUMBER})\s*to\s*(?P<max>{_NUMBER})\s*(?P<unit>mg/kg)\s*{name}',
+    )]
+
+
+DOSE_PATTERNS: Dict[str, List[Pattern]] = {drug: _dose_patterns(drug) for drug in DOSE_DRUGS}
+
+# Numbered steps and bullet points
+STEP_PATTERNS: List[Pattern] = [re.compile(p) for p in (
+    r'(?P<number>\d+)\.\s*(?P<text>[^.\n]+)',
+    r'•\s*(?P<text>[^.\n]+)',
+    r'-\s*(?P<text>[^.\n]+)',
+)]
+
+CRITERIA_PATTERNS: List[Pattern] = [re.compile(p) for p in (
+    r'check\s+for\s+(?P<text>[^.\n]+)',
+    r'assess\s+(?P<text>[^.\n]+)',
+    r'evaluate\s+(?P<text>[^.\n]+)',
+    r'look\s+for\s+(?P<text>[^.\n]+)',
+)]
+
+# Patient parameters spoken in a query (matched against lowercase text)
+WEIGHT_PATTERN = re.compile(r'(?P<value>\d+)\s*(?:kg|kilos?|pounds?|lbs?)')
+AGE_PATTERN = re.compile(r'(?P<value>\d+)\s*(?:years?|y\.?o\.?|yo)')
+
+
+def extract_spans(text: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Span index of a lowercased guideline text
+
+    Matches are listed pattern by pattern, each in text order (the order the
+    extractors consume them); start/end are offsets into text.
+    """
+    doses = []
+    for drug, patterns in DOSE_PATTERNS.items():
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                min_dose = float(match.group('min'))
+                max_group = match.groupdict().get('max')
+                doses.append({
+                    'drug': drug,
+                    'min': min_dose,
+                    'max': float(max_group) if max_group else min_dose,
+                    'unit': match.group('unit'),
+                    'start': match.start(),
+                    'end': match.end()
+                })
+
+    steps = []
+    for pattern in STEP_PATTERNS:
+        for match in pattern.finditer(text):
+            steps.append({
+                'number': match.groupdict().get('number'),
+                'text': match.group('text').strip(),
+                'start': match.start(),
+                'end': match.end()
+            })
+
+    criteria = []
+    for pattern in CRITERIA_PATTERNS:
+        for match in pattern.finditer(text):
+            criteria.append({
+                'text': match.group('text').strip(),
+                'start': match.start(),
+                'end': match.end()
+            })
+
+    return {'doses': doses, 'steps': steps, 'criteria': criteria}
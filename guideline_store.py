@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Lazy Guideline Store
+Keeps only a small catalog and memory-mapped term indexes of the JTS guideline
+library resident; guideline bodies are read on demand into a size-bounded LRU,
+and dose/step/criteria spans are extracted once at build time
+
+Usage:
+    python3 guideline_store.py [jts_data]    # build (or refresh) the indexes
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import logging
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bm25_index import InvertedBM25, MappedBM25Index, tokenize, write_index_file
+from corpus_io import PathLike, find_category_files, iter_keyed_records
+from guideline_spans import SPAN_VERSION, extract_spans
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 2
+CATALOG_FILE = "guidelines.catalog.json"
+FULL_TEXT_INDEX_FILE = "guidelines.fulltext.bm25"
+SECTION_INDEX_FILE = "guidelines.sections.bm25"
+SPANS_FILE = "guidelines.spans.jsonl"
+
+# Text of guideline bodies kept in memory at once
+GUIDELINE_CACHE_BYTES = 4 * 1024 * 1024
+# Span indexes kept in memory at once (they are small; a query reads up to three)
+SPAN_CACHE_SIZE = 64
+
+
+def _fingerprint(category_files: Dict[str, Path]) -> str:
+    """Cheap change detector for the category files (name, size, mtime), stored in every index"""
+    stats = [(category, path.name, path.stat().st_size, path.stat().st_mtime_ns)
+             for category, path in sorted(category_files.items())]
+    stats.append([CATALOG_VERSION, SPAN_VERSION])
+    return hashlib.sha256(json.dumps(stats).encode('utf-8')).hexdigest()
+
+
+def _iter_with_offsets(path: Path) -> Iterator[Tuple[str, Dict[str, Any], Optional[int]]]:
+    """(filename, record, byte offset) for a category file; offsets only for plain JSONL"""
+    if path.suffix == '.jsonl':
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record.pop('id'), record, offset
+                offset += len(line)
+        return
+    for filename, record in iter_keyed_records(path):
+        yield filename, record, None
+
+
+def _text_bytes(record: Dict[str, Any]) -> int:
+    """Approximate memory held by a guideline body: its full text and sections"""
+    return len(record.get('full_text', '')) + sum(len(text) for text in record.get('sections', {}).values())
+
+
+def build_guideline_indexes(directory: PathLike) -> None:
+    """
+    Write the catalog, the two term indexes and the span file for a guideline directory
+
+    Catalog: one entry per guideline (category, filename, size, body size, JSONL
+    offset, span offset, section names). The full-text index has one document per
+    guideline, the section index one per section, numbered in catalog order. The
+    span file has one line per guideline (see guideline_spans.extract_spans()).
+    """
+    directory = Path(directory)
+    category_files = find_category_files(directory)
+    fingerprint = _fingerprint(category_files)
+
+    docs: List[Dict[str, Any]] = []
+    spans_path = directory / SPANS_FILE
+    spans_tmp_path = str(spans_path) + '.tmp'
+    spans_file = open(spans_tmp_path, 'wb')
+
+    def full_texts():
+        for category, path in category_files.items():
+            for filename, record, offset in _iter_with_offsets(path):
+                full_text = record.get('full_text', '')
+                docs.append({
+                    'category': category,
+                    'filename': filename,
+                    'size_bytes': record.get('size_bytes', 0),
+                    'text_bytes': _text_bytes(record),
+                    'offset': offset,
+                    'spans_offset': spans_file.tell(),
+                    'sections': list(record.get('sections', {}))
+                })
+                spans_file.write(json.dumps(extract_spans(full_text.lower()), ensure_ascii=False).encode('utf-8') + b'\n')
+                yield tokenize(full_text)
+
+    def sections():
+        for path in category_files.values():
+            for _, record, _ in _iter_with_offsets(path):
+                for text in record.get('sections', {}).values():
+                    yield tokenize(text)
+
+    # Postings are only used for membership and counts, so IDFs are left unfloored
+    with spans_file:
+        write_index_file(InvertedBM25(full_texts(), epsilon=None), str(directory / FULL_TEXT_INDEX_FILE), fingerprint)
+    os.replace(spans_tmp_path, spans_path)
+    write_index_file(InvertedBM25(sections(), epsilon=None), str(directory / SECTION_INDEX_FILE), fingerprint)
+
+    catalog_path = directory / CATALOG_FILE
+    tmp_path = str(catalog_path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CATALOG_VERSION, 'fingerprint': fingerprint,
+                   'files': {category: path.name for category, path in category_files.items()},
+                   'docs': docs}, f, ensure_ascii=False)
+    os.replace(tmp_path, catalog_path)
+    logger.info(f"Guideline catalog written to {catalog_path}: {len(docs)} guidelines")
+
+
+class GuidelineStore:
+    """
+    Catalog, term indexes and an LRU of guideline bodies for one directory
+
+    Doc ids number the guidelines in catalog order (category file order, then file
+    order). Bodies are read on demand: a single line for plain JSONL files, the
+    whole category for legacy JSON (every record parsed is cached). Span indexes
+    are read a line at a time from the span file.
+    """
+
+    def __init__(self, directory: PathLike, cache_bytes: int = GUIDELINE_CACHE_BYTES):
+        self.directory = Path(directory)
+        self.cache_bytes = cache_bytes
+        category_files = find_category_files(self.directory)
+        fingerprint = _fingerprint(category_files)
+
+        catalog = self._load_catalog(fingerprint)
+        if catalog is None:
+            logger.info(f"Building guideline indexes for {self.directory}...")
+            build_guideline_indexes(self.directory)
+            catalog = self._load_catalog(fingerprint)
+
+        self.category_files = {category: self.directory / name for category, name in catalog['files'].items()}
+        self.docs: List[Dict[str, Any]] = catalog['docs']
+        self.doc_ids: Dict[Tuple[str, str], int] = {
+            (doc['category'], doc['filename']): doc_id for doc_id, doc in enumerate(self.docs)
+        }
+        self.categories: Dict[str, List[str]] = {category: [] for category in self.category_files}
+        for doc in self.docs:
+            self.categories[doc['category']].append(doc['filename'])
+        # Section ids of each guideline start here (see build_guideline_indexes())
+        self.first_section: List[int] = []
+        total = 0
+        for doc in self.docs:
+            self.first_section.append(total)
+            total += len(doc['sections'])
+
+        self.full_text_index = MappedBM25Index(str(self.directory / FULL_TEXT_INDEX_FILE))
+        self.section_index = MappedBM25Index(str(self.directory / SECTION_INDEX_FILE))
+
+        self._cache: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._cached_bytes = 0
+        self._spans: "OrderedDict[int, Dict[str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _load_catalog(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The catalog if it and both indexes were built from the current files"""
+        catalog_path = self.directory / CATALOG_FILE
+        if not catalog_path.exists() or not (self.directory / SPANS_FILE).exists():
+            return None
+        try:
+            with open(catalog_path, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+            if catalog.get('version') != CATALOG_VERSION or catalog.get('fingerprint') != fingerprint:
+                logger.info(f"Guideline catalog {catalog_path} is stale, rebuilding")
+                return None
+            for name in (FULL_TEXT_INDEX_FILE, SECTION_INDEX_FILE):
+                with MappedBM25Index(str(self.directory / name)) as index:
+                    if index.corpus_hash != fingerprint:
+                        return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable guideline catalog {catalog_path}: {e}")
+            return None
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def section_ids(self, doc_id: int) -> range:
+        """Section ids of a guideline, in section order"""
+        return range(self.first_section[doc_id], self.first_section[doc_id] + len(self.docs[doc_id]['sections']))
+
+    def section_doc(self, section_id: int) -> Tuple[int, int]:
+        """(doc id, section index) of a section id"""
+        # Guidelines without sections share their start with the next one; bisect_right skips them
+        doc_id = bisect_right(self.first_section, section_id) - 1
+        return doc_id, section_id - self.first_section[doc_id]
+
+    def get(self, doc_id: int) -> Dict[str, Any]:
+        """Body of a guideline, read from disk if it is not cached"""
+        with self._lock:
+            record = self._cache.get(doc_id)
+            if record is not None:
+                self._cache.move_to_end(doc_id)
+                return record
+
+        doc = self.docs[doc_id]
+        path = self.category_files[doc['category']]
+        self.loads += 1
+        if doc['offset'] is not None:
+            with open(path, 'rb') as f:
+                f.seek(doc['offset'])
+                record = json.loads(f.readline())
+            record.pop('id', None)
+            self._remember(doc_id, record)
+        else:
+            for filename, parsed in iter_keyed_records(path):
+                other_id = self.doc_ids[(doc['category'], filename)]
+                if other_id == doc_id:
+                    record = parsed
+                else:
+                    self._remember(other_id, parsed)
+            self._remember(doc_id, record)
+        return record
+
+    def spans(self, doc_id: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Precomputed dose, step and criteria spans of a guideline"""
+        with self._lock:
+            spans = self._spans.get(doc_id)
+            if spans is not None:
+                self._spans.move_to_end(doc_id)
+                return spans
+
+        with open(self.directory / SPANS_FILE, 'rb') as f:
+            f.seek(self.docs[doc_id]['spans_offset'])
+            spans = json.loads(f.readline())
+        with self._lock:
+            self._spans[doc_id] = spans
+            if len(self._spans) > SPAN_CACHE_SIZE:
+                self._spans.popitem(last=False)
+        return spans
+
+    def _remember(self, doc_id: int, record: Dict[str, Any]) -> None:
+        """Cache a body, evicting the least recently used ones over the byte budget"""
+        with self._lock:
+            if doc_id in self._cache:
+                return
+            self._cache[doc_id] = record
+            self._cached_bytes += self.docs[doc_id]['text_bytes']
+            while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                evicted, _ = self._cache.popitem(last=False)
+                self._cached_bytes -= self.docs[evicted]['text_bytes']
+
+    def close(self) -> None:
+        """Release the memory maps"""
+        self.full_text_index.close()
+        self.section_index.close()
+
+
+class GuidelineCategory(Mapping):
+    """filename -> guideline body for one category, read through the store's cache"""
+
+    def __init__(self, store: GuidelineStore, category: str):
+        self._store = store
+        self.category = category
+
+    def __getitem__(self, filename: str) -> Dict[str, Any]:
+        doc_id = self._store.doc_ids.get((self.category, filename))
+        if doc_id is None:
+            raise KeyError(filename)
+        return self._store.get(doc_id)
+
+    def __contains__(self, filename: object) -> bool:
+        return (self.category, filename) in self._store.doc_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.categories[self.category])
+
+    def __len__(self) -> int:
+        return len(self._store.categories[self.category])
+
+
+class GuidelineLibrary(Mapping):
+    """category -> GuidelineCategory, the lazy stand-in for the old nested dict of guidelines"""
+
+    def __init__(self, store: GuidelineStore):
+        self._store = store
+        self._categories = {category: GuidelineCategory(store, category) for category in store.categories}
+
+    def __getitem__(self, category: str) -> GuidelineCategory:
+        return self._categories[category]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._categories)
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+
+def main():
+    """Build (or refresh) the guideline catalog and indexes"""
+    logging.basicConfig(level=logging.INFO)
+    directory = sys.argv[1] if len(sys.argv) > 1 else "jts_data"
+    store = GuidelineStore(directory)
+    print(f"✅ {len(store)} guidelines in {len(store.categories)} categories, "
+          f"{store.full_text_index.num_terms} terms indexed")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
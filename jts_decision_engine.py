@@ -9,20 +9,31 @@ import json
 import re
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
 import logging
 from difflib import get_close_matches
+from dose_calculator import DoseRange, to_kg, weight_based_dose
+from guideline_spans import AGE_PATTERN, WEIGHT_PATTERN, extract_spans
+from guideline_store import GuidelineLibrary, GuidelineStore
+from topk import select_top_k
 
 # Add system Python packages to path for PyPDF2
 sys.path.append('/Users/andrew/Library/Python/3.9/lib/python/site-packages')
 
 logger = logging.getLogger(__name__)
 
+# Search-term -> matching vocabulary expansions remembered between queries
+TERM_CACHE_SIZE = 1024
+
 class JTSDecisionEngine:
     def __init__(self, data_directory: str = "jts_data"):
         self.data_directory = Path(data_directory)
         self.guidelines = {}
         self.metadata = {}
+        # Catalog, term indexes and body cache, see guideline_store.py
+        self.store: Optional[GuidelineStore] = None
+        self._term_tokens: Dict[str, Tuple[List[str], List[str]]] = {}
         self.load_guidelines()
         
         # Clinical decision patterns
@@ -35,7 +46,7 @@ class JTSDecisionEngine:
         }
     
     def load_guidelines(self):
-        """Load processed JTS guidelines"""
+        """Load the guideline catalog; bodies are read on demand (JSONL from jts_processor.py, or legacy JSON)"""
         if not self.data_directory.exists():
             logger.warning(f"JTS data directory {self.data_directory} not found")
             return
@@ -46,13 +57,55 @@ class JTSDecisionEngine:
             with open(metadata_file, 'r') as f:
                 self.metadata = json.load(f)
         
-        # Load guidelines by category
-        for category_file in self.data_directory.glob("*_guidelines.json"):
-            category = category_file.stem.replace("_guidelines", "")
-            with open(category_file, 'r', encoding='utf-8') as f:
-                self.guidelines[category] = json.load(f)
+        self.store = GuidelineStore(self.data_directory)
+        self.guidelines = GuidelineLibrary(self.store)
+        self._term_tokens = {}
         
-        logger.info(f"Loaded {len(self.guidelines)} categories of guidelines")
+        logger.info(f"Loaded {len(self.guidelines)} categories of guidelines ({len(self.store)} files, bodies on demand)")
+    
+    def _tokens_containing(self, word: str) -> Tuple[List[str], List[str]]:
+        """
+        Indexed full-text and section tokens that contain word
+
+        Whitespace never occurs inside a token, so a word is a substring of a text
+        exactly when it is a substring of one of the text's tokens.
+        """
+        tokens = self._term_tokens.get(word)
+        if tokens is None:
+            tokens = (self.store.full_text_index.terms_containing(word),
+                      self.store.section_index.terms_containing(word))
+            if len(self._term_tokens) >= TERM_CACHE_SIZE:
+                self._term_tokens.clear()
+            self._term_tokens[word] = tokens
+        return tokens
+    
+    def _match_term(self, term: str) -> Tuple[Set[int], Set[int]]:
+        """Ids of the guidelines whose full text contains term, and of the sections that do"""
+        words = term.split()
+        if not words:  # The empty string is in everything
+            return set(range(len(self.store))), set(range(self.store.section_index.corpus_size))
+        
+        full_text: Optional[Set[int]] = None
+        sections: Optional[Set[int]] = None
+        for word in words:
+            text_tokens, section_tokens = self._tokens_containing(word)
+            word_docs = {doc_id for token in text_tokens
+                         for doc_id in self.store.full_text_index.term_postings(token)[0]}
+            word_sections = {section_id for token in section_tokens
+                             for section_id in self.store.section_index.term_postings(token)[0]}
+            full_text = word_docs if full_text is None else full_text & word_docs
+            sections = word_sections if sections is None else sections & word_sections
+        
+        if len(words) > 1 or term != words[0]:
+            # Phrase: every word occurs, now check the exact text of the few candidates
+            full_text = {doc_id for doc_id in full_text
+                         if term in self.store.get(doc_id).get('full_text', '').lower()}
+            sections = {section_id for section_id in sections if term in self._section_text(section_id).lower()}
+        return full_text, sections
+    
+    def _section_text(self, section_id: int) -> str:
+        doc_id, section_index = self.store.section_doc(section_id)
+        return self.store.get(doc_id)['sections'][self.store.docs[doc_id]['sections'][section_index]]
     
     def search_guidelines(self, query: str, category: Optional[str] = None) -> List[Dict]:
         """Search guidelines for relevant information"""
@@ -76,45 +129,38 @@ class JTSDecisionEngine:
         if not search_terms:
             search_terms = [query_lower]
         
-        # Determine relevant categories
-        search_categories = [category] if category else list(self.guidelines.keys())
-        
-        for cat in search_categories:
-            if cat not in self.guidelines:
-                continue
-            
-            for filename, content in self.guidelines[cat].items():
-                relevance_score = 0
-                matched_sections = []
-                
-                # Search for each term
-                for term in search_terms:
-                    # Search in sections
-                    for section_name, section_content in content.get('sections', {}).items():
-                        if term in section_content.lower():
-                            relevance_score += 2
-                            matched_sections.append(section_name)
-                    
-                    # Search in full text
-                    if term in content.get('full_text', '').lower():
-                        relevance_score += 1
-                    
-                    # Search in filename
-                    if term in filename.lower():
-                        relevance_score += 3
-                
-                if relevance_score > 0:
-                    results.append({
-                        'filename': filename,
-                        'category': cat,
-                        'relevance_score': relevance_score,
-                        'matched_sections': matched_sections,
-                        'content': content
-                    })
-        
-        # Sort by relevance
-        results.sort(key=lambda x: x['relevance_score'], reverse=True)
-        return results[:5]  # Return top 5 results
+        if self.store is None:
+            return []
+        
+        # Score by merging the postings of each term (same scores as scanning every text)
+        scores: Dict[int, int] = defaultdict(int)
+        matched_sections: Dict[int, List[str]] = defaultdict(list)
+        for term in search_terms:
+            full_text, sections = self._match_term(term)
+            for section_id in sorted(sections):
+                doc_id, section_index = self.store.section_doc(section_id)
+                scores[doc_id] += 2
+                matched_sections[doc_id].append(self.store.docs[doc_id]['sections'][section_index])
+            for doc_id in full_text:
+                scores[doc_id] += 1
+            for doc_id, doc in enumerate(self.store.docs):
+                if term in doc['filename'].lower():
+                    scores[doc_id] += 3
+        
+        candidates = [doc_id for doc_id in sorted(scores)
+                      if not category or self.store.docs[doc_id]['category'] == category]
+        
+        # Top 5 by relevance; only their bodies are read
+        for doc_id in select_top_k(candidates, 5, key=lambda doc_id: scores[doc_id]):
+            doc = self.store.docs[doc_id]
+            results.append({
+                'filename': doc['filename'],
+                'category': doc['category'],
+                'relevance_score': scores[doc_id],
+                'matched_sections': matched_sections[doc_id],
+                'content': self.store.get(doc_id)
+            })
+        return results
     
     def extract_clinical_decision(self, query: str) -> Dict:
         """Extract clinical decision from voice query"""
@@ -137,9 +183,10 @@ class JTSDecisionEngine:
         recommendations = []
         for result in results[:3]:  # Top 3 results
             content = result['content']
+            spans = self.store.spans(self.store.doc_ids[(result['category'], result['filename'])])
             
             # Extract specific clinical actions and dosages
-            clinical_actions = self.extract_clinical_actions(content, query, patient_params)
+            clinical_actions = self.extract_clinical_actions(content, query, patient_params, spans)
             
             recommendations.append({
                 'source': result['filename'],
@@ -159,23 +206,21 @@ class JTSDecisionEngine:
     
     def extract_patient_parameters(self, query: str) -> Dict:
         """Extract patient parameters from query"""
-        import re
-        
         params = {}
         
         # Extract weight
-        weight_match = re.search(r'(\d+)\s*(?:kg|kilos?|pounds?|lbs?)', query.lower())
+        weight_match = WEIGHT_PATTERN.search(query.lower())
         if weight_match:
-            weight = int(weight_match.group(1))
+            weight = int(weight_match.group('value'))
             # Convert pounds to kg if needed
             if any(unit in query.lower() for unit in ['pound', 'lbs', 'lb']):
-                weight = weight * 0.453592
+                weight = to_kg(weight, 'lb')
             params['weight_kg'] = weight
         
         # Extract age
-        age_match = re.search(r'(\d+)\s*(?:years?|y\.?o\.?|yo)', query.lower())
+        age_match = AGE_PATTERN.search(query.lower())
         if age_match:
-            params['age_years'] = int(age_match.group(1))
+            params['age_years'] = int(age_match.group('value'))
         
         # Extract other parameters
         if 'burn' in query.lower():
@@ -187,25 +232,27 @@ class JTSDecisionEngine:
         
         return params
     
-    def extract_clinical_actions(self, content: Dict, query: str, patient_params: Dict) -> List[Dict]:
-        """Extract specific clinical actions and dosages"""
+    def extract_clinical_actions(self, content: Dict, query: str, patient_params: Dict,
+                                 spans: Optional[Dict] = None) -> List[Dict]:
+        """Extract specific clinical actions and dosages (spans: the guideline's precomputed span index)"""
         actions = []
-        text = content.get('full_text', '').lower()
+        if spans is None:
+            spans = extract_spans(content.get('full_text', '').lower())
         query_lower = query.lower()
         
         # Look for medication dosages
         if any(med in query_lower for med in ['ketamine', 'morphine', 'fentanyl', 'midazolam']):
-            med_actions = self.extract_medication_dosages(text, query, patient_params)
+            med_actions = self.extract_medication_dosages(spans, query, patient_params)
             actions.extend(med_actions)
         
         # Look for procedural steps
         if any(proc in query_lower for proc in ['airway', 'intubation', 'cpr', 'resuscitation']):
-            proc_actions = self.extract_procedural_steps(text, query)
+            proc_actions = self.extract_procedural_steps(spans, query)
             actions.extend(proc_actions)
         
         # Look for assessment criteria
         if any(assess in query_lower for assess in ['assess', 'evaluate', 'check', 'examine']):
-            assess_actions = self.extract_assessment_criteria(text, query)
+            assess_actions = self.extract_assessment_criteria(spans, query)
             actions.extend(assess_actions)
         
         # For airway queries, prioritize decision trees over guideline extraction
@@ -269,62 +316,48 @@ class JTSDecisionEngine:
         
         return actions
     
-    def extract_medication_dosages(self, text: str, query: str, patient_params: Dict) -> List[Dict]:
+    def extract_medication_dosages(self, spans: Dict, query: str, patient_params: Dict) -> List[Dict]:
         """Extract and calculate medication dosages"""
         actions = []
         
         # Ketamine dosing patterns
         if 'ketamine' in query.lower():
-            # Look for ketamine dosage patterns in text
-            import re
-            
-            # Common ketamine dosing patterns - more specific to avoid false positives
-            patterns = [
-                r'ketamine\s*\(?\s*(\d+(?:\.\d+)?)\s*mg/kg\s*\)?',
-                r'(\d+(?:\.\d+)?)\s*mg/kg\s*ketamine',
-                r'ketamine\s*(\d+(?:\.\d+)?)\s*to\s*(\d+(?:\.\d+)?)\s*mg/kg',
-                r'(\d+(?:\.\d+)?)\s*to\s*(\d+(?:\.\d+)?)\s*mg/kg\s*ketamine'
-            ]
-            
+            # Ketamine doses found in the guideline (see guideline_spans.DOSE_PATTERNS)
             found_dosage = False
-            for pattern in patterns:
-                matches = re.findall(pattern, text)
-                for match in matches:
-                    if isinstance(match, tuple):
-                        min_dose = float(match[0])
-                        max_dose = float(match[1]) if len(match) > 1 else min_dose
-                    else:
-                        min_dose = max_dose = float(match)
-                    
-                    # Validate dosage ranges (reasonable ketamine dosing)
-                    if min_dose < 0.1 or max_dose > 10.0:
-                        continue  # Skip unreasonable dosages
+            for dose in spans['doses']:
+                if dose['drug'] != 'ketamine':
+                    continue
+                min_dose = dose['min']
+                max_dose = dose['max']
+                
+                # Validate dosage ranges (reasonable ketamine dosing)
+                if min_dose < 0.1 or max_dose > 10.0:
+                    continue  # Skip unreasonable dosages
+                
+                found_dosage = True
+                # Calculate actual dose if weight is provided
+                if 'weight_kg' in patient_params:
+                    weight = patient_params['weight_kg']
+                    total = weight_based_dose(DoseRange(min_dose, max_dose), weight)
                     
-                    found_dosage = True
-                    # Calculate actual dose if weight is provided
-                    if 'weight_kg' in patient_params:
-                        weight = patient_params['weight_kg']
-                        actual_min = min_dose * weight
-                        actual_max = max_dose * weight
-                        
-                        actions.append({
-                            'type': 'medication_dosage',
-                            'medication': 'ketamine',
-                            'dose_range_mg_kg': f"{min_dose}-{max_dose}",
-                            'calculated_dose_mg': f"{int(actual_min)}-{int(actual_max)}",
-                            'patient_weight_kg': weight,
-                            'route': 'IV/IM',
-                            'frequency': 'as needed for pain',
-                            'source': 'guideline'
-                        })
-                    else:
-                        actions.append({
-                            'type': 'medication_dosage',
-                            'medication': 'ketamine',
-                            'dose_range_mg_kg': f"{min_dose}-{max_dose}",
-                            'note': 'Patient weight needed for exact calculation',
-                            'source': 'guideline'
-                        })
+                    actions.append({
+                        'type': 'medication_dosage',
+                        'medication': 'ketamine',
+                        'dose_range_mg_kg': f"{min_dose}-{max_dose}",
+                        'calculated_dose_mg': f"{int(total.low)}-{int(total.high)}",
+                        'patient_weight_kg': weight,
+                        'route': 'IV/IM',
+                        'frequency': 'as needed for pain',
+                        'source': 'guideline'
+                    })
+                else:
+                    actions.append({
+                        'type': 'medication_dosage',
+                        'medication': 'ketamine',
+                        'dose_range_mg_kg': f"{min_dose}-{max_dose}",
+                        'note': 'Patient weight needed for exact calculation',
+                        'source': 'guideline'
+                    })
             
             # Fallback to standard dosing if no specific dosage found in guidelines
             if not found_dosage and 'weight_kg' in patient_params:
@@ -335,14 +368,13 @@ class JTSDecisionEngine:
                     # Pain management dosing
                     min_dose = 0.5  # mg/kg
                     max_dose = 1.0  # mg/kg
-                    actual_min = min_dose * weight
-                    actual_max = max_dose * weight
+                    total = weight_based_dose(DoseRange(min_dose, max_dose), weight)
                     
                     actions.append({
                         'type': 'medication_dosage',
                         'medication': 'ketamine',
                         'dose_range_mg_kg': f"{min_dose}-{max_dose}",
-                        'calculated_dose_mg': f"{int(actual_min)}-{int(actual_max)}",
+                        'calculated_dose_mg': f"{int(total.low)}-{int(total.high)}",
                         'patient_weight_kg': weight,
                         'route': 'IV/IM',
                         'frequency': 'as needed for pain',
@@ -353,14 +385,13 @@ class JTSDecisionEngine:
                     # General anesthesia dosing
                     min_dose = 1.0  # mg/kg
                     max_dose = 2.0  # mg/kg
-                    actual_min = min_dose * weight
-                    actual_max = max_dose * weight
+                    total = weight_based_dose(DoseRange(min_dose, max_dose), weight)
                     
                     actions.append({
                         'type': 'medication_dosage',
                         'medication': 'ketamine',
                         'dose_range_mg_kg': f"{min_dose}-{max_dose}",
-                        'calculated_dose_mg': f"{int(actual_min)}-{int(actual_max)}",
+                        'calculated_dose_mg': f"{int(total.low)}-{int(total.high)}",
                         'patient_weight_kg': weight,
                         'route': 'IV/IM',
                         'frequency': 'single dose',
@@ -370,18 +401,10 @@ class JTSDecisionEngine:
         
         return actions
     
-    def extract_procedural_steps(self, text: str, query: str) -> List[Dict]:
+    def extract_procedural_steps(self, spans: Dict, query: str) -> List[Dict]:
         """Extract procedural steps"""
         actions = []
         
-        # Look for numbered steps or bullet points
-        import re
-        step_patterns = [
-            r'(\d+)\.\s*([^.\n]+)',
-            r'•\s*([^.\n]+)',
-            r'-\s*([^.\n]+)'
-        ]
-        
         # Keywords that indicate critical steps
         critical_keywords = [
             'assess', 'check', 'evaluate', 'examine', 'look for',
@@ -396,71 +419,56 @@ class JTSDecisionEngine:
             'adapted', 'transmit', 'photograph', 'algorithm'
         ]
         
-        for pattern in step_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if isinstance(match, tuple):
-                    step_num = match[0]
-                    step_desc = match[1].strip()
-                else:
-                    step_desc = match.strip()
-                
-                # Skip if contains exclude keywords (metadata)
-                step_lower = step_desc.lower()
-                if any(exclude in step_lower for exclude in exclude_keywords):
-                    continue
-                
-                # Calculate priority score
-                priority_score = 0
-                
-                # Critical keywords get highest priority
-                if any(keyword in step_lower for keyword in critical_keywords):
-                    priority_score += 3
-                
-                # Emergency/urgent words
-                if any(word in step_lower for word in ['emergency', 'urgent', 'immediate', 'critical']):
-                    priority_score += 2
-                
-                # Airway-specific priority
-                if 'airway' in query.lower() and any(word in step_lower for word in ['airway', 'intubate', 'ventilate']):
-                    priority_score += 2
-                
-                # Medication-specific priority
-                if any(med in query.lower() for med in ['ketamine', 'morphine', 'fentanyl']) and any(med in step_lower for med in ['ketamine', 'morphine', 'fentanyl']):
-                    priority_score += 2
-                
-                actions.append({
-                    'type': 'procedural_step',
-                    'description': step_desc,
-                    'priority_score': priority_score,
-                    'priority': 'critical' if priority_score >= 3 else 'urgent' if priority_score >= 2 else 'standard'
-                })
+        # Numbered steps and bullet points found in the guideline (see guideline_spans.STEP_PATTERNS)
+        for step in spans['steps']:
+            step_desc = step['text']
+            
+            # Skip if contains exclude keywords (metadata)
+            step_lower = step_desc.lower()
+            if any(exclude in step_lower for exclude in exclude_keywords):
+                continue
+            
+            # Calculate priority score
+            priority_score = 0
+            
+            # Critical keywords get highest priority
+            if any(keyword in step_lower for keyword in critical_keywords):
+                priority_score += 3
+            
+            # Emergency/urgent words
+            if any(word in step_lower for word in ['emergency', 'urgent', 'immediate', 'critical']):
+                priority_score += 2
+            
+            # Airway-specific priority
+            if 'airway' in query.lower() and any(word in step_lower for word in ['airway', 'intubate', 'ventilate']):
+                priority_score += 2
+            
+            # Medication-specific priority
+            if any(med in query.lower() for med in ['ketamine', 'morphine', 'fentanyl']) and any(med in step_lower for med in ['ketamine', 'morphine', 'fentanyl']):
+                priority_score += 2
+            
+            actions.append({
+                'type': 'procedural_step',
+                'description': step_desc,
+                'priority_score': priority_score,
+                'priority': 'critical' if priority_score >= 3 else 'urgent' if priority_score >= 2 else 'standard'
+            })
         
         # Sort by priority score and return only top 2-3
         actions.sort(key=lambda x: x['priority_score'], reverse=True)
         return actions[:3]  # Limit to top 3 most critical steps
     
-    def extract_assessment_criteria(self, text: str, query: str) -> List[Dict]:
+    def extract_assessment_criteria(self, spans: Dict, query: str) -> List[Dict]:
         """Extract assessment criteria"""
         actions = []
         
-        # Look for assessment criteria
-        import re
-        criteria_patterns = [
-            r'check\s+for\s+([^.\n]+)',
-            r'assess\s+([^.\n]+)',
-            r'evaluate\s+([^.\n]+)',
-            r'look\s+for\s+([^.\n]+)'
-        ]
-        
-        for pattern in criteria_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                actions.append({
-                    'type': 'assessment_criteria',
-                    'criteria': match.strip(),
-                    'priority': 'critical' if any(word in match.lower() for word in ['airway', 'breathing', 'circulation']) else 'standard'
-                })
+        # Assessment criteria found in the guideline (see guideline_spans.CRITERIA_PATTERNS)
+        for criterion in spans['criteria']:
+            actions.append({
+                'type': 'assessment_criteria',
+                'criteria': criterion['text'],
+                'priority': 'critical' if any(word in criterion['text'] for word in ['airway', 'breathing', 'circulation']) else 'standard'
+            })
         
         return actions[:3]  # Limit to top 3 criteria
     
@@ -547,8 +555,9 @@ class JTSDecisionEngine:
         if category not in self.guidelines:
             return {}
         
+        # Sizes come from the catalog, so no guideline body is read
         files = self.guidelines[category]
-        total_size = sum(f['size_bytes'] for f in files.values())
+        total_size = sum(self.store.docs[self.store.doc_ids[(category, filename)]]['size_bytes'] for filename in files)
         
         return {
             'category': category,
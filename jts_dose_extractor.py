@@ -1,132 +1,62 @@
 #!/usr/bin/env python3
 """
 JTS Dose Extractor
-Uses BM25 to find specific medication dosing information
+Looks up medication doses in the corpus dose table, and procedures with BM25
 """
 
-import json
-from rank_bm25 import BM25Okapi
-import re
+from corpus_index import get_corpus_index
+from dose_calculator import DoseRange, dose_cap, weight_based_dose
+from dose_table import dose_range, dose_unit, get_dose_table
 
 class JTSDoseExtractor:
-    def __init__(self, corpus_file="jts_corpus.json"):
-        """Initialize with JTS corpus file"""
+    def __init__(self, corpus_file=None):
+        """Initialize with JTS corpus file (defaults to the shared preferred corpus)"""
         self.corpus_file = corpus_file
+        self.corpus_index = None
         self.paragraphs = []
         self.bm25 = None
         self.load_corpus()
-        self.build_index()
     
     def load_corpus(self):
-        """Load paragraphs from JSON corpus file"""
-        print(f"📚 Loading JTS corpus from {self.corpus_file}...")
+        """Attach to the process-wide corpus and BM25 index (loaded once, see corpus_index.py)"""
+        print(f"📚 Loading JTS corpus from {self.corpus_file or 'default corpus'}...")
         try:
-            with open(self.corpus_file, 'r', encoding='utf-8') as f:
-                self.paragraphs = json.load(f)
-            print(f"✅ Loaded {len(self.paragraphs)} paragraphs")
+            self.corpus_index = get_corpus_index(self.corpus_file)
         except Exception as e:
             print(f"❌ Error loading corpus: {e}")
-            self.paragraphs = []
-    
-    def build_index(self):
-        """Build BM25 index from paragraphs"""
-        if not self.paragraphs:
-            print("❌ No paragraphs to index")
             return
         
-        print("🔍 Building BM25 index...")
-        
-        # Tokenize paragraphs
-        tokenized = []
-        for p in self.paragraphs:
-            # Clean and tokenize text
-            text = p["text"].lower()
-            # Remove extra whitespace and split
-            tokens = re.sub(r'\s+', ' ', text).strip().split()
-            tokenized.append(tokens)
-        
-        # Build BM25 index
-        self.bm25 = BM25Okapi(tokenized)
-        print("✅ BM25 index built successfully")
+        self.corpus_file = self.corpus_index.corpus_file
+        self.paragraphs = self.corpus_index.documents
+        self.bm25 = self.corpus_index.bm25
+        print(f"✅ Loaded {len(self.paragraphs)} paragraphs with BM25 index")
     
     def extract_ketamine_dose(self, weight_kg=None):
         """Extract ketamine dosing information"""
-        query = "ketamine dose mg/kg"
-        results = self.bm25.get_top_n(query.split(), self.paragraphs, n=5)
-        
-        print(f"🔍 Ketamine dosing information:")
-        print("=" * 50)
-        
-        for i, result in enumerate(results, 1):
-            text = result['text']
-            source = result['source']
-            page = result['page']
-            
-            # Look for dosing patterns
-            dose_patterns = [
-                r'(\d+(?:\.\d+)?)\s*mg/kg',
-                r'ketamine.*?(\d+(?:\.\d+)?)\s*mg',
-                r'(\d+(?:\.\d+)?)\s*mg.*?ketamine'
-            ]
-            
-            for pattern in dose_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    print(f"\n📋 Result {i} (Source: {source}, Page: {page}):")
-                    print(f"   Dose found: {matches[0]} mg/kg")
-                    
-                    if weight_kg:
-                        try:
-                            dose_mg = float(matches[0]) * weight_kg
-                            print(f"   For {weight_kg} kg patient: {dose_mg:.1f} mg")
-                        except ValueError:
-                            pass
-                    
-                    # Extract the relevant sentence
-                    sentences = text.split('.')
-                    for sentence in sentences:
-                        if 'ketamine' in sentence.lower() and any(match in sentence for match in matches):
-                            print(f"   Context: {sentence.strip()}")
-                            break
-                    break
-        
-        return results
+        return self._show_doses('ketamine', "Ketamine", weight_kg)
     
     def extract_txa_dose(self):
         """Extract TXA dosing information"""
-        query = "tranexamic acid TXA dose"
-        results = self.bm25.get_top_n(query.split(), self.paragraphs, n=5)
+        return self._show_doses('txa', "\nTXA")
+    
+    def _show_doses(self, drug, label, weight_kg=None):
+        """Print the first doses the corpus dose table has for a drug (see dose_table.py)"""
+        records = get_dose_table().lookup(drug)[:5]
         
-        print(f"\n🔍 TXA dosing information:")
+        print(f"🔍 {label} dosing information:")
         print("=" * 50)
         
-        for i, result in enumerate(results, 1):
-            text = result['text']
-            source = result['source']
-            page = result['page']
+        for i, record in enumerate(records, 1):
+            print(f"\n📋 Result {i} (Source: {record['source']}, Page: {record['page']}):")
+            print(f"   Dose found: {dose_range(record)} {dose_unit(record)} ({record['population']}, {record['indication']})")
             
-            # Look for TXA dosing patterns
-            dose_patterns = [
-                r'(\d+)\s*(?:mg|g).*?tranexamic',
-                r'tranexamic.*?(\d+)\s*(?:mg|g)',
-                r'(\d+)\s*(?:mg|g).*?TXA'
-            ]
+            if weight_kg and record['per_kg']:
+                total = weight_based_dose(DoseRange(record['dose_min'], record['dose_max']), weight_kg, dose_cap(record, weight_kg))
+                print(f"   For {weight_kg} kg patient: {total.rounded(1)} {dose_unit(record).replace('/kg', '')}")
             
-            for pattern in dose_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    print(f"\n📋 Result {i} (Source: {source}, Page: {page}):")
-                    print(f"   Dose found: {matches[0]} mg")
-                    
-                    # Extract the relevant sentence
-                    sentences = text.split('.')
-                    for sentence in sentences:
-                        if ('tranexamic' in sentence.lower() or 'txa' in sentence.lower()) and matches[0] in sentence:
-                            print(f"   Context: {sentence.strip()}")
-                            break
-                    break
+            print(f"   Context: {record['context']}")
         
-        return results
+        return records
     
     def extract_procedure(self, procedure_name):
         """Extract procedure information"""
@@ -10,9 +10,12 @@ import json
 import re
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
+from corpus_io import JSONLWriter
+from pdf_manifest import PDFManifest, config_fingerprint
+
 # Add system Python packages to path for PyPDF2
 sys.path.append('/Users/andrew/Library/Python/3.9/lib/python/site-packages')
 
@@ -128,70 +131,98 @@ class JTSPDFProcessor:
         
         return sections
     
-    def process_pdf_directory(self) -> Dict:
-        """Process all PDFs in the directory"""
-        if not self.pdf_directory.exists():
-            logger.error(f"PDF directory {self.pdf_directory} does not exist")
-            return {}
-        
-        pdf_files = list(self.pdf_directory.glob("*.pdf"))
+    def iter_processed_pdfs(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield (document id, categorized content) for each PDF, reusing unchanged ones"""
+        pdf_files = sorted(self.pdf_directory.glob("*.pdf"))
         logger.info(f"Found {len(pdf_files)} PDF files")
         
-        processed_data = {}
-        total_size = 0
+        # Unchanged PDFs reuse their categorized content from the last run
+        manifest = PDFManifest(self.output_directory / "pdf_manifest.json", config_fingerprint(self.categories))
+        manifest.prune(pdf_files)
         
         for pdf_file in pdf_files:
-            logger.info(f"Processing {pdf_file.name}")
-            
-            try:
-                text = self.extract_text_from_pdf(pdf_file)
-                if text:
+            categorized = manifest.lookup(pdf_file)
+            if categorized is None:
+                logger.info(f"Processing {pdf_file.name}")
+                
+                try:
+                    text = self.extract_text_from_pdf(pdf_file)
+                    if not text:
+                        logger.warning(f"No text extracted from {pdf_file.name}")
+                        continue
                     categorized = self.categorize_content(text, pdf_file.name)
-                    processed_data[pdf_file.stem] = categorized
-                    total_size += categorized['size_bytes']
-                    
+                    manifest.update(pdf_file, categorized)
                     logger.info(f"Processed {pdf_file.name} - Category: {categorized['category']}")
-                else:
-                    logger.warning(f"No text extracted from {pdf_file.name}")
                     
-            except Exception as e:
-                logger.error(f"Error processing {pdf_file.name}: {e}")
+                except Exception as e:
+                    logger.error(f"Error processing {pdf_file.name}: {e}")
+                    continue
+            
+            yield pdf_file.stem, categorized
         
-        # Save processed data
-        self.save_processed_data(processed_data, total_size)
+        manifest.save()
+    
+    def process_pdf_directory(self) -> Dict:
+        """Process all PDFs in the directory; returns the saved metadata"""
+        if not self.pdf_directory.exists():
+            logger.error(f"PDF directory {self.pdf_directory} does not exist")
+            return {}
         
-        return processed_data
+        return self.save_processed_data(self.iter_processed_pdfs())
     
-    def save_processed_data(self, data: Dict, total_size: int):
-        """Save processed data to JSON files"""
-        # Save by category for efficient access
-        categorized_data = {}
-        
-        for filename, content in data.items():
-            category = content['category']
-            if category not in categorized_data:
-                categorized_data[category] = {}
-            categorized_data[category][filename] = content
-        
-        # Save each category separately
-        for category, category_data in categorized_data.items():
-            output_file = self.output_directory / f"{category}_guidelines.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(category_data, f, indent=2, ensure_ascii=False)
+    def _previous_categories(self) -> List[str]:
+        """Categories the last saved metadata.json lists (the JSONL files an earlier run wrote)"""
+        try:
+            with open(self.output_directory / "metadata.json", 'r') as f:
+                return list(json.load(f).get('categories', []))
+        except (OSError, ValueError):
+            return []
+    
+    def save_processed_data(self, documents: Iterable[Tuple[str, Dict]]) -> Dict:
+        """Stream documents into one JSONL file per category as they arrive, then save metadata"""
+        # One writer per category for efficient per-category loading
+        writers: Dict[str, JSONLWriter] = {}
+        files_by_category: Dict[str, int] = {}
+        total_size = 0
         
+        try:
+            for doc_id, content in documents:
+                category = content['category']
+                writer = writers.get(category)
+                if writer is None:
+                    writer = writers[category] = JSONLWriter(self.output_directory / f"{category}_guidelines.jsonl")
+                writer.write({'id': doc_id, **content})
+                files_by_category[category] = files_by_category.get(category, 0) + 1
+                total_size += content['size_bytes']
+        except BaseException:
+            for writer in writers.values():
+                writer.close(commit=False)
+            raise
+        for writer in writers.values():
+            writer.close()
+        
+        # Drop the JSONL files an earlier run wrote for categories this run did not produce.
+        # Legacy *_guidelines.json files are committed data and are never deleted
+        for category in self._previous_categories():
+            stale_file = self.output_directory / f"{category}_guidelines.jsonl"
+            if category not in writers and stale_file.exists():
+                stale_file.unlink()
+
         # Save metadata
+        total_files = sum(files_by_category.values())
         metadata = {
-            "total_files": len(data),
+            "total_files": total_files,
             "total_size_bytes": total_size,
-            "categories": list(categorized_data.keys()),
-            "files_by_category": {cat: len(files) for cat, files in categorized_data.items()}
+            "categories": list(files_by_category.keys()),
+            "files_by_category": files_by_category
         }
         
         with open(self.output_directory / "metadata.json", 'w') as f:
             json.dump(metadata, f, indent=2)
         
-        logger.info(f"Saved {len(data)} files, {total_size/1024/1024:.1f}MB total")
-        logger.info(f"Categories: {list(categorized_data.keys())}")
+        logger.info(f"Saved {total_files} files, {total_size/1024/1024:.1f}MB total")
+        logger.info(f"Categories: {list(files_by_category.keys())}")
+        return metadata
 
 def main():
     """Main processing function"""
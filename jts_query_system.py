@@ -4,50 +4,33 @@ Interactive JTS Query System
 Allows users to ask questions and get specific dosing information
 """
 
-import json
-from rank_bm25 import BM25Okapi
+from corpus_index import get_corpus_index
+from dose_calculator import DoseRange, dose_cap, weight_based_dose
+from dose_table import dose_range, dose_unit, format_dose, get_dose_table
 import re
 
 class JTSQuerySystem:
-    def __init__(self, corpus_file="jts_corpus.json"):
-        """Initialize with JTS corpus file"""
+    def __init__(self, corpus_file=None):
+        """Initialize with JTS corpus file (defaults to the shared preferred corpus)"""
         self.corpus_file = corpus_file
+        self.corpus_index = None
         self.paragraphs = []
         self.bm25 = None
         self.load_corpus()
-        self.build_index()
     
     def load_corpus(self):
-        """Load paragraphs from JSON corpus file"""
-        print(f"📚 Loading JTS corpus from {self.corpus_file}...")
+        """Attach to the process-wide corpus and BM25 index (loaded once, see corpus_index.py)"""
+        print(f"📚 Loading JTS corpus from {self.corpus_file or 'default corpus'}...")
         try:
-            with open(self.corpus_file, 'r', encoding='utf-8') as f:
-                self.paragraphs = json.load(f)
-            print(f"✅ Loaded {len(self.paragraphs)} paragraphs")
+            self.corpus_index = get_corpus_index(self.corpus_file)
         except Exception as e:
             print(f"❌ Error loading corpus: {e}")
-            self.paragraphs = []
-    
-    def build_index(self):
-        """Build BM25 index from paragraphs"""
-        if not self.paragraphs:
-            print("❌ No paragraphs to index")
             return
         
-        print("🔍 Building BM25 index...")
-        
-        # Tokenize paragraphs
-        tokenized = []
-        for p in self.paragraphs:
-            # Clean and tokenize text
-            text = p["text"].lower()
-            # Remove extra whitespace and split
-            tokens = re.sub(r'\s+', ' ', text).strip().split()
-            tokenized.append(tokens)
-        
-        # Build BM25 index
-        self.bm25 = BM25Okapi(tokenized)
-        print("✅ BM25 index built successfully")
+        self.corpus_file = self.corpus_index.corpus_file
+        self.paragraphs = self.corpus_index.documents
+        self.bm25 = self.corpus_index.bm25
+        print(f"✅ Loaded {len(self.paragraphs)} paragraphs with BM25 index")
     
     def query(self, query_text, n=3):
         """Perform BM25 query and return top n results"""
@@ -64,66 +47,42 @@ class JTSQuerySystem:
         return results
     
     def extract_dose(self, query_text, weight_kg=None):
-        """Extract specific dosing information from query"""
-        results = self.query(query_text, n=5)
-        
+        """Look up dosing information for the medications in a query (see dose_table.py)"""
         print(f"\n🔍 Query: {query_text}")
         print("=" * 50)
         
-        # Look for medication names
-        medications = {
-            'ketamine': r'(\d+(?:\.\d+)?)\s*mg/kg.*?ketamine|ketamine.*?(\d+(?:\.\d+)?)\s*mg/kg',
-            'morphine': r'(\d+(?:\.\d+)?)\s*mg.*?morphine|morphine.*?(\d+(?:\.\d+)?)\s*mg',
-            'fentanyl': r'(\d+(?:\.\d+)?)\s*mcg.*?fentanyl|fentanyl.*?(\d+(?:\.\d+)?)\s*mcg',
-            'txa': r'(\d+)\s*(?:mg|g).*?tranexamic|tranexamic.*?(\d+)\s*(?:mg|g)',
-            'epinephrine': r'(\d+(?:\.\d+)?)\s*mg.*?epinephrine|epinephrine.*?(\d+(?:\.\d+)?)\s*mg'
-        }
-        
+        table = get_dose_table()
+        indication = table.indication_in(query_text)
         found_doses = []
         
-        for i, result in enumerate(results, 1):
-            text = result['text']
-            source = result['source']
-            page = result['page']
+        for med_name in table.drugs_in(query_text):
+            record = table.best(med_name, indication)
+            if record is None:
+                continue
+            
+            found_doses.append({
+                'medication': med_name,
+                'dose': dose_range(record),
+                'unit': record['unit'],
+                'per_kg': record['per_kg'],
+                'source': record['source'],
+                'page': record['page'],
+                'context': record['context']
+            })
+            
+            print(f"\n📋 {med_name.title()} dosing found:")
+            print(f"   Dose: {format_dose(record)}")
+            
+            if weight_kg and record['per_kg']:
+                total = weight_based_dose(DoseRange(record['dose_min'], record['dose_max']), weight_kg, dose_cap(record, weight_kg))
+                print(f"   For {weight_kg} kg patient: {total.rounded(1)} {dose_unit(record).replace('/kg', '')}")
             
-            # Check for medication dosing
-            for med_name, pattern in medications.items():
-                if med_name in query_text.lower():
-                    matches = re.findall(pattern, text, re.IGNORECASE)
-                    if matches:
-                        # Flatten matches and get first non-empty value
-                        for match in matches:
-                            if isinstance(match, tuple):
-                                dose = next((m for m in match if m), None)
-                            else:
-                                dose = match
-                            
-                            if dose:
-                                found_doses.append({
-                                    'medication': med_name,
-                                    'dose': dose,
-                                    'source': source,
-                                    'page': page,
-                                    'context': text[:200] + "..." if len(text) > 200 else text
-                                })
-                                
-                                print(f"\n📋 {med_name.title()} dosing found:")
-                                print(f"   Dose: {dose}")
-                                
-                                if weight_kg and 'mg/kg' in pattern:
-                                    try:
-                                        total_dose = float(dose) * weight_kg
-                                        print(f"   For {weight_kg} kg patient: {total_dose:.1f} mg")
-                                    except ValueError:
-                                        pass
-                                
-                                print(f"   Source: {source} (Page {page})")
-                                break
+            print(f"   Source: {record['source']} (Page {record['page']})")
         
         if not found_doses:
             print("❌ No specific dosing information found")
             print("\n📋 Top results:")
-            for i, result in enumerate(results, 1):
+            for i, result in enumerate(self.query(query_text, n=5), 1):
                 print(f"\nResult {i}:")
                 print(f"Source: {result['source']} (Page {result['page']})")
                 print(f"Text: {result['text'][:200]}...")
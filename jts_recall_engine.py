@@ -12,23 +12,181 @@ Components:
 5. TTS Output (Festival with MBROLA voices)
 """
 
-import json
+import argparse
+import copy
 import os
 import logging
+import threading
 import time
-from typing import List, Dict, Optional, Tuple
-from rank_bm25 import BM25Okapi
-from vosk import Model, KaldiRecognizer
-import pyaudio
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from corpus_index import get_corpus_index
+from corpus_io import find_category_files, iter_keyed_records, write_jsonl
+from dose_calculator import to_kg
+from dose_table import format_dose, get_dose_table
+from topk import select_top_k
+from vosk import Model
+from audio_capture import AudioCapture
+from stt_grammar import load_or_build_grammar
 import subprocess
 import platform
-from tts_utils import speak
+from audio_cache import get_audio_cache
+from playback_queue import PRIORITY_CRITICAL, PRIORITY_ROUTINE, PlaybackQueue
 import re
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Seconds of audio without partial speech before listening gives up
+LISTEN_SILENCE_TIMEOUT = 10.0
+
+# How long a matching speculative answer may still take to render before we speak it live
+SPECULATION_WAIT = 1.0
+
+# Number of distinct queries whose search results are kept in memory
+QUERY_CACHE_SIZE = 128
+
+# Medications the engine extracts doses for
+MEDICATION_NAMES = ['ketamine', 'morphine', 'fentanyl', 'txa', 'tranexamic', 'epinephrine', 'atropine']
+
+# Speech recognition fixes, applied as whole-word rewrites (longest phrase wins)
+SPEECH_FIXES = {
+    'he to': 'need to',
+    'you to': 'need to',
+    'got a': 'have a',
+    'packing the womb': 'uterine packing',
+    'packing womb': 'uterine packing',
+    'packing': 'wound packing',
+    'womb': 'uterine',
+    'uterus': 'uterine',
+    'bleeding badly': 'severe bleeding',
+    'bleeding bad': 'severe bleeding',
+    'what about': '',
+    'what other': 'additional',
+    'other medication': 'additional medications',
+    'other meds': 'additional medications',
+    'should i give': 'administer',
+    'need to give': 'administer',
+    'want to give': 'administer',
+    'going to give': 'administer',
+    'patient': '',
+    'patients': '',
+    'my patient': '',
+    'my patients': '',
+    'the patient': '',
+    'the patients': '',
+    'kilograms': 'kg',
+    'kilos': 'kg',
+    'kgs': 'kg',
+    'milligrams': 'mg',
+    'mgs': 'mg',
+    'micrograms': 'mcg',
+    'mcgs': 'mcg',
+    'grams': 'g',
+    'gs': 'g',
+    'milliliters': 'ml',
+    'mls': 'ml',
+    'units': 'units',
+    'unit': 'unit',
+    'cs symptoms': 'acs symptoms',
+    'cs': 'acs',
+    'a cs': 'acs',
+    'having a cs': 'having acs',
+    'acute cs': 'acute coronary syndrome',
+    'coronary cs': 'coronary syndrome'
+}
+
+# Context keywords appended when a medical term is mentioned (top 2 are used)
+MEDICAL_CONTEXT = {
+    'bleeding': ['hemorrhage', 'blood loss', 'hemostatic'],
+    'wound': ['laceration', 'injury', 'trauma'],
+    'pain': ['analgesia', 'analgesic', 'pain management'],
+    'airway': ['intubation', 'ventilation', 'breathing'],
+    'shock': ['hypotension', 'hypovolemia', 'resuscitation'],
+    'fracture': ['bone', 'orthopedic', 'splint'],
+    'burn': ['thermal', 'chemical', 'debridement'],
+    'chest': ['thoracic', 'pneumothorax', 'chest tube'],
+    'abdomen': ['abdominal', 'laparotomy', 'surgery'],
+    'head': ['neurological', 'brain', 'tbi'],
+    'obstetric': ['pregnancy', 'delivery', 'uterine'],
+    'gynecological': ['uterine', 'vaginal', 'pelvic']
+}
+
+# Medical synonyms and related terms appended to search queries
+MEDICAL_SYNONYMS = {
+    'ketamine': 'ketamine analgesia sedation',
+    'morphine': 'morphine analgesia pain',
+    'fentanyl': 'fentanyl analgesia pain',
+    'txa': 'tranexamic acid hemorrhage',
+    'tranexamic': 'tranexamic acid hemorrhage',
+    'epinephrine': 'epinephrine cardiac arrest',
+    'atropine': 'atropine bradycardia',
+    'blood': 'blood transfusion hemorrhage',
+    'transfusion': 'blood transfusion whole blood',
+    'whole blood': 'blood transfusion whole blood packed red',
+    'packed red': 'packed red blood cells transfusion',
+    'prbc': 'packed red blood cells transfusion',
+    'bleeding': 'hemorrhage bleeding control',
+    'hemorrhage': 'hemorrhage bleeding control',
+    'airway': 'airway management intubation',
+    'intubation': 'airway management intubation',
+    'chest tube': 'thoracostomy chest tube',
+    'thoracotomy': 'emergency thoracotomy',
+    'tourniquet': 'tourniquet hemorrhage control',
+    'pressure': 'pressure dressing hemorrhage',
+    'packing': 'wound packing hemorrhage',
+    'uterine': 'uterine hemorrhage obstetric',
+    'womb': 'uterine hemorrhage obstetric',
+    'obstetric': 'obstetric hemorrhage pregnancy',
+    'pregnancy': 'obstetric hemorrhage pregnancy',
+    'delivery': 'obstetric delivery pregnancy',
+    'burn': 'burn management thermal',
+    'shock': 'shock resuscitation hypotension',
+    'cardiac': 'cardiac arrest resuscitation',
+    'arrest': 'cardiac arrest resuscitation',
+    'cpr': 'cardiac arrest resuscitation',
+    'seizure': 'seizure management anticonvulsant',
+    'infection': 'infection antibiotic sepsis',
+    'sepsis': 'sepsis infection antibiotic',
+    'acs': 'acute coronary syndrome myocardial infarction',
+    'acute coronary': 'acute coronary syndrome myocardial infarction',
+    'chest pain': 'acute coronary syndrome myocardial infarction',
+    'heart attack': 'myocardial infarction acute coronary syndrome',
+    'mi': 'myocardial infarction acute coronary syndrome',
+    'pelvis': 'pelvic fracture trauma orthopedic',
+    'pelvic': 'pelvic fracture trauma orthopedic',
+    'fracture': 'orthopedic trauma bone extremity',
+    'trauma': 'trauma orthopedic fracture extremity',
+    'amputation': 'amputation trauma extremity hemorrhage'
+}
+
+
+def compile_phrase_pattern(phrases: Iterable[str], overlapping: bool = False) -> "re.Pattern":
+    """
+    One alternation regex over a phrase table, longest phrases first, matched on word boundaries
+
+    With overlapping=True the phrase is captured inside a lookahead so every word can
+    start a match (e.g. both 'whole blood' and 'blood'), and plural forms are accepted.
+    """
+    alternation = '|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+    if overlapping:
+        return re.compile(rf"\b(?=({alternation})(?:e?s)?\b)")
+    return re.compile(rf"\b(?:{alternation})\b")
+
+
+def grammar_phrases() -> List[str]:
+    """Domain phrases for the grammar-constrained recognizer (see stt_grammar.py)"""
+    phrases = list(MEDICATION_NAMES)
+    phrases.extend(value for value in SPEECH_FIXES.values() if value)
+    for term, context_terms in MEDICAL_CONTEXT.items():
+        phrases.append(term)
+        phrases.extend(context_terms)
+    for term, synonyms in MEDICAL_SYNONYMS.items():
+        phrases.extend([term, synonyms])
+    return phrases
+
 class VitalSignsAnalyzer:
     """Analyze vital signs and provide treatment recommendations"""
     
@@ -109,68 +267,88 @@ class JTSCorpusProcessor:
     
     def __init__(self, jts_data_dir: str = "jts_data"):
         self.jts_data_dir = jts_data_dir
-        self.corpus_file = "jts_corpus.json"
+        self.corpus_file = "jts_corpus.jsonl"
         
-    def load_existing_corpus(self) -> List[Dict]:
-        """Load existing processed JTS data and convert to corpus format"""
-        corpus = []
+    def iter_existing_corpus(self) -> Iterator[Dict]:
+        """Convert existing processed JTS data to corpus entries, one guideline at a time"""
+        count = 0
         
-        # Load all JSON files from jts_data directory
-        for filename in os.listdir(self.jts_data_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(self.jts_data_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        
+        # Stream every category file in the jts_data directory
+        for category, filepath in find_category_files(self.jts_data_dir).items():
+            try:
+                for doc_id, doc_data in iter_keyed_records(filepath):
                     # Convert to corpus format
-                    for doc_id, doc_data in data.items():
-                        if isinstance(doc_data, dict) and 'sections' in doc_data:
-                            # Process sections - include all sections, not just overview
-                            for section_name, section_text in doc_data['sections'].items():
-                                if section_text and len(section_text.strip()) > 30:  # Lower minimum length
-                                    corpus.append({
-                                        "section": section_name,
-                                        "source": doc_data.get('filename', doc_id),
-                                        "text": section_text.strip(),
-                                        "page": 0,
-                                        "category": doc_data.get('category', 'general')
-                                    })
-                        elif isinstance(doc_data, dict) and 'full_text' in doc_data:
-                            # Process full text - split into smaller chunks for better search
-                            full_text = doc_data['full_text']
-                            if full_text and len(full_text.strip()) > 50:
-                                # Split into smaller paragraphs for better search
-                                paragraphs = [p.strip() for p in full_text.split('\n\n') if len(p.strip()) > 30]
-                                for i, para in enumerate(paragraphs[:50]):  # Increase limit to 50 paragraphs
-                                    corpus.append({
-                                        "section": f"paragraph_{i+1}",
-                                        "source": doc_data.get('filename', doc_id),
-                                        "text": para,
-                                        "page": 0,
-                                        "category": "general"
-                                    })
-                                    
-                except Exception as e:
-                    logger.warning(f"Error processing {filename}: {e}")
-                    continue
-                    
-        logger.info(f"Loaded {len(corpus)} corpus entries")
-        return corpus
+                    if isinstance(doc_data, dict) and 'sections' in doc_data:
+                        # Process sections - include all sections, not just overview
+                        for section_name, section_text in doc_data['sections'].items():
+                            if section_text and len(section_text.strip()) > 30:  # Lower minimum length
+                                count += 1
+                                yield {
+                                    "section": section_name,
+                                    "source": doc_data.get('filename', doc_id),
+                                    "text": section_text.strip(),
+                                    "page": 0,
+                                    "category": doc_data.get('category', 'general')
+                                }
+                    elif isinstance(doc_data, dict) and 'full_text' in doc_data:
+                        # Process full text - split into smaller chunks for better search
+                        full_text = doc_data['full_text']
+                        if full_text and len(full_text.strip()) > 50:
+                            # Split into smaller paragraphs for better search
+                            paragraphs = [p.strip() for p in full_text.split('\n\n') if len(p.strip()) > 30]
+                            for i, para in enumerate(paragraphs[:50]):  # Increase limit to 50 paragraphs
+                                count += 1
+                                yield {
+                                    "section": f"paragraph_{i+1}",
+                                    "source": doc_data.get('filename', doc_id),
+                                    "text": para,
+                                    "page": 0,
+                                    "category": "general"
+                                }
+                                
+            except Exception as e:
+                logger.warning(f"Error processing {filepath.name}: {e}")
+                continue
+                
+        logger.info(f"Loaded {count} corpus entries")
     
-    def save_corpus(self, corpus: List[Dict]) -> None:
-        """Save corpus to JSON file"""
-        with open(self.corpus_file, 'w', encoding='utf-8') as f:
-            json.dump(corpus, f, indent=2, ensure_ascii=False)
-        logger.info(f"Saved corpus to {self.corpus_file}")
+    def save_corpus(self, corpus: Iterable[Dict]) -> None:
+        """Stream corpus entries to a JSONL file"""
+        count = write_jsonl(self.corpus_file, corpus)
+        logger.info(f"Saved {count} entries to {self.corpus_file}")
 
 class JTSRecallEngine:
     """Main JTS Recall Engine with BM25 indexing and voice interface"""
     
-    def __init__(self):
+    def __init__(self, query_cache_size: int = QUERY_CACHE_SIZE, use_grammar: bool = False,
+                 speculate: bool = True, barge_in: bool = True):
+        self.corpus_index = None
         self.corpus = []
+        self.corpus_file = None
         self.bm25 = None
+        # LRU of search results keyed on the canonical query tokens, see search_corpus()
+        self.query_cache: OrderedDict = OrderedDict()
+        self.query_cache_size = query_cache_size
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
+        self._query_cache_index = None
+        self._query_cache_lock = threading.Lock()
+        # Query rewrite tables compiled once, see _preprocess_query()/_enhance_search_query()
+        self._speech_fix_pattern = compile_phrase_pattern(SPEECH_FIXES)
+        self._medical_context_pattern = compile_phrase_pattern(MEDICAL_CONTEXT, overlapping=True)
+        self._synonym_pattern = compile_phrase_pattern(MEDICAL_SYNONYMS, overlapping=True)
         self.stt_model = None
+        self.use_grammar = use_grammar
+        self.audio_capture: Optional[AudioCapture] = None
+        # Speculative answering of stable partial transcripts, see _speculate()
+        self.speculate = speculate
+        self._speculation: Optional[Tuple[Tuple[str, ...], Future]] = None
+        self._speculation_executor: Optional[ThreadPoolExecutor] = None
+        self.speculation_hits = 0
+        self.speculation_misses = 0
+        # Responses play in the background while we listen; the medic speaking over one stops it
+        self.playback = PlaybackQueue()
+        self.barge_in = barge_in
         self.vital_analyzer = VitalSignsAnalyzer()
         self.patient_context = {
             'weight': None,
@@ -190,26 +368,15 @@ class JTSRecallEngine:
         """Initialize the recall engine"""
         logger.info("Initializing JTS Recall Engine...")
         
-        # Load comprehensive corpus (prioritized over all others)
-        if os.path.exists("jts_comprehensive_corpus.json"):
-            logger.info("Loading comprehensive JTS corpus...")
-            with open("jts_comprehensive_corpus.json", 'r', encoding='utf-8') as f:
-                self.corpus = json.load(f)
-        elif os.path.exists("jts_focused_corpus.json"):
-            logger.info("Loading focused clinical corpus...")
-            with open("jts_focused_corpus.json", 'r', encoding='utf-8') as f:
-                self.corpus = json.load(f)
-        elif os.path.exists("jts_rescue_medicine_cleaned.json"):
-            logger.info("Loading existing corpus...")
-            with open("jts_rescue_medicine_cleaned.json", 'r', encoding='utf-8') as f:
-                self.corpus = json.load(f)
-        else:
+        # Load the shared corpus index (comprehensive corpus preferred, see corpus_index.py)
+        try:
+            self._load_corpus_index()
+        except FileNotFoundError:
             logger.error("No corpus files found! Please run comprehensive_jts_processor.py first to create comprehensive corpus.")
-            raise FileNotFoundError("No corpus files found")
+            raise
         
-        # Build BM25 index
-        logger.info("Building BM25 index...")
-        self._build_bm25_index()
+        # Doses extracted from the corpus at build time (see dose_table.py)
+        get_dose_table()
         
         # Load STT model
         logger.info("Loading Vosk STT model...")
@@ -217,25 +384,14 @@ class JTSRecallEngine:
         
         logger.info("JTS Recall Engine initialized successfully!")
         
-    def _build_bm25_index(self) -> None:
-        """Build BM25 index from corpus using rank_bm25"""
-        if not self.corpus:
-            raise ValueError("No corpus available for indexing")
-            
-        logger.info("Building BM25 index...")
-        
-        # Tokenize paragraphs for BM25
-        tokenized = []
-        for p in self.corpus:
-            # Clean and tokenize text
-            text = p["text"].lower()
-            # Remove extra whitespace and split
-            tokens = re.sub(r'\s+', ' ', text).strip().split()
-            tokenized.append(tokens)
-        
-        # Build BM25 index using rank_bm25
-        self.bm25 = BM25Okapi(tokenized)
-        logger.info(f"BM25 index built with {len(self.corpus)} documents")
+    def _load_corpus_index(self) -> None:
+        """Attach to the process-wide corpus and BM25 index, loading them on first use"""
+        self.corpus_index = get_corpus_index()
+        self.corpus = self.corpus_index.documents
+        self.corpus_file = self.corpus_index.corpus_file
+        self.bm25 = self.corpus_index.bm25
+        self.clear_query_cache()
+        logger.info(f"BM25 index ready with {self.bm25.corpus_size} documents from {self.corpus_file}")
         
     def _load_stt_model(self) -> None:
         """Load Vosk STT model"""
@@ -246,240 +402,134 @@ class JTSRecallEngine:
         self.stt_model = Model(model_path)
         logger.info("Vosk STT model loaded successfully")
         
-    def get_best_microphone(self) -> Optional[int]:
-        """Get the best available microphone"""
-        p = pyaudio.PyAudio()
-        best_device = None
-        
-        # Look for built-in microphone first (usually more reliable)
-        for i in range(p.get_device_count()):
-            info = p.get_device_info_by_index(i)
-            if info['maxInputChannels'] > 0:  # Has input capability
-                name = info['name'].lower()
-                # Prefer built-in microphone
-                if 'imac' in name or 'built-in' in name or 'internal' in name:
-                    best_device = i
-                    break
-                # Fallback to any input device
-                elif best_device is None:
-                    best_device = i
-        
-        p.terminate()
-        return best_device
-        
-    def listen_for_query(self) -> str:
-        """Listen for voice query using Vosk STT with improved audio processing"""
-        if not self.stt_model:
+        # Optionally constrain decoding to the clinical vocabulary (faster, fewer misrecognitions)
+        grammar = None
+        if self.use_grammar:
+            grammar = load_or_build_grammar(self.corpus_index, grammar_phrases())
+        
+        # Open the microphone once; every query reuses the stream and recognizer
+        self.audio_capture = AudioCapture(self.stt_model, words=True, grammar=grammar)
+        # Keep listening during playback, ignoring our own voice (see AudioCapture.listen())
+        self.audio_capture.echo_gate = self.playback.is_playing
+        if self.barge_in:
+            self.audio_capture.on_barge_in = self.playback.interrupt
+        self.audio_capture.start()
+        
+    def listen_for_query(self, speculate: bool = True) -> str:
+        """Listen for voice query on the persistent microphone stream"""
+        if not self.audio_capture:
             raise RuntimeError("STT model not loaded")
-            
-        rec = KaldiRecognizer(self.stt_model, 16000)
-        rec.SetWords(True)  # Enable word timing for better accuracy
-        
-        # Get best microphone
-        mic_device = self.get_best_microphone()
-        if mic_device is None:
-            logger.error("No microphone found!")
-            return ""
-        
-        logger.info(f"Using microphone device: {mic_device}")
         
-        p = pyaudio.PyAudio()
-        mic = p.open(
-            format=pyaudio.paInt16, 
-            channels=1,
-            rate=16000, 
-            input=True, 
-            input_device_index=mic_device,
-            frames_per_buffer=4096  # Smaller buffer for more responsive recognition
-        )
+        # Start answering while the medic is still speaking (see speak_response())
+        self._discard_speculation()
+        on_partial = self._speculate if speculate and self.speculate else None
         
         logger.info("🎤 Listening... (speak clearly)")
-        
         try:
-            silence_frames = 0
-            max_silence_frames = 30  # About 2 seconds of silence
-            audio_buffer = []
-            
-            while True:
-                data = mic.read(2048, exception_on_overflow=False)
-                audio_buffer.append(data)
-                
-                # Process audio in larger chunks for better recognition
-                if len(audio_buffer) >= 3:  # Process every 3 chunks
-                    combined_data = b''.join(audio_buffer)
-                    audio_buffer = []
-                    
-                    if rec.AcceptWaveform(combined_data):
-                        result = json.loads(rec.Result())
-                        text = result.get("text", "").strip()
-                        if text:  # Only return if we got actual text
-                            return text
-                    else:
-                        # Check for partial results to detect speech
-                        partial = json.loads(rec.PartialResult())
-                        partial_text = partial.get('partial', '').strip()
-                        if partial_text:
-                            silence_frames = 0
-                        else:
-                            silence_frames += 1
-                    
-                    # Stop if too much silence
-                    if silence_frames > max_silence_frames:
-                        break
-                        
+            return self.audio_capture.listen(silence_timeout=LISTEN_SILENCE_TIMEOUT, on_partial=on_partial)
         except KeyboardInterrupt:
             logger.info("\n🛑 Listening stopped")
             return ""
-        finally:
-            mic.stop_stream()
-            mic.close()
-            p.terminate()
+    
+    def _speculate(self, partial: str) -> None:
+        """Answer a stable partial transcript in the background and pre-render the speech"""
+        tokens = tuple(partial.lower().split())
+        if self._speculation is not None:
+            if self._speculation[0] == tokens:
+                return
+            self._discard_speculation()
+        
+        # Answer against a snapshot so a speculative context update never leaks into the session
+        shadow = copy.copy(self)
+        shadow.patient_context = copy.deepcopy(self.patient_context)
+        shadow.conversation_history = []
+        
+        if self._speculation_executor is None:
+            self._speculation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculation")
+        future = self._speculation_executor.submit(self._render_speculation, shadow, ' '.join(tokens))
+        self._speculation = (tokens, future)
+    
+    def _render_speculation(self, shadow: "JTSRecallEngine", query: str) -> str:
+        """Worker: compute the response and render it into the audio cache"""
+        response = shadow._respond(query)
+        get_audio_cache().render_chunks(response)
+        return response
+    
+    def _discard_speculation(self) -> None:
+        """Drop the pending speculation (an unused rendering just ages out of the audio cache)"""
+        if self._speculation is not None:
+            self._speculation[1].cancel()
+            self._speculation = None
+    
+    def speak_response(self, query: str, response: str) -> Future:
+        """Queue a response for playback, waiting for its speculative pre-render if it answered the same query"""
+        speculation, self._speculation = self._speculation, None
+        if speculation is not None:
+            tokens, future = speculation
+            speculative_response = None
+            if tokens == tuple(query.lower().split()):
+                try:
+                    speculative_response = future.result(timeout=SPECULATION_WAIT)
+                except Exception as e:  # Timed out, cancelled or failed
+                    logger.debug(f"Speculative answer unavailable: {e!r}")
+            
+            # Only the identical answer is already in the audio cache
+            if speculative_response == response:
+                self.speculation_hits += 1
+            else:
+                self.speculation_misses += 1
+                future.cancel()
+        
+        return self._speak(response, self._response_priority(response))
+    
+    def _speak(self, text: str, priority: int = PRIORITY_ROUTINE) -> Future:
+        """Queue text for playback without waiting for it (see PlaybackQueue)"""
+        return self.playback.speak_async(text, priority)
+    
+    @staticmethod
+    def _response_priority(response: str) -> int:
+        """Critical vitals alerts preempt whatever is playing"""
+        if response.startswith(("CRITICAL:", "Critical patient")):
+            return PRIORITY_CRITICAL
+        return PRIORITY_ROUTINE
+    
+    def close(self) -> None:
+        """Release the microphone, the speculation worker and the playback queue"""
+        self.playback.close()
+        self._discard_speculation()
+        if self._speculation_executor is not None:
+            self._speculation_executor.shutdown(wait=True)
+            self._speculation_executor = None
+        if self.audio_capture:
+            self.audio_capture.close()
             
     def _preprocess_query(self, query: str) -> str:
         """Preprocess query to improve speech recognition accuracy and search relevance"""
-        # Normalize common speech recognition errors
-        speech_fixes = {
-            'he to': 'need to',
-            'you to': 'need to',
-            'got a': 'have a',
-            'packing the womb': 'uterine packing',
-            'packing womb': 'uterine packing',
-            'packing': 'wound packing',
-            'womb': 'uterus',
-            'uterus': 'uterine',
-            'bleeding badly': 'severe bleeding',
-            'bleeding bad': 'severe bleeding',
-            'what about': '',
-            'what other': 'additional',
-            'other medication': 'additional medications',
-            'other meds': 'additional medications',
-            'should i give': 'administer',
-            'need to give': 'administer',
-            'want to give': 'administer',
-            'going to give': 'administer',
-            'patient': '',
-            'patients': '',
-            'my patient': '',
-            'my patients': '',
-            'the patient': '',
-            'the patients': '',
-            'kilograms': 'kg',
-            'kilos': 'kg',
-            'kgs': 'kg',
-            'milligrams': 'mg',
-            'mgs': 'mg',
-            'micrograms': 'mcg',
-            'mcgs': 'mcg',
-            'grams': 'g',
-            'gs': 'g',
-            'milliliters': 'ml',
-            'mls': 'ml',
-            'units': 'units',
-            'unit': 'unit',
-            'cs symptoms': 'acs symptoms',
-            'cs': 'acs',
-            'a cs': 'acs',
-            'having a cs': 'having acs',
-            'acute cs': 'acute coronary syndrome',
-            'coronary cs': 'coronary syndrome'
-        }
+        processed_query = ' '.join(query.lower().split())
         
-        # Apply speech fixes
-        processed_query = query.lower()
-        
-        # Special handling for CS -> ACS conversion
-        if 'cs' in processed_query and 'acs' not in processed_query:
-            # Check if it's likely ACS context
-            acs_indicators = ['symptoms', 'patient', 'having', 'acute', 'coronary', 'heart', 'chest', 'pain']
-            if any(indicator in processed_query for indicator in acs_indicators):
-                processed_query = processed_query.replace('cs', 'acs')
-        
-        # Apply other speech fixes
-        for speech_error, correction in speech_fixes.items():
-            processed_query = processed_query.replace(speech_error, correction)
-        
-        # Add medical context keywords
-        medical_context = {
-            'bleeding': ['hemorrhage', 'blood loss', 'hemostatic'],
-            'wound': ['laceration', 'injury', 'trauma'],
-            'pain': ['analgesia', 'analgesic', 'pain management'],
-            'airway': ['intubation', 'ventilation', 'breathing'],
-            'shock': ['hypotension', 'hypovolemia', 'resuscitation'],
-            'fracture': ['bone', 'orthopedic', 'splint'],
-            'burn': ['thermal', 'chemical', 'debridement'],
-            'chest': ['thoracic', 'pneumothorax', 'chest tube'],
-            'abdomen': ['abdominal', 'laparotomy', 'surgery'],
-            'head': ['neurological', 'brain', 'tbi'],
-            'obstetric': ['pregnancy', 'delivery', 'uterine'],
-            'gynecological': ['uterine', 'vaginal', 'pelvic']
-        }
+        # Apply speech fixes in one left-to-right pass, so rewritten text is never rewritten again
+        processed_query = self._speech_fix_pattern.sub(lambda m: SPEECH_FIXES[m.group(0)], processed_query)
+        processed_query = ' '.join(processed_query.split())
         
         # Add context keywords if medical terms are detected
-        for term, context_terms in medical_context.items():
-            if term in processed_query:
-                processed_query += ' ' + ' '.join(context_terms[:2])  # Add top 2 context terms
+        for term in self._matched_terms(self._medical_context_pattern, processed_query):
+            processed_query += ' ' + ' '.join(MEDICAL_CONTEXT[term][:2])  # Add top 2 context terms
         
         return processed_query.strip()
 
     def _enhance_search_query(self, query: str) -> str:
         """Enhance search query with medical synonyms and related terms"""
-        # Medical synonyms mapping
-        medical_synonyms = {
-            'ketamine': 'ketamine analgesia sedation',
-            'morphine': 'morphine analgesia pain',
-            'fentanyl': 'fentanyl analgesia pain',
-            'txa': 'tranexamic acid hemorrhage',
-            'tranexamic': 'tranexamic acid hemorrhage',
-            'epinephrine': 'epinephrine cardiac arrest',
-            'atropine': 'atropine bradycardia',
-            'blood': 'blood transfusion hemorrhage',
-            'transfusion': 'blood transfusion whole blood',
-            'whole blood': 'blood transfusion whole blood packed red',
-            'packed red': 'packed red blood cells transfusion',
-            'prbc': 'packed red blood cells transfusion',
-            'bleeding': 'hemorrhage bleeding control',
-            'hemorrhage': 'hemorrhage bleeding control',
-            'airway': 'airway management intubation',
-            'intubation': 'airway management intubation',
-            'chest tube': 'thoracostomy chest tube',
-            'thoracotomy': 'emergency thoracotomy',
-            'tourniquet': 'tourniquet hemorrhage control',
-            'pressure': 'pressure dressing hemorrhage',
-            'packing': 'wound packing hemorrhage',
-            'uterine': 'uterine hemorrhage obstetric',
-            'womb': 'uterine hemorrhage obstetric',
-            'obstetric': 'obstetric hemorrhage pregnancy',
-            'pregnancy': 'obstetric hemorrhage pregnancy',
-            'delivery': 'obstetric delivery pregnancy',
-            'fracture': 'fracture orthopedic splint',
-            'burn': 'burn management thermal',
-            'shock': 'shock resuscitation hypotension',
-            'cardiac': 'cardiac arrest resuscitation',
-            'arrest': 'cardiac arrest resuscitation',
-            'cpr': 'cardiac arrest resuscitation',
-            'seizure': 'seizure management anticonvulsant',
-            'infection': 'infection antibiotic sepsis',
-            'sepsis': 'sepsis infection antibiotic',
-            'acs': 'acute coronary syndrome myocardial infarction',
-            'acute coronary': 'acute coronary syndrome myocardial infarction',
-            'chest pain': 'acute coronary syndrome myocardial infarction',
-            'heart attack': 'myocardial infarction acute coronary syndrome',
-            'mi': 'myocardial infarction acute coronary syndrome',
-            'pelvis': 'pelvic fracture trauma orthopedic',
-            'pelvic': 'pelvic fracture trauma orthopedic',
-            'fracture': 'orthopedic trauma bone extremity',
-            'trauma': 'trauma orthopedic fracture extremity',
-            'amputation': 'amputation trauma extremity hemorrhage'
-        }
-        
-        # Apply synonyms
         enhanced_query = query.lower()
-        for term, synonyms in medical_synonyms.items():
-            if term in enhanced_query:
-                enhanced_query += ' ' + synonyms
+        for term in self._matched_terms(self._synonym_pattern, enhanced_query):
+            enhanced_query += ' ' + MEDICAL_SYNONYMS[term]
         
         return enhanced_query
 
+    @staticmethod
+    def _matched_terms(pattern: "re.Pattern", text: str) -> List[str]:
+        """Distinct table terms found in text, in order of appearance"""
+        return list(dict.fromkeys(match.group(1) for match in pattern.finditer(text)))
+
     def search_corpus(self, query: str, top_n: int = 5) -> List[Dict]:
         """Enhanced search with query preprocessing and medical context"""
         if not self.bm25:
@@ -497,8 +547,16 @@ class JTSRecallEngine:
         # Tokenize query
         query_tokens = query.split()
         
-        # Get top n results using rank_bm25
-        results = self.bm25.get_top_n(query_tokens, self.corpus, n=top_n)
+        # Scoring only depends on which tokens occur and how often, so queries that
+        # differ in word order or phrasing but expand to the same terms share an entry
+        cache_key = (tuple(sorted(query_tokens)), top_n)
+        cached = self._get_cached_results(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Get top n results; synonym expansion makes queries long, so let the
+        # index stop scoring new documents once they can no longer reach the top n
+        results = self.corpus_index.search_tokens(query_tokens, n=top_n, early_termination=True)
         
         # Apply content density ranking
         results = self._rank_by_content_density(results, query)
@@ -507,8 +565,53 @@ class JTSRecallEngine:
         if not results or len(results) == 0:
             results = self._keyword_search(query, top_n)
         
+        self._cache_results(cache_key, results)
         return results
     
+    def _get_cached_results(self, cache_key: Tuple) -> Optional[List[Dict]]:
+        """Cached results for a query key, or None on a miss"""
+        with self._query_cache_lock:
+            # Results are only valid for the index they came from
+            if self._query_cache_index is not self.bm25:
+                self.query_cache.clear()
+                self._query_cache_index = self.bm25
+            
+            results = self.query_cache.get(cache_key)
+            if results is None:
+                self.query_cache_misses += 1
+                return None
+            self.query_cache.move_to_end(cache_key)
+            self.query_cache_hits += 1
+            return list(results)
+    
+    def _cache_results(self, cache_key: Tuple, results: List[Dict]) -> None:
+        """Remember results for a query key, evicting the least recently used entry"""
+        if self.query_cache_size <= 0:
+            return
+        with self._query_cache_lock:
+            self.query_cache[cache_key] = list(results)
+            self.query_cache.move_to_end(cache_key)
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+    
+    def clear_query_cache(self) -> None:
+        """Drop all cached search results (e.g. after the corpus index was rebuilt)"""
+        with self._query_cache_lock:
+            self.query_cache.clear()
+            self._query_cache_index = self.bm25
+    
+    def get_query_cache_stats(self) -> Dict[str, Any]:
+        """Query cache size and hit/miss counters"""
+        with self._query_cache_lock:
+            lookups = self.query_cache_hits + self.query_cache_misses
+            return {
+                'entries': len(self.query_cache),
+                'max_entries': self.query_cache_size,
+                'hits': self.query_cache_hits,
+                'misses': self.query_cache_misses,
+                'hit_rate': self.query_cache_hits / lookups if lookups else 0.0
+            }
+    
     def _rank_by_content_density(self, results: List[Dict], query: str) -> List[Dict]:
         """Rank results by content density (treatment vs. headers)"""
         scored_results = []
@@ -522,8 +625,7 @@ class JTSRecallEngine:
                 score += 3
             
             # Boost for medication names
-            med_names = ['ketamine', 'morphine', 'fentanyl', 'txa', 'tranexamic', 'epinephrine', 'atropine']
-            for med in med_names:
+            for med in MEDICATION_NAMES:
                 if med in text:
                     score += 2
             
@@ -545,9 +647,8 @@ class JTSRecallEngine:
             
             scored_results.append((score, result))
         
-        # Sort by score and return
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-        return [result for score, result in scored_results]
+        # Order by score and return
+        return [result for score, result in sorted(scored_results, key=lambda x: x[0], reverse=True)]
     
     def _keyword_search(self, query: str, top_n: int) -> List[Dict]:
         """Fallback keyword search for medical queries"""
@@ -585,12 +686,10 @@ class JTSRecallEngine:
                         if var in text or var in source:
                             score += 2
             
-            if score > 0:
-                scored_results.append((score, entry))
+            scored_results.append((score, entry))
         
-        # Sort by score and return top results
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-        return [entry for score, entry in scored_results[:top_n]]
+        # Keep the top results that matched at all
+        return [entry for score, entry in select_top_k(scored_results, top_n, key=lambda x: x[0], threshold=0)]
         
     def process_query(self, query):
         """Enhanced medical decision support: User speaks → STT → text → Update context OR request → BM25 search → Check contraindications → Speak response"""
@@ -600,14 +699,7 @@ class JTSRecallEngine:
         query = query.lower().strip()
         
         # Update patient context or process medical request
-        context_updated = self._update_patient_context(query)
-        
-        if context_updated:
-            # Context was updated, acknowledge and ask for next request
-            response = self._acknowledge_context_update(query)
-        else:
-            # Process medical request
-            response = self._process_medical_request(query)
+        response = self._respond(query)
         
         # Add to conversation history
         self.conversation_history.append({
@@ -622,6 +714,16 @@ class JTSRecallEngine:
         
         return response
     
+    def _respond(self, query: str) -> str:
+        """Response to a normalized query, updating the patient context if it carries new information"""
+        context_updated = self._update_patient_context(query)
+        
+        if context_updated:
+            # Context was updated, acknowledge and ask for next request
+            return self._acknowledge_context_update(query)
+        # Process medical request
+        return self._process_medical_request(query)
+    
     def _update_patient_context(self, query):
         """Update patient context based on voice input"""
         updated = False
@@ -631,7 +733,7 @@ class JTSRecallEngine:
         if weight_match:
             weight_value = int(weight_match.group(1))
             if any(unit in query for unit in ['pound', 'lb']):
-                self.patient_context['weight'] = weight_value * 0.453592
+                self.patient_context['weight'] = to_kg(weight_value, 'lb')
             else:
                 self.patient_context['weight'] = weight_value
             updated = True
@@ -820,6 +922,11 @@ class JTSRecallEngine:
         if 'atropine' in query_lower:
             return "Atropine 1mg IV. May repeat every 3-5 minutes up to 3mg total."
         
+        # Any other drug: the protocol's own dose from the dose table, once a clinician has reviewed it
+        table_dose = self._get_table_dose(query_lower)
+        if table_dose:
+            return table_dose
+        
         # Direct procedure queries
         if 'bleeding' in query_lower or 'hemorrhage' in query_lower:
             if 'arterial' in query_lower:
@@ -919,6 +1026,17 @@ class JTSRecallEngine:
         """Get TXA dose"""
         return "TXA 1g IV over 10 minutes. Then 1g over 8 hours."
     
+    def _get_table_dose(self, query_lower: str) -> Optional[str]:
+        """Reviewed adult dose of the first drug named in the query that the corpus dose table has"""
+        table = get_dose_table()
+        indication = table.indication_in(query_lower)
+        for drug in table.drugs_in(query_lower):
+            record = table.best(drug, indication)
+            if record:
+                logger.info(f"Dose of {drug} from {record['source']}, page {record['page']}")
+                return format_dose(record, self.patient_context['weight'])
+        return None
+    
 
     
     def _check_contraindications(self, query, response):
@@ -942,102 +1060,6 @@ class JTSRecallEngine:
         
         return '; '.join(warnings) if warnings else None
     
-
-    
-
-    
-    def _extract_treatment_from_paragraph(self, text, query, source):
-        """Extract actionable treatment information from JTS paragraph"""
-        
-        # Clean up text
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Check for medication names and extract dosages
-        medications = {
-            'ketamine': {'pattern': r'(\d+(?:\.\d+)?)\s*mg/kg', 'default_dose': 0.3, 'route': 'IV'},
-            'morphine': {'pattern': r'(\d+(?:\.\d+)?)\s*mg/kg', 'default_dose': 0.1, 'route': 'IV'},
-            'fentanyl': {'pattern': r'(\d+(?:\.\d+)?)\s*mcg/kg', 'default_dose': 1.0, 'route': 'IV'},
-            'txa': {'pattern': r'(\d+)\s*(?:mg|g)', 'default_dose': 1000, 'route': 'IV'},
-            'tranexamic': {'pattern': r'(\d+)\s*(?:mg|g)', 'default_dose': 1000, 'route': 'IV'},
-            'epinephrine': {'pattern': r'(\d+(?:\.\d+)?)\s*mg', 'default_dose': 1.0, 'route': 'IV'},
-            'atropine': {'pattern': r'(\d+(?:\.\d+)?)\s*mg', 'default_dose': 1.0, 'route': 'IV'}
-        }
-        
-        # Check for specific medications in query and text
-        for med_name, med_info in medications.items():
-            if med_name in query.lower() and med_name in text.lower():
-                # Extract dosage from text if available
-                dose_match = re.search(med_info['pattern'], text, re.IGNORECASE)
-                if dose_match:
-                    extracted_dose = float(dose_match.group(1))
-                    if self.patient_context['weight']:
-                        if 'mg/kg' in med_info['pattern'] or 'mcg/kg' in med_info['pattern']:
-                            total_dose = extracted_dose * self.patient_context['weight']
-                            unit = 'mg' if 'mg/kg' in med_info['pattern'] else 'mcg'
-                            return f"{med_name.title()}: {extracted_dose} {unit}/kg {med_info['route']}. For {self.patient_context['weight']:.0f} kg: {total_dose:.0f} {unit}."
-                        else:
-                            return f"{med_name.title()}: {extracted_dose} {med_info['route']}."
-                    else:
-                        return f"{med_name.title()}: {extracted_dose} {med_info['route']}."
-                else:
-                    # Use default dose if not found in text
-                    if self.patient_context['weight']:
-                        if 'mg/kg' in med_info['pattern'] or 'mcg/kg' in med_info['pattern']:
-                            total_dose = med_info['default_dose'] * self.patient_context['weight']
-                            unit = 'mg' if 'mg/kg' in med_info['pattern'] else 'mcg'
-                            return f"{med_name.title()}: {med_info['default_dose']} {unit}/kg {med_info['route']}. For {self.patient_context['weight']:.0f} kg: {total_dose:.0f} {unit}."
-                        else:
-                            return f"{med_name.title()}: {med_info['default_dose']} {med_info['route']}."
-                    else:
-                        return f"{med_name.title()}: {med_info['default_dose']} {med_info['route']}."
-        
-        # Extract action verbs and procedures
-        action_patterns = {
-            'tourniquet': r'(?:apply|place|use)\s+tourniquet',
-            'pressure': r'(?:apply|direct)\s+pressure',
-            'airway': r'(?:insert|place)\s+(?:NPA|airway)',
-            'cricothyrotomy': r'(?:perform|surgical)\s+cricothyrotomy',
-            'monitor': r'(?:monitor|check)\s+(?:BP|HR|RR|vitals)'
-        }
-        
-        for action, pattern in action_patterns.items():
-            if action in query.lower():
-                # Check if action is mentioned in text
-                if re.search(pattern, text, re.IGNORECASE):
-                    action_match = re.search(pattern, text, re.IGNORECASE)
-                    if action_match:
-                        return f"Action: {action_match.group(0)}"
-                else:
-                    # Return standard protocol if not found in text
-                    if action == 'tourniquet':
-                        return "Apply tourniquet above wound. Reassess in 2 hours."
-                    elif action == 'pressure':
-                        return "Apply direct pressure and hemostatic dressing. Reassess every 10 minutes."
-                    elif action == 'airway':
-                        return "Assess for obstruction. Insert NPA if unconscious. If ineffective: surgical cricothyrotomy."
-        
-        # If no specific treatment found, return cleaned text
-        return self._clean_and_summarize_text(text)
-    
-    def _clean_and_summarize_text(self, text):
-        """Clean and summarize JTS text for voice output"""
-        
-        # Remove common headers and non-actionable content
-        text = re.sub(r'JOINT TRAUMA SYS TEM CLINICAL PRACTICE GUIDELINE.*?Contributors.*?', '', text)
-        text = re.sub(r'This CPG.*?guidance.*?', '', text)
-        text = re.sub(r'Publication Date.*?', '', text)
-        text = re.sub(r'CONTRIBUTORS.*?', '', text)
-        
-        # Limit length for voice output
-        if len(text) > 300:
-            sentences = text.split('.')
-            if len(sentences) > 1:
-                text = '. '.join(sentences[:2]) + '.'
-            else:
-                text = text[:300] + "..."
-        
-        return text.strip()
-        
     def voice_interaction_loop(self) -> None:
         """Main voice interaction loop with Crusu protocol support"""
         print("🎤 JTS Recall Engine - Voice Interface")
@@ -1050,7 +1072,7 @@ class JTSRecallEngine:
         print("")
         
         # Test voice
-        speak("JTS Recall Engine ready. Speak your medical query.")
+        self._speak("JTS Recall Engine ready. Speak your medical query.")
         
         while True:
             try:
@@ -1071,13 +1093,13 @@ class JTSRecallEngine:
                 print(f"⏱️  Response time: {end_time - start_time:.2f} seconds")
                 print(f"📋 Response: {response[:200]}...")
                 
-                # Speak response
-                speak(response)
+                # Speak response (pre-rendered while the medic was speaking, if it matched)
+                self.speak_response(query, response)
                 
                 # Handle clarifying questions for bleeding
                 if response == "Is the bleeding minor, moderate, or severe?":
                     print("🎤 Listening for bleeding severity...")
-                    severity_query = self.listen_for_query()
+                    severity_query = self.listen_for_query(speculate=False)
                     
                     if severity_query:
                         print(f"🎤 Severity: {severity_query}")
@@ -1092,21 +1114,28 @@ class JTSRecallEngine:
                         else:
                             final_response = "Apply direct pressure and hemostatic dressing. Reassess every 10 minutes."
                         
-                        speak(final_response)
+                        self._speak(final_response)
                 
                 print("")
                 
             except KeyboardInterrupt:
                 print("\n🛑 Stopping JTS Recall Engine...")
-                speak("JTS Recall Engine stopped.")
+                self._speak("JTS Recall Engine stopped.").result()
                 break
             except Exception as e:
                 logger.error(f"Error in voice interaction: {e}")
-                speak("Sorry, there was an error processing your query. Please try again.")
+                self._speak("Sorry, there was an error processing your query. Please try again.")
 
 def main():
     """Main function to run JTS Recall Engine"""
-    engine = JTSRecallEngine()
+    parser = argparse.ArgumentParser(description="JTS Recall Engine voice interface")
+    parser.add_argument("--grammar", action="store_true",
+                        help="Constrain speech recognition to the clinical vocabulary")
+    parser.add_argument("--no-barge-in", action="store_true",
+                        help="Always finish speaking, even if the medic talks over a response")
+    args = parser.parse_args()
+    
+    engine = JTSRecallEngine(use_grammar=args.grammar, barge_in=not args.no_barge_in)
     
     try:
         engine.initialize()
@@ -1114,6 +1143,8 @@ def main():
     except Exception as e:
         logger.error(f"Error initializing JTS Recall Engine: {e}")
         print(f"❌ Error: {e}")
+    finally:
+        engine.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
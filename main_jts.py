@@ -5,11 +5,11 @@ Voice-driven clinical decision making using Joint Trauma Services guidelines
 Optimized for Pi2 with 128GB storage
 """
 
-from vosk import Model, KaldiRecognizer
-import pyaudio
-import json
+from vosk import Model
+from audio_capture import AudioCapture
 import subprocess
-from tts_utils import speak, set_voice
+from tts_utils import set_voice
+from audio_cache import speak_cached
 from jts_decision_engine import VoiceDrivenJTS
 import logging
 
@@ -20,6 +20,7 @@ logger = logging.getLogger(__name__)
 class JTSClinicalAssist:
     def __init__(self):
         self.model = None
+        self.audio_capture = None
         self.jts_engine = None
         self.is_running = False
         
@@ -52,29 +53,9 @@ class JTSClinicalAssist:
         return True
     
     def listen_for_query(self):
-        """Listen for voice query using Vosk"""
-        rec = KaldiRecognizer(self.model, 16000)
-        mic = pyaudio.PyAudio().open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=16000,
-            input=True,
-            frames_per_buffer=8192
-        )
-        
-        mic.start_stream()
+        """Listen for voice query using Vosk on the persistent microphone stream"""
         print("Listening for your query...")
-        
-        while True:
-            data = mic.read(4096, exception_on_overflow=False)
-            if rec.AcceptWaveform(data):
-                result = json.loads(rec.Result())
-                text = result.get("text", "").strip()
-                if text:
-                    return text
-        
-        mic.stop_stream()
-        mic.close()
+        return self.audio_capture.listen()
     
     def process_clinical_query(self, query: str):
         """Process clinical query and provide voice response"""
@@ -86,7 +67,7 @@ class JTSClinicalAssist:
         # Speak the response
         response = result['response']
         print(f"Response: {response}")
-        speak(response)
+        speak_cached(response)
         
         return result
     
@@ -102,6 +83,15 @@ class JTSClinicalAssist:
         print("- Say 'exit' to quit")
         print("="*60)
         
+        # The microphone is opened once, here; every query reuses it (demo mode never listens)
+        if self.audio_capture is None:
+            self.audio_capture = AudioCapture(self.model)
+        try:
+            self.audio_capture.start()
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return
+        print(f"✓ Microphone ready (device {self.audio_capture.device_index})")
         self.is_running = True
         
         while self.is_running:
@@ -116,7 +106,7 @@ class JTSClinicalAssist:
                 
                 # Handle special commands
                 if query.lower() in ['exit', 'quit', 'stop']:
-                    speak("Exiting JTS Clinical Assist. Thank you for using the system.")
+                    speak_cached("Exiting JTS Clinical Assist. Thank you for using the system.")
                     self.is_running = False
                     break
                 
@@ -124,14 +114,14 @@ class JTSClinicalAssist:
                     summary = self.jts_engine.get_conversation_summary()
                     print("Conversation Summary:")
                     print(summary)
-                    speak("I've displayed the conversation summary on screen.")
+                    speak_cached("I've displayed the conversation summary on screen.")
                     continue
                 
                 elif query.lower() == 'categories':
                     categories = self.jts_engine.decision_engine.get_available_categories()
                     category_list = ", ".join(categories)
                     print(f"Available categories: {category_list}")
-                    speak(f"Available guideline categories are: {category_list}")
+                    speak_cached(f"Available guideline categories are: {category_list}")
                     continue
                 
                 # Process clinical query
@@ -139,16 +129,16 @@ class JTSClinicalAssist:
                 
                 # Ask if user wants more information
                 if result['confidence'] and len(result['decision']['relevant_guidelines']) > 1:
-                    speak("Would you like more specific information about any of these guidelines?")
+                    speak_cached("Would you like more specific information about any of these guidelines?")
                 
             except KeyboardInterrupt:
                 print("\nInterrupted by user")
-                speak("System interrupted. Exiting.")
+                speak_cached("System interrupted. Exiting.")
                 self.is_running = False
                 break
             except Exception as e:
                 logger.error(f"Error in interactive mode: {e}")
-                speak("I encountered an error. Please try again.")
+                speak_cached("I encountered an error. Please try again.")
     
     def run_demo_mode(self):
         """Run demo mode with predefined queries"""
@@ -163,7 +153,7 @@ class JTSClinicalAssist:
         
         for query in demo_queries:
             print(f"\nDemo Query: {query}")
-            speak(f"Demo query: {query}")
+            speak_cached(f"Demo query: {query}")
             
             # Process query
             result = self.process_clinical_query(query)
@@ -213,7 +203,10 @@ def main():
             
     except KeyboardInterrupt:
         print("\nExiting...")
-        speak("Goodbye!")
+        speak_cached("Goodbye!")
+    finally:
+        if app.audio_capture is not None:
+            app.audio_capture.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -5,23 +5,11 @@ Uses optimized TTS settings for better performance on Pi2 with 128GB SD card
 """
 
 from airway_tree import build_tree
-from vosk import Model, KaldiRecognizer
-import pyaudio
+from vosk import Model
+from audio_capture import AudioCapture
 import subprocess
-import json
 from tts_utils_pi import speak, set_voice
 
-def listen(model):
-    rec = KaldiRecognizer(model, 16000)
-    mic = pyaudio.PyAudio().open(format=pyaudio.paInt16, channels=1,
-                                 rate=16000, input=True, frames_per_buffer=8192)
-    mic.start_stream()
-    while True:
-        data = mic.read(4096, exception_on_overflow=False)
-        if rec.AcceptWaveform(data):
-            result = json.loads(rec.Result())
-            return result.get("text", "")
-
 def main():
     print("Initializing P2 JTS Clinical Assist (Pi Optimized)...")
     
@@ -29,6 +17,14 @@ def main():
     print("Loading speech recognition model...")
     model = Model("models/vosk-model-small-en-us-0.15")
     
+    # Keep the microphone open across prompts instead of reopening it per answer
+    capture = AudioCapture(model)
+    try:
+        capture.start()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+    
     # Set voice preference for clinical use
     set_voice("en-us")  # US English for clinical clarity
     
@@ -37,22 +33,25 @@ def main():
     
     print("System ready. Starting clinical protocol...")
     
-    while current:
-        # Speak the prompt with optimized settings
-        speak(current.prompt)
+    try:
+        while current:
+            # Speak the prompt with optimized settings
+            speak(current.prompt)
         
-        # Listen for response
-        user_input = listen(model)
-        print("User said:", user_input)
+            # Listen for response
+            user_input = capture.listen()
+            print("User said:", user_input)
         
-        if current.is_terminal:
-            speak("Protocol complete.")
-            break
+            if current.is_terminal:
+                speak("Protocol complete.")
+                break
             
-        current = current.get_next(user_input)
-        if current is None:
-            speak("Sorry, I didn't understand. Please say yes or no.")
-            current = build_tree()
+            current = current.get_next(user_input)
+            if current is None:
+                speak("Sorry, I didn't understand. Please say yes or no.")
+                current = build_tree()
+    finally:
+        capture.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+PDF Manifest
+Remembers each processed PDF (size, mtime, SHA-256) with the artifact extracted
+from it, so the corpus processors only re-extract PDFs that were added or changed
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from bm25_index import file_sha256
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class PDFManifest:
+    """
+    JSON manifest of filename -> {size, mtime_ns, sha256}, plus one compressed
+    artifact file per PDF in a sibling directory so artifacts are loaded one at
+    a time rather than all together
+
+    A PDF whose size and mtime are unchanged is trusted without hashing; otherwise
+    it is hashed and its cached artifact is only reused if the content matches.
+    `fingerprint` identifies the processor configuration that produced the
+    artifacts; a manifest written with a different one is discarded.
+    """
+
+    def __init__(self, manifest_path: Union[str, Path], fingerprint: str = ""):
+        self.manifest_path = Path(manifest_path)
+        self.artifact_directory = self.manifest_path.with_name(self.manifest_path.stem + '_artifacts')
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION and data.get('fingerprint') == fingerprint:
+                    self.entries = data.get('files', {})
+                else:
+                    logger.info(f"PDF manifest {self.manifest_path} is from another version/configuration, ignoring")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable PDF manifest {self.manifest_path}: {e}")
+
+    def _artifact_path(self, name: str, sha256: str) -> Path:
+        # Keyed on name and content: artifacts may embed the filename (e.g. as 'source')
+        return self.artifact_directory / f"{Path(name).stem}-{sha256[:16]}.json.gz"
+
+    def is_current(self, pdf_path: Path) -> bool:
+        """True if the PDF is unchanged since its artifact was recorded"""
+        entry = self.entries.get(pdf_path.name)
+        if entry is None or not self._artifact_path(pdf_path.name, entry['sha256']).exists():
+            self.misses += 1
+            return False
+
+        stat = pdf_path.stat()
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            self.hits += 1
+            return True
+
+        # Touched but possibly identical (e.g. re-downloaded): compare content
+        if entry['sha256'] == file_sha256(str(pdf_path)):
+            entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        return False
+
+    def load(self, pdf_path: Path) -> Any:
+        """Read the recorded artifact of a PDF (check is_current() first)"""
+        artifact_path = self._artifact_path(pdf_path.name, self.entries[pdf_path.name]['sha256'])
+        with gzip.open(artifact_path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def lookup(self, pdf_path: Path) -> Optional[Any]:
+        """Cached artifact for a PDF, or None if it is new or its content changed"""
+        return self.load(pdf_path) if self.is_current(pdf_path) else None
+
+    def update(self, pdf_path: Path, artifact: Any) -> None:
+        """Record the artifact extracted from a PDF"""
+        stat = pdf_path.stat()
+        sha256 = file_sha256(str(pdf_path))
+        self.artifact_directory.mkdir(parents=True, exist_ok=True)
+        artifact_path = self._artifact_path(pdf_path.name, sha256)
+        tmp_path = str(artifact_path) + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(artifact, f, ensure_ascii=False)
+        os.replace(tmp_path, artifact_path)
+
+        self.entries[pdf_path.name] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256
+        }
+
+    def prune(self, pdf_files: Iterable[Path]) -> List[str]:
+        """Drop entries for PDFs that are no longer present; returns their names"""
+        current = {pdf_file.name for pdf_file in pdf_files}
+        removed = [name for name in self.entries if name not in current]
+        for name in removed:
+            del self.entries[name]
+        return removed
+
+    def save(self) -> None:
+        """Write the manifest atomically and delete artifacts nothing refers to any more"""
+        tmp_path = str(self.manifest_path) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'fingerprint': self.fingerprint, 'files': self.entries},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+        if self.artifact_directory.exists():
+            referenced = {self._artifact_path(name, entry['sha256']).name for name, entry in self.entries.items()}
+            for artifact_path in self.artifact_directory.iterdir():
+                if artifact_path.name not in referenced:
+                    artifact_path.unlink()
+
+        logger.info(f"PDF manifest saved: {len(self.entries)} files "
+                    f"({self.hits} reused, {self.misses} extracted)")
+
+
+def config_fingerprint(config: Any) -> str:
+    """Stable fingerprint of a processor configuration (e.g. its keyword tables)"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
@@ -10,19 +10,26 @@ import sys
 import subprocess
 import json
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 import logging
 
+from corpus_io import JSONLWriter
+from pdf_manifest import PDFManifest
+
 # Add system Python path for dependencies
 sys.path.append('/Users/andrew/Library/Python/3.9/lib/python/site-packages')
 
 logger = logging.getLogger(__name__)
 
+# Extracted text of every PDF, one gzip-compressed JSON record per line
+EXTRACTED_TEXTS_FILE = "extracted_texts.jsonl.gz"
+
 class PDFProcessor:
     def __init__(self, pdf_directory: str = "jts_pdfs", output_directory: str = "processed_data"):
         self.pdf_directory = Path(pdf_directory)
         self.output_directory = Path(output_directory)
         self.output_directory.mkdir(exist_ok=True)
+        self.extracted_texts_path = self.output_directory / EXTRACTED_TEXTS_FILE
         
     def extract_text_pdftotext(self, pdf_path: Path) -> str:
         """Extract text using pdftotext subprocess (light and fast)"""
@@ -55,61 +62,67 @@ class PDFProcessor:
         """Extract text from PDF file using best available method"""
         return self.extract_text_pdftotext(pdf_path)
     
-    def process_pdf_directory(self) -> Dict:
-        """Process all PDFs in directory and return structured data"""
-        pdf_files = list(self.pdf_directory.glob("*.pdf"))
+    def iter_extracted_texts(self) -> Iterator[Dict]:
+        """Yield one extracted-text record per PDF, reusing unchanged PDFs"""
+        pdf_files = sorted(self.pdf_directory.glob("*.pdf"))
         logger.info(f"Found {len(pdf_files)} PDF files")
         
-        processed_data = {}
-        total_size = 0
+        # Unchanged PDFs reuse their extracted text from the last run
+        manifest = PDFManifest(self.output_directory / "pdf_manifest.json")
+        manifest.prune(pdf_files)
         
         for pdf_file in pdf_files:
-            logger.info(f"Processing {pdf_file.name}")
+            entry = manifest.lookup(pdf_file)
+            if entry is None:
+                logger.info(f"Processing {pdf_file.name}")
+                
+                # Extract text
+                text = self.extract_text_from_pdf(pdf_file)
+                if not text.strip():
+                    logger.warning(f"No text extracted from {pdf_file.name}")
+                    continue
+                
+                entry = {
+                    'filename': pdf_file.name,
+                    'full_text': text,
+                    'size_bytes': len(text.encode('utf-8')),
+                    'source_path': str(pdf_file)
+                }
+                manifest.update(pdf_file, entry)
             
-            # Extract text
-            text = self.extract_text_from_pdf(pdf_file)
-            if not text.strip():
-                logger.warning(f"No text extracted from {pdf_file.name}")
-                continue
-            
-            # Store processed data
-            processed_data[pdf_file.name] = {
-                'filename': pdf_file.name,
-                'full_text': text,
-                'size_bytes': len(text.encode('utf-8')),
-                'source_path': str(pdf_file)
-            }
-            
-            total_size += len(text.encode('utf-8'))
-        
-        # Save processed data
-        self.save_processed_data(processed_data, total_size)
+            yield entry
         
-        return {
-            'total_files': len(processed_data),
-            'total_size_bytes': total_size,
-            'files': list(processed_data.keys())
-        }
+        manifest.save()
+    
+    def process_pdf_directory(self) -> Dict:
+        """Process all PDFs in directory, streaming each one to disk; returns the metadata"""
+        return self.save_processed_data(self.iter_extracted_texts())
     
-    def save_processed_data(self, data: Dict, total_size: int):
-        """Save processed data to JSON files"""
-        # Save main data
-        output_file = self.output_directory / "extracted_texts.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def save_processed_data(self, records: Iterable[Dict]) -> Dict:
+        """Stream extracted-text records to compressed JSONL, then save metadata"""
+        files = []
+        total_size = 0
+        
+        # Save main data, one PDF per line
+        with JSONLWriter(self.extracted_texts_path) as writer:
+            for record in records:
+                writer.write(record)
+                files.append(record['filename'])
+                total_size += record['size_bytes']
         
         # Save metadata
         metadata = {
-            'total_files': len(data),
+            'total_files': len(files),
             'total_size_bytes': total_size,
-            'files': list(data.keys())
+            'files': files
         }
         
         metadata_file = self.output_directory / "metadata.json"
         with open(metadata_file, 'w') as f:
             json.dump(metadata, f, indent=2)
         
-        logger.info(f"Saved {len(data)} files, {total_size/1024/1024:.1f}MB total")
+        logger.info(f"Saved {len(files)} files, {total_size/1024/1024:.1f}MB total")
+        return metadata
 
 def main():
     """Test PDF processing"""
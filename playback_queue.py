@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Non-blocking Speech Playback
+A worker thread speaks queued responses in priority order so the caller can go
+straight back to listening; critical alerts preempt routine answers
+"""
+
+import itertools
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Callable, Optional, Tuple
+
+from audio_cache import speak_cached
+
+logger = logging.getLogger(__name__)
+
+# Lower plays first; a new item preempts a playing one of lower priority
+PRIORITY_CRITICAL = 0  # Critical vitals alerts
+PRIORITY_ROUTINE = 1  # Answers and prompts
+
+# Room echo keeps reaching the microphone briefly after the player exits
+ECHO_TAIL_SECONDS = 0.25
+
+
+class PlaybackQueue:
+    """
+    Priority queue of utterances spoken one at a time by a worker thread
+
+    speak_async() returns a Future that resolves to True once the text has been
+    spoken in full, or False if it was interrupted (barge-in, preemption) or
+    playback failed. is_playing() tells an audio capture when to gate echo.
+    """
+
+    def __init__(self, speak_fn: Callable[[str, threading.Event], bool] = speak_cached,
+                 echo_tail_seconds: float = ECHO_TAIL_SECONDS):
+        """
+        Args:
+            speak_fn: Speaks text, returning early once the given event is set
+            echo_tail_seconds: How long is_playing() stays true after playback ends
+        """
+        self.speak_fn = speak_fn
+        self.echo_tail_seconds = echo_tail_seconds
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Optional[str], Optional[Future]]]" = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0  # Queued or playing
+        self._current: Optional[Tuple[int, threading.Event]] = None
+        self._last_played = 0.0
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    def speak_async(self, text: str, priority: int = PRIORITY_ROUTINE) -> Future:
+        """Queue text for playback and return its completion future"""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Playback queue is closed")
+            if self._current is not None and priority < self._current[0]:
+                logger.info("🔊 Preempting playback for a higher-priority message")
+                self._current[1].set()
+            self._pending += 1
+            self._queue.put((priority, next(self._order), text, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="playback", daemon=True)
+                self._worker.start()
+        return future
+
+    def speak(self, text: str, priority: int = PRIORITY_ROUTINE) -> bool:
+        """Queue text and wait until it has been spoken"""
+        return self.speak_async(text, priority).result()
+
+    def is_playing(self) -> bool:
+        """True while anything is queued or playing, and for the echo tail after"""
+        with self._lock:
+            return self._pending > 0 or time.monotonic() - self._last_played < self.echo_tail_seconds
+
+    def interrupt(self, keep_priority: int = PRIORITY_CRITICAL) -> None:
+        """
+        Stop the current utterance and drop queued ones (the medic is talking)
+
+        Queued messages at keep_priority or more urgent are kept.
+        """
+        kept = []
+        with self._lock:
+            if self._current is not None and self._current[0] > keep_priority:
+                self._current[1].set()
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] <= keep_priority or item[3] is None:
+                    kept.append(item)
+                else:
+                    item[3].cancel()
+                    self._pending -= 1
+            for item in kept:
+                self._queue.put(item)
+            self._idle.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued has been spoken; False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _run(self) -> None:
+        """Worker: speak queued items in priority order"""
+        while True:
+            priority, _, text, future = self._queue.get()
+            if future is None:  # close()
+                return
+            played = False
+            try:
+                # A caller may have cancelled the future while it was queued
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                cancel = threading.Event()
+                with self._lock:
+                    self._current = (priority, cancel)
+                played = True
+                try:
+                    spoken = self.speak_fn(text, cancel)
+                except Exception as e:
+                    logger.error(f"Playback failed: {e}")
+                    future.set_exception(e)
+                else:
+                    future.set_result(bool(spoken) and not cancel.is_set())
+            finally:
+                with self._lock:
+                    self._current = None
+                    self._pending -= 1
+                    if played:
+                        self._last_played = time.monotonic()
+                    self._idle.notify_all()
+
+    def close(self) -> None:
+        """Stop playback, drop anything queued and stop the worker"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.interrupt(keep_priority=-1)
+        self._queue.put((PRIORITY_ROUTINE + 1, next(self._order), None, None))
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
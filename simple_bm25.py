@@ -2,13 +2,13 @@
 """
 Simple BM25 Implementation
 Lightweight BM25 search algorithm for JTS Recall Engine
-No external dependencies required
+No external dependencies required (uses the local inverted index in bm25_index.py)
 """
 
-import math
 import re
 from typing import List, Dict
-from collections import Counter
+from bm25_index import InvertedBM25
+from topk import select_top_k
 
 class SimpleBM25:
     """Simple BM25 implementation for document search"""
@@ -26,14 +26,12 @@ class SimpleBM25:
         self.k1 = k1
         self.b = b
         
-        # Tokenize documents
-        self.tokenized_docs = [self._tokenize(doc) for doc in documents]
+        # Inverted index: term -> postings (doc_id, tf), with IDF and length
+        # normalisation precomputed; raw Robertson IDF as before (no flooring)
+        self.index = InvertedBM25([self._tokenize(doc) for doc in documents], k1=k1, b=b, epsilon=None)
         
-        # Calculate document frequencies
-        self.doc_freq = self._calculate_doc_freq()
-        
-        # Calculate average document length
-        self.avg_doc_len = sum(len(doc) for doc in self.tokenized_docs) / len(self.tokenized_docs)
+        # Average document length
+        self.avg_doc_len = self.index.avgdl
         
     def _tokenize(self, text: str) -> List[str]:
         """Improved tokenization - split on whitespace, lowercase, and filter"""
@@ -53,48 +51,6 @@ class SimpleBM25:
         
         return filtered_tokens
     
-    def _calculate_doc_freq(self) -> Dict[str, int]:
-        """Calculate document frequency for each term"""
-        doc_freq = Counter()
-        for doc in self.tokenized_docs:
-            unique_terms = set(doc)
-            for term in unique_terms:
-                doc_freq[term] += 1
-        return doc_freq
-    
-    def _calculate_idf(self, term: str) -> float:
-        """Calculate inverse document frequency for a term"""
-        if term not in self.doc_freq:
-            return 0
-        
-        N = len(self.documents)
-        df = self.doc_freq[term]
-        
-        if df == 0:
-            return 0
-        
-        return math.log((N - df + 0.5) / (df + 0.5))
-    
-    def _calculate_bm25_score(self, doc_tokens: List[str], query_tokens: List[str]) -> float:
-        """Calculate BM25 score for a document given query"""
-        score = 0.0
-        
-        for term in query_tokens:
-            if term not in self.doc_freq:
-                continue
-                
-            idf = self._calculate_idf(term)
-            term_freq = doc_tokens.count(term)
-            doc_len = len(doc_tokens)
-            
-            # BM25 formula
-            numerator = term_freq * (self.k1 + 1)
-            denominator = term_freq + self.k1 * (1 - self.b + self.b * (doc_len / self.avg_doc_len))
-            
-            score += idf * (numerator / denominator)
-        
-        return score
-    
     def search(self, query: str, top_n: int = 3) -> List[int]:
         """
         Search documents and return top N document indices
@@ -112,15 +68,11 @@ class SimpleBM25:
         if not query_tokens:
             return []
         
-        # Calculate scores for all documents
-        scores = []
-        for i, doc_tokens in enumerate(self.tokenized_docs):
-            score = self._calculate_bm25_score(doc_tokens, query_tokens)
-            scores.append((score, i))
+        # Score only the documents that contain a query term
+        scores = ((score, i) for i, score in self.index.get_sparse_scores(query_tokens).items() if score > 0)
         
-        # Sort by score (descending) and return top N
-        scores.sort(reverse=True)
-        return [doc_idx for score, doc_idx in scores[:top_n] if score > 0]
+        # Keep the top N by score (descending) with a bounded heap
+        return [doc_idx for score, doc_idx in select_top_k(scores, top_n)]
 
 def create_bm25_index(corpus: List[Dict]) -> SimpleBM25:
     """
@@ -1,53 +1,33 @@
 #!/usr/bin/env python3
 """
 Simple BM25 JTS Query System
-Loads jts_corpus.json and performs BM25 queries
+Queries the shared JTS corpus index with BM25
 """
 
-import json
-from rank_bm25 import BM25Okapi
-import re
+from corpus_index import get_corpus_index
 
 class JTSBM25Query:
-    def __init__(self, corpus_file="jts_corpus.json"):
-        """Initialize with JTS corpus file"""
+    def __init__(self, corpus_file=None):
+        """Initialize with JTS corpus file (defaults to the shared preferred corpus)"""
         self.corpus_file = corpus_file
+        self.corpus_index = None
         self.paragraphs = []
         self.bm25 = None
         self.load_corpus()
-        self.build_index()
     
     def load_corpus(self):
-        """Load paragraphs from JSON corpus file"""
-        print(f"📚 Loading JTS corpus from {self.corpus_file}...")
+        """Attach to the process-wide corpus and BM25 index (loaded once, see corpus_index.py)"""
+        print(f"📚 Loading JTS corpus from {self.corpus_file or 'default corpus'}...")
         try:
-            with open(self.corpus_file, 'r', encoding='utf-8') as f:
-                self.paragraphs = json.load(f)
-            print(f"✅ Loaded {len(self.paragraphs)} paragraphs")
+            self.corpus_index = get_corpus_index(self.corpus_file)
         except Exception as e:
             print(f"❌ Error loading corpus: {e}")
-            self.paragraphs = []
-    
-    def build_index(self):
-        """Build BM25 index from paragraphs"""
-        if not self.paragraphs:
-            print("❌ No paragraphs to index")
             return
         
-        print("🔍 Building BM25 index...")
-        
-        # Tokenize paragraphs
-        tokenized = []
-        for p in self.paragraphs:
-            # Clean and tokenize text
-            text = p["text"].lower()
-            # Remove extra whitespace and split
-            tokens = re.sub(r'\s+', ' ', text).strip().split()
-            tokenized.append(tokens)
-        
-        # Build BM25 index
-        self.bm25 = BM25Okapi(tokenized)
-        print("✅ BM25 index built successfully")
+        self.corpus_file = self.corpus_index.corpus_file
+        self.paragraphs = self.corpus_index.documents
+        self.bm25 = self.corpus_index.bm25
+        print(f"✅ Loaded {len(self.paragraphs)} paragraphs with BM25 index")
     
     def query(self, query_text, n=3):
         """Perform BM25 query and return top n results"""
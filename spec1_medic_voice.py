@@ -9,15 +9,16 @@ import os
 import sys
 import json
 import subprocess
-from pathlib import Path
+import threading
 from typing import List, Dict, Optional
 import logging
 
 # SPEC-1 Required Libraries
 from vosk import Model, KaldiRecognizer
 import sounddevice as sd
-from rank_bm25 import BM25Okapi
-import fitz  # PyMuPDF
+
+from corpus_index import get_corpus_index
+from playback_queue import PlaybackQueue
 
 logger = logging.getLogger(__name__)
 
@@ -31,9 +32,10 @@ class SPEC1MedicVoice:
         self.model_path = model_path
         self.model = None
         self.recognizer = None
+        self.corpus_index = None
         self.bm25_index = None
-        self.corpus = []
-        self.corpus_texts = []
+        # Responses play in the background; the mic ignores audio captured meanwhile
+        self.playback = PlaybackQueue(speak_fn=self._espeak)
         
         # SPEC-1 Configuration
         self.sample_rate = 16000
@@ -52,10 +54,9 @@ class SPEC1MedicVoice:
             self.model = Model(self.model_path)
             self.recognizer = KaldiRecognizer(self.model, self.sample_rate)
             
-            # 2. Load JTS corpus and build BM25 index
-            logger.info("Loading JTS corpus and building BM25 index...")
+            # 2. Load shared JTS corpus and BM25 index
+            logger.info("Loading JTS corpus and BM25 index...")
             self.load_jts_corpus()
-            self.build_bm25_index()
             
             logger.info("SPEC-1-MedicVoicePi2 initialized successfully!")
             return True
@@ -65,42 +66,10 @@ class SPEC1MedicVoice:
             return False
     
     def load_jts_corpus(self):
-        """Load JTS PDF corpus (SPEC-1 requirement: PDF text extraction)"""
-        jts_dir = Path("jts_pdfs")
-        if not jts_dir.exists():
-            raise FileNotFoundError("JTS PDFs directory not found")
-        
-        pdf_files = list(jts_dir.glob("*.pdf"))
-        logger.info(f"Found {len(pdf_files)} JTS PDF files")
-        
-        for pdf_file in pdf_files:
-            try:
-                # Extract text using PyMuPDF (SPEC-1 requirement)
-                with fitz.open(pdf_file) as doc:
-                    text = "\n".join(page.get_text() for page in doc)
-                
-                # Split into paragraphs (SPEC-1 requirement: simple tokenization)
-                paragraphs = [para.strip() for para in text.split('\n') if len(para.strip()) > 20]
-                
-                for para in paragraphs:
-                    self.corpus_texts.append(para)
-                    # Tokenize for BM25 (SPEC-1 requirement: simple tokenization)
-                    tokens = para.lower().split()
-                    self.corpus.append(tokens)
-                
-            except Exception as e:
-                logger.warning(f"Failed to process {pdf_file}: {e}")
-        
-        logger.info(f"Loaded {len(self.corpus)} corpus entries")
-    
-    def build_bm25_index(self):
-        """Build BM25 index (SPEC-1 requirement: rank_bm25)"""
-        if not self.corpus:
-            raise ValueError("No corpus loaded")
-        
-        # Build BM25 index (SPEC-1 requirement)
-        self.bm25_index = BM25Okapi(self.corpus)
-        logger.info("BM25 index built successfully")
+        """Attach to the process-wide JTS corpus and BM25 index (see corpus_index.py)"""
+        self.corpus_index = get_corpus_index()
+        self.bm25_index = self.corpus_index.bm25
+        logger.info(f"Loaded {len(self.corpus_index)} corpus entries from {self.corpus_index.corpus_file}")
     
     def recognize_speech(self) -> str:
         """Recognize speech using Vosk STT (SPEC-1 requirement)"""
@@ -109,6 +78,8 @@ class SPEC1MedicVoice:
         def audio_callback(indata, frames, time, status):
             if status:
                 logger.warning(f"Audio callback status: {status}")
+            if self.playback.is_playing():  # Echo gate: don't transcribe our own voice
+                return None
             if self.recognizer.AcceptWaveform(indata.tobytes()):
                 result = json.loads(self.recognizer.Result())
                 if result.get('text'):
@@ -138,27 +109,38 @@ class SPEC1MedicVoice:
         query_tokens = query.lower().split()
         
         # Get top N results (SPEC-1 requirement)
-        top_indices = self.bm25_index.get_top_n(query_tokens, self.corpus, n=top_n)
+        top_docs = self.corpus_index.search_tokens(query_tokens, n=top_n)
         
-        # Convert back to text
-        results = []
-        for tokens in top_indices:
-            text = ' '.join(tokens)
-            results.append(text)
-        
-        return results
+        return [doc['text'] for doc in top_docs]
     
     def speak_response(self, text: str):
-        """Speak response using eSpeak NG (SPEC-1 requirement)"""
+        """Queue a response for eSpeak NG without waiting for it to finish"""
+        return self.playback.speak_async(text)
+    
+    def _espeak(self, text: str, cancel: threading.Event) -> bool:
+        """Speak using eSpeak NG (SPEC-1 requirement), stopping once cancel is set"""
         try:
-            # SPEC-1 requirement: subprocess.run(["espeak-ng", text])
-            subprocess.run(["espeak-ng", text], check=True)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"eSpeak NG failed: {e}")
-            print(f"Response: {text}")
+            # SPEC-1 requirement: espeak-ng subprocess
+            process = subprocess.Popen(["espeak-ng", text])
         except FileNotFoundError:
             logger.error("eSpeak NG not found")
             print(f"Response: {text}")
+            return False
+        
+        while True:
+            try:
+                returncode = process.wait(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel.is_set():
+                    process.kill()
+                    process.wait()
+                    return False
+        if returncode != 0:
+            logger.error(f"eSpeak NG failed with exit code {returncode}")
+            print(f"Response: {text}")
+            return False
+        return True
     
     def run_interactive_mode(self):
         """Run interactive SPEC-1 medical voice assistant"""
@@ -198,6 +180,7 @@ class SPEC1MedicVoice:
                 
             except KeyboardInterrupt:
                 print("\n👋 SPEC-1-MedicVoicePi2 stopped.")
+                self.playback.close()
                 break
             except Exception as e:
                 logger.error(f"Error in interactive mode: {e}")
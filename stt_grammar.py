@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Clinical STT Grammar
+Builds a Vosk phrase list from the corpus vocabulary, medication names and the
+decision-tree answers, cached next to the corpus and rebuilt when it changes
+
+Usage:
+    python3 stt_grammar.py [corpus_file]
+"""
+
+import hashlib
+import json
+import os
+import string
+import sys
+import logging
+from collections import Counter
+from typing import Iterable, List, Optional, Set
+
+from airway_tree import build_tree
+from corpus_index import CorpusIndex, get_corpus_index
+from corpus_io import corpus_stem
+
+logger = logging.getLogger(__name__)
+
+GRAMMAR_VERSION = 1
+
+# Most frequent corpus words kept in the grammar; a larger vocabulary decodes slower
+MAX_CORPUS_WORDS = 3000
+MIN_DOC_FREQ = 2
+MIN_WORD_LENGTH = 3
+
+# Lets the recognizer reject out-of-grammar speech instead of forcing a match
+UNKNOWN_WORD = "[unk]"
+
+# Voice commands handled by the assistants themselves
+COMMAND_WORDS = ["yes", "no", "exit", "quit", "stop", "summary", "categories", "repeat", "help"]
+
+# Spoken numbers and units for weights, vitals and doses
+NUMBER_WORDS = [
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+    "nineteen", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
+    "hundred", "thousand", "point", "half"
+]
+UNIT_WORDS = [
+    "kilograms", "kilogram", "kilos", "kg", "pounds", "milligrams", "mg", "micrograms", "mcg",
+    "grams", "milliliters", "ml", "units", "per", "minute", "minutes", "hours", "percent"
+]
+
+
+def default_grammar_path(corpus_path: str) -> str:
+    """Grammar cache that sits next to its corpus (jts_focused_corpus.json -> .grammar.json)"""
+    return corpus_stem(corpus_path) + '.grammar.json'
+
+
+def decision_tree_words(root=None) -> Set[str]:
+    """Every answer the decision tree accepts (yes/no for the airway tree)"""
+    words: Set[str] = set()
+    stack, seen = [root or build_tree()], set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        for answer, next_node in node.responses.items():
+            words.update(answer.lower().split())
+            stack.append(next_node)
+    return words
+
+
+def corpus_words(index: CorpusIndex, limit: int = MAX_CORPUS_WORDS) -> List[str]:
+    """The most widespread plain words of the corpus, by document frequency"""
+    doc_freq: Counter = Counter()
+    for term, freq in index.bm25.iter_terms():
+        # Tokens keep their punctuation ("ketamine," / "ketamine."); fold them together
+        word = term.strip(string.punctuation)
+        if len(word) >= MIN_WORD_LENGTH and word.isalpha() and word.isascii():
+            doc_freq[word] += freq
+    return [word for word, freq in doc_freq.most_common(limit) if freq >= MIN_DOC_FREQ]
+
+
+def build_grammar(index: CorpusIndex, phrases: Iterable[str] = (), limit: int = MAX_CORPUS_WORDS) -> List[str]:
+    """
+    Phrase list for a grammar-constrained KaldiRecognizer
+
+    Args:
+        index: Corpus whose vocabulary the medic is likely to ask about
+        phrases: Domain phrases to include as-is (medication names, synonyms...)
+        limit: Maximum number of corpus words
+    """
+    words = set(corpus_words(index, limit))
+    words.update(COMMAND_WORDS, NUMBER_WORDS, UNIT_WORDS, decision_tree_words())
+
+    extra = {' '.join(phrase.lower().split()) for phrase in phrases}
+    extra.discard('')
+    # Multi-word phrases stay whole; their words are also usable on their own
+    for phrase in extra:
+        words.update(phrase.split())
+
+    return sorted(words | extra) + [UNKNOWN_WORD]
+
+
+def _grammar_key(corpus_hash: str, phrases: Iterable[str], limit: int) -> str:
+    config = {'corpus': corpus_hash, 'phrases': sorted(set(phrases)), 'limit': limit, 'version': GRAMMAR_VERSION}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_or_build_grammar(index: CorpusIndex, phrases: Iterable[str] = (), grammar_path: Optional[str] = None,
+                          limit: int = MAX_CORPUS_WORDS) -> List[str]:
+    """
+    Return the cached grammar for a corpus, rebuilding it if the corpus or phrases changed
+
+    Args:
+        index: Loaded corpus index (its hash keys the cache)
+        phrases: Domain phrases to include
+        grammar_path: Cache file; defaults to <corpus>.grammar.json
+        limit: Maximum number of corpus words
+    """
+    phrases = list(phrases)
+    grammar_path = grammar_path or default_grammar_path(index.corpus_file)
+    key = _grammar_key(index.bm25.corpus_hash, phrases, limit)
+
+    if os.path.exists(grammar_path):
+        try:
+            with open(grammar_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('key') == key:
+                logger.info(f"Loaded STT grammar from {grammar_path}: {len(cached['phrases'])} phrases")
+                return cached['phrases']
+            logger.info(f"STT grammar {grammar_path} is stale, rebuilding")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable STT grammar {grammar_path}: {e}")
+
+    grammar = build_grammar(index, phrases, limit)
+    tmp_path = grammar_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'key': key, 'phrases': grammar}, f, ensure_ascii=False)
+    os.replace(tmp_path, grammar_path)
+    logger.info(f"STT grammar written to {grammar_path}: {len(grammar)} phrases")
+    return grammar
+
+
+def main():
+    """Build (or refresh) the STT grammar for a corpus file"""
+    logging.basicConfig(level=logging.INFO)
+    # Same phrases as the recall engine, so it finds this cache up to date
+    from jts_recall_engine import grammar_phrases
+
+    corpus_file = sys.argv[1] if len(sys.argv) > 1 else None
+    index = get_corpus_index(corpus_file)
+    grammar = load_or_build_grammar(index, grammar_phrases())
+    print(f"✅ {len(grammar)} phrases in {default_grammar_path(index.corpus_file)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the persisted BM25 index: round trip and rejection of damaged files
+Run with: python3 -m pytest test_bm25_index.py
+"""
+
+import json
+
+import pytest
+
+from bm25_index import MappedBM25Index, build_index_file, load_or_build_index, tokenize
+
+DOCS = [
+    "ketamine 1-2 mg/kg IV for analgesia",
+    "tranexamic acid 1 g IV over 10 minutes",
+    "apply tourniquet high and tight on the limb",
+    "needle decompression for tension pneumothorax",
+]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / "docs.bm25")
+    build_index_file([tokenize(doc) for doc in DOCS], path, "00" * 32)
+    return path
+
+
+def test_round_trip(index_path):
+    with MappedBM25Index(index_path) as index:
+        top = index.get_top_n(tokenize("ketamine analgesia"), DOCS, n=1)
+    assert top == [DOCS[0]]
+
+
+@pytest.mark.parametrize("cut", [0, 10, 100, 101, -5, -1])
+def test_truncated_index_is_rejected(index_path, cut):
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    with open(index_path, 'wb') as f:
+        f.write(data[:cut] if cut else b'')
+
+    with pytest.raises(ValueError):
+        MappedBM25Index(index_path)
+
+
+def test_truncated_index_is_rebuilt(tmp_path):
+    corpus_path = tmp_path / "corpus.json"
+    corpus_path.write_text(json.dumps([{'text': doc} for doc in DOCS]))
+    with load_or_build_index(str(corpus_path)) as index:
+        index_path = index.index_path
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    with open(index_path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    with load_or_build_index(str(corpus_path)) as index:
+        assert index.corpus_size == len(DOCS)
+        assert index.get_top_n(tokenize("tourniquet"), DOCS, n=1) == [DOCS[2]]
@@ -4,62 +4,32 @@ Test BM25 Queries for JTS Corpus
 Demonstrates the BM25 query system with predefined queries
 """
 
-import json
-from rank_bm25 import BM25Okapi
+from corpus_index import get_corpus_index
 import re
 
-def load_corpus(corpus_file="jts_corpus.json"):
-    """Load paragraphs from JSON corpus file"""
-    print(f"📚 Loading JTS corpus from {corpus_file}...")
+def load_corpus(corpus_file=None):
+    """Load the shared corpus index (corpus + BM25 index, loaded once per process)"""
+    print(f"📚 Loading JTS corpus from {corpus_file or 'default corpus'}...")
     try:
-        with open(corpus_file, 'r', encoding='utf-8') as f:
-            paragraphs = json.load(f)
-        print(f"✅ Loaded {len(paragraphs)} paragraphs")
-        return paragraphs
+        index = get_corpus_index(corpus_file)
+        print(f"✅ Loaded {len(index)} paragraphs from {index.corpus_file}")
+        return index
     except Exception as e:
         print(f"❌ Error loading corpus: {e}")
-        return []
-
-def build_bm25_index(paragraphs):
-    """Build BM25 index from paragraphs"""
-    if not paragraphs:
-        print("❌ No paragraphs to index")
         return None
-    
-    print("🔍 Building BM25 index...")
-    
-    # Tokenize paragraphs
-    tokenized = []
-    for p in paragraphs:
-        # Clean and tokenize text
-        text = p["text"].lower()
-        # Remove extra whitespace and split
-        tokens = re.sub(r'\s+', ' ', text).strip().split()
-        tokenized.append(tokens)
-    
-    # Build BM25 index
-    bm25 = BM25Okapi(tokenized)
-    print("✅ BM25 index built successfully")
-    return bm25
 
-def query_bm25(bm25, paragraphs, query_text, n=3):
+def query_bm25(index, query_text, n=3):
     """Perform BM25 query and return top n results"""
-    if not bm25:
+    if not index:
         print("❌ BM25 index not built")
         return []
     
-    # Tokenize query
-    query_tokens = query_text.lower().split()
-    
-    # Get top n results
-    results = bm25.get_top_n(query_tokens, paragraphs, n=n)
-    
-    return results
+    return index.search(query_text, n=n)
 
-def extract_ketamine_dose(paragraphs, bm25, weight_kg=None):
+def extract_ketamine_dose(index, weight_kg=None):
     """Extract ketamine dosing information"""
     query = "ketamine dose mg/kg"
-    results = query_bm25(bm25, paragraphs, query, n=5)
+    results = query_bm25(index, query, n=5)
     
     print(f"🔍 Ketamine dosing information:")
     print("=" * 50)
@@ -102,14 +72,9 @@ def main():
     print("🎯 JTS BM25 Query Test")
     print("=" * 40)
     
-    # Load corpus
-    paragraphs = load_corpus()
-    if not paragraphs:
-        return
-    
-    # Build BM25 index
-    bm25 = build_bm25_index(paragraphs)
-    if not bm25:
+    # Load corpus and BM25 index
+    index = load_corpus()
+    if not index:
         return
     
     # Test queries
@@ -123,7 +88,7 @@ def main():
     for query in test_queries:
         print(f"\n🔍 Query: {query}")
         print("-" * 30)
-        results = query_bm25(bm25, paragraphs, query, n=2)
+        results = query_bm25(index, query, n=2)
         
         for i, result in enumerate(results, 1):
             print(f"\nResult {i}:")
@@ -133,7 +98,7 @@ def main():
     
     # Specific ketamine dose extraction
     print(f"\n🎯 Specific ketamine dose extraction:")
-    extract_ketamine_dose(paragraphs, bm25, weight_kg=80)
+    extract_ketamine_dose(index, weight_kg=80)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
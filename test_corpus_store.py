@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar corpus store: round trip and rejection of damaged files
+Run with: python3 -m pytest test_corpus_store.py
+"""
+
+import json
+
+import pytest
+
+from corpus_store import CorpusStore, load_or_build_store, write_store_file
+
+CORPUS = [
+    {'text': "ketamine 1-2 mg/kg IV for analgesia", 'source': "SMOG.pdf", 'page': 12, 'score': 0.5},
+    {'text': "tranexamic acid 1 g IV over 10 minutes", 'source': "SMOG.pdf", 'page': 14, 'score': 1.5},
+    {'text': "apply tourniquet high and tight", 'source': "TCCC.pdf", 'page': 3, 'score': 2.5, 'tags': ["hemorrhage"]},
+    {'text': "needle decompression for tension pneumothorax", 'source': "TCCC.pdf", 'page': 7, 'score': 0.0},
+]
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / "corpus.store")
+    write_store_file(CORPUS, path, "00" * 32)
+    return path
+
+
+def test_round_trip(store_path):
+    with CorpusStore(store_path) as store:
+        assert [dict(record) for record in store] == CORPUS
+
+
+@pytest.mark.parametrize("cut", [0, 10, 60, 101, -5, -1])
+def test_truncated_store_is_rejected(store_path, cut):
+    with open(store_path, 'rb') as f:
+        data = f.read()
+    with open(store_path, 'wb') as f:
+        f.write(data[:cut] if cut else b'')
+
+    with pytest.raises(ValueError):
+        CorpusStore(store_path)
+
+
+def test_truncated_store_is_rebuilt(tmp_path):
+    corpus_path = tmp_path / "corpus.json"
+    corpus_path.write_text(json.dumps(CORPUS))
+    with load_or_build_store(str(corpus_path)) as store:
+        store_path = store.store_path
+    with open(store_path, 'rb') as f:
+        data = f.read()
+    with open(store_path, 'wb') as f:
+        f.write(data[:len(data) - 7])
+
+    with load_or_build_store(str(corpus_path)) as store:
+        assert [dict(record) for record in store] == CORPUS
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the dose calculator and the max-dose caps read into the dose table
+Run with: python3 -m pytest test_dose_calculator.py
+"""
+
+import pytest
+
+from dose_calculator import DoseFormulaError, DosePanel, DoseRange, compile_formula, dose_cap
+from dose_table import extract_doses, format_dose
+
+
+def first_dose(text):
+    return next(extract_doses(text, 'test.pdf', 1))
+
+
+def test_formula_ranges_and_caps():
+    assert compile_formula("weight * range(1, 2)")(weight=80) == DoseRange(80, 160)
+    assert compile_formula("min(weight * 0.1, 2)")(weight=80) == 2
+    with pytest.raises(DoseFormulaError):
+        compile_formula("__import__('os')")
+
+
+def test_single_dose_cap_is_applied():
+    record = first_dose("Naloxone 0.1mg/kg IV/IM (max 2mg)")
+    assert (record['max_dose'], record['max_unit']) == (2.0, 'mg')
+    assert format_dose(record, 80) == "Naloxone 0.1 mg/kg IV/IM. For 80kg patient: 2 mg IV/IM (max dose)."
+
+
+def test_per_kg_cap_is_applied_per_kg():
+    record = first_dose("Lidocaine IV/IO 1ST Dose 1-1.5 mg/kg Max dose 3mg/kg")
+    assert record['max_unit'] == 'mg/kg'
+    assert dose_cap(record) is None
+    assert dose_cap(record, 80) == 240
+    assert format_dose(record, 80) == "Lidocaine 1-1.5 mg/kg IV/IO. For 80kg patient: 80-120 mg IV/IO."
+
+
+@pytest.mark.parametrize('text, max_unit', [
+    ("Manage pain with HYDROMORPHONE 0.1 mg/kg IV boluses, not to exceed 0.2 mg/kg per hour.", 'mg/kg/hr'),
+    ("Cefazolin 20-30 mg/kg IV q 6-8h (maximum, 100 mg/kg/day)", 'mg/kg/day'),
+    ("Methylprednisolone 0.5-1 mg/kg q 6 hrs. (maximum: 60 mg/day)", 'mg/day'),
+    ("Ketorolac 15-30 mg every 6 hours (maximum daily dose: 120 mg)", 'mg/day'),
+    ("Diazepam 1 mg given slowly every 2-5 minutes (maximum total dose: 10 mg)", 'mg/total'),
+    ("Lorazepam 4 mg at a maximum rate of 2mg/min", 'mg/min'),
+])
+def test_rate_and_daily_caps_are_not_single_dose_caps(text, max_unit):
+    record = first_dose(text)
+    assert record['max_unit'] == max_unit
+    assert dose_cap(record, 80) is None
+    assert "(max dose)" not in format_dose(record, 80)
+
+
+def test_panel_applies_only_single_dose_caps():
+    records = [
+        first_dose("Lorazepam 4 mg at a maximum rate of 2mg/min"),
+        first_dose("Naloxone 0.1mg/kg IV/IM (max 2mg)"),
+        first_dose("Lidocaine IV/IO 1ST Dose 1-1.5 mg/kg Max dose 3mg/kg"),
+        first_dose("Cefazolin 20-30 mg/kg IV q 6-8h (maximum, 100 mg/kg/day)"),
+    ]
+    doses = DosePanel(records).compute(80)
+    assert [(dose['dose'], dose['capped']) for dose in doses] == [
+        (DoseRange(4), False),
+        (DoseRange(2), True),
+        (DoseRange(80, 120), False),
+        (DoseRange(1600, 2400), False),
+    ]
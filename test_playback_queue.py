@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the playback queue's bookkeeping of queued, cancelled and spoken items
+Run with: python3 -m pytest test_playback_queue.py
+"""
+
+import threading
+
+from playback_queue import PlaybackQueue
+
+
+def blocking_speaker():
+    """speak_fn that holds the worker on the first utterance until released"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def speak(text, cancel):
+        started.set()
+        release.wait(5)
+        return True
+
+    return speak, started, release
+
+
+def test_cancelled_queued_item_does_not_keep_queue_playing():
+    speak, started, release = blocking_speaker()
+    playback = PlaybackQueue(speak_fn=speak, echo_tail_seconds=0)
+    try:
+        first = playback.speak_async("first")
+        assert started.wait(5)
+        queued = playback.speak_async("second")
+        assert queued.cancel()
+
+        release.set()
+        assert first.result(5) is True
+        assert playback.wait(5)
+        assert not playback.is_playing()
+    finally:
+        release.set()
+        playback.close()
+
+
+def test_interrupt_drops_queued_items():
+    speak, started, release = blocking_speaker()
+    playback = PlaybackQueue(speak_fn=speak, echo_tail_seconds=0)
+    try:
+        playback.speak_async("first")
+        assert started.wait(5)
+        queued = playback.speak_async("second")
+        playback.interrupt()
+        release.set()
+
+        assert queued.cancelled()
+        assert playback.wait(5)
+        assert not playback.is_playing()
+    finally:
+        release.set()
+        playback.close()
@@ -5,13 +5,17 @@ Handles text indexing using TF-IDF or BM25 for efficient query matching
 Optimized for Pi2 with minimal memory usage
 """
 
-import json
 import pickle
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 import logging
 
+from bm25_index import InvertedBM25
+from corpus_io import iter_jsonl
+from pdf_processor import EXTRACTED_TEXTS_FILE
+from topk import select_top_k
+
 # Add system Python path for dependencies
 sys.path.append('/Users/andrew/Library/Python/3.9/lib/python/site-packages')
 
@@ -27,14 +31,13 @@ class TextIndexer:
         self.documents = []
         self.document_ids = []
         
-    def load_processed_data(self) -> Dict:
-        """Load processed PDF data"""
-        data_file = self.data_directory / "extracted_texts.json"
+    def iter_processed_data(self) -> Iterator[Dict]:
+        """Read processed PDF records lazily, one PDF at a time"""
+        data_file = self.data_directory / EXTRACTED_TEXTS_FILE
         if not data_file.exists():
             raise FileNotFoundError(f"Processed data not found at {data_file}")
         
-        with open(data_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return iter_jsonl(data_file)
     
     def create_tfidf_index(self, documents: List[str]) -> object:
         """Create TF-IDF index using scikit-learn"""
@@ -65,29 +68,23 @@ class TextIndexer:
             return self.create_simple_index(documents)
     
     def create_bm25_index(self, documents: List[str]) -> object:
-        """Create BM25 index using rank_bm25"""
-        try:
-            from rank_bm25 import BM25Okapi
-            import re
-            
-            # Tokenize documents
-            tokenized_docs = []
-            for doc in documents:
-                tokens = re.findall(r'\w+', doc.lower())
-                tokenized_docs.append(tokens)
-            
-            # Create BM25 index
-            bm25 = BM25Okapi(tokenized_docs)
-            
-            return {
-                'bm25': bm25,
-                'documents': tokenized_docs,
-                'type': 'bm25'
-            }
-            
-        except ImportError:
-            logger.warning("rank_bm25 not available, using simple text matching")
-            return self.create_simple_index(documents)
+        """Create BM25 index using the local inverted-index BM25"""
+        import re
+        
+        # Tokenize documents
+        tokenized_docs = []
+        for doc in documents:
+            tokens = re.findall(r'\w+', doc.lower())
+            tokenized_docs.append(tokens)
+        
+        # Create BM25 index
+        bm25 = InvertedBM25(tokenized_docs)
+        
+        return {
+            'bm25': bm25,
+            'documents': tokenized_docs,
+            'type': 'bm25'
+        }
     
     def create_simple_index(self, documents: List[str]) -> object:
         """Create simple keyword-based index as fallback"""
@@ -111,15 +108,13 @@ class TextIndexer:
     def build_index(self, index_type: str = "tfidf") -> Dict:
         """Build text index from processed data"""
         logger.info("Loading processed data...")
-        data = self.load_processed_data()
-        
         # Prepare documents
         self.documents = []
         self.document_ids = []
         
-        for filename, content in data.items():
+        for content in self.iter_processed_data():
             self.documents.append(content['full_text'])
-            self.document_ids.append(filename)
+            self.document_ids.append(content['filename'])
         
         logger.info(f"Indexing {len(self.documents)} documents...")
         
@@ -150,15 +145,10 @@ class TextIndexer:
         # Calculate similarities
         similarities = cosine_similarity(query_vector, self.index['matrix']).flatten()
         
-        # Get top results
-        top_indices = similarities.argsort()[-top_k:][::-1]
+        # Get top relevant results
+        top_indices = select_top_k(range(len(similarities)), top_k, key=similarities.__getitem__, threshold=0)
         
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:  # Only return relevant results
-                results.append((idx, float(similarities[idx])))
-        
-        return results
+        return [(idx, float(similarities[idx])) for idx in top_indices]
     
     def search_bm25(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
         """Search using BM25"""
@@ -167,18 +157,10 @@ class TextIndexer:
         # Tokenize query
         query_tokens = re.findall(r'\w+', query.lower())
         
-        # Get scores
-        scores = self.index['bm25'].get_scores(query_tokens)
-        
-        # Get top results
-        top_indices = scores.argsort()[-top_k:][::-1]
+        # Get top relevant results straight from the postings
+        top = self.index['bm25'].top_n_ids(query_tokens, top_k, early_termination=True)
         
-        results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # Only return relevant results
-                results.append((idx, float(scores[idx])))
-        
-        return results
+        return [(idx, score) for idx, score in top if score > 0]
     
     def search_simple(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
         """Search using simple keyword matching"""
@@ -191,13 +173,10 @@ class TextIndexer:
                 if len(word) > 3 and word in doc_lower:
                     scores[i] += 1
         
-        # Get top results
-        top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
+        # Get top relevant results
+        top_indices = select_top_k(range(len(scores)), top_k, key=scores.__getitem__, threshold=0)
         
-        results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # Only return relevant results
-                results.append((idx, float(scores[idx])))
+        results = [(idx, float(scores[idx])) for idx in top_indices]
         
         return results
     
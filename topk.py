@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Top-k Selection
+Shared bounded-heap top-k selector for every search path, so per-query cost is
+O(n log k) instead of sorting every scored candidate to keep 3-5 of them
+"""
+
+import heapq
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+def select_top_k(items: Iterable[T], k: int, key: Optional[Callable[[T], float]] = None,
+                 threshold: Optional[float] = None) -> List[T]:
+    """
+    Return the k best items, best first
+
+    Equivalent to sorted(items, key=key, reverse=True)[:k] (ties keep their input
+    order) but only ever holds k items in the heap.
+
+    Args:
+        items: Candidates to rank
+        k: Number of items to keep
+        key: Score function (defaults to the item itself)
+        threshold: If given, only items scoring strictly above it are kept
+    """
+    if k <= 0:
+        return []
+
+    if threshold is not None:
+        score = key or (lambda item: item)
+        items = (item for item in items if score(item) > threshold)
+
+    return heapq.nlargest(k, items, key=key)
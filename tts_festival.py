@@ -5,51 +5,71 @@ Better sounding offline TTS for Pi2 deployment
 Much more natural than eSpeak while remaining lightweight
 """
 
+import json
+import shutil
 import subprocess
+import threading
 import logging
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Voice detection results persisted across runs (see FestivalTTS.refresh_voices())
+VOICE_CACHE_FILE = "festival_voices.json"
+
+MBROLA_VOICES = ['mb-us1', 'mb-us2', 'mb-us3']
+
 class FestivalTTS:
     """
     Festival TTS with MBROLA voices for better quality offline speech
     Pi2-friendly with natural sounding voices
     """
     
-    def __init__(self):
-        self.available_voices = self._detect_voices()
+    def __init__(self, voice_cache_file: Optional[str] = None):
+        self.voice_cache_file = voice_cache_file
         self.current_voice = 'mb-us1'  # Default MBROLA voice
         self.festival_running = False
+        self.available_voices = self._load_cached_voices()
+        if self.available_voices is None:
+            self.refresh_voices()
         
-    def _detect_voices(self) -> list:
-        """Detect available Festival and MBROLA voices"""
-        voices = []
-        
-        # Check for Festival
+    def _detect_voices(self) -> Dict[str, Optional[str]]:
+        """Locate Festival and the MBROLA voices on PATH (voice -> binary path or None)"""
+        binaries = {'festival': shutil.which('festival')}
+        for voice in MBROLA_VOICES:
+            binaries[voice] = shutil.which(f'mbrola-{voice}')
+        return binaries
+    
+    def _load_cached_voices(self) -> Optional[List[str]]:
+        """Voices from the cache file, if every binary it recorded is still installed"""
+        if not self.voice_cache_file or not os.path.exists(self.voice_cache_file):
+            return None
         try:
-            result = subprocess.run(['which', 'festival'], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                voices.append('festival')
-                logger.info("Festival TTS detected")
-        except Exception:
-            pass
+            with open(self.voice_cache_file, 'r', encoding='utf-8') as f:
+                binaries = json.load(f)['binaries']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable voice cache {self.voice_cache_file}: {e}")
+            return None
+        if not all(os.path.exists(path) for path in binaries.values() if path):
+            return None
+        return [voice for voice, path in binaries.items() if path]
+    
+    def refresh_voices(self) -> List[str]:
+        """Detect the installed voices again (e.g. after installing MBROLA) and update the cache"""
+        binaries = self._detect_voices()
+        self.available_voices = [voice for voice, path in binaries.items() if path]
+        logger.info(f"Detected voices: {self.available_voices or 'none'}")
         
-        # Check for MBROLA voices
-        mbrola_voices = ['mb-us1', 'mb-us2', 'mb-us3']
-        for voice in mbrola_voices:
+        if self.voice_cache_file:
             try:
-                result = subprocess.run(['which', f'mbrola-{voice}'], 
-                                      capture_output=True, text=True)
-                if result.returncode == 0:
-                    voices.append(voice)
-                    logger.info(f"MBROLA voice {voice} detected")
-            except Exception:
-                pass
-        
-        return voices
+                tmp_path = self.voice_cache_file + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'binaries': binaries}, f)
+                os.replace(tmp_path, self.voice_cache_file)
+            except OSError as e:
+                logger.warning(f"Could not write voice cache {self.voice_cache_file}: {e}")
+        return self.available_voices
     
     def speak_festival(self, text: str, voice: str = 'festival') -> bool:
         """Speak using Festival TTS"""
@@ -172,20 +192,32 @@ class FestivalTTS:
                 print(f"❌ {voice} - Failed")
             print("")
 
+_instance: Optional[FestivalTTS] = None
+_instance_lock = threading.Lock()
+
+def get_festival_tts() -> FestivalTTS:
+    """Return the process-wide FestivalTTS, detecting voices on first use"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = FestivalTTS(voice_cache_file=VOICE_CACHE_FILE)
+        return _instance
+
 def speak(text: str, voice: Optional[str] = None) -> bool:
     """Global speak function using Festival TTS"""
-    tts = FestivalTTS()
-    return tts.speak(text, voice)
+    return get_festival_tts().speak(text, voice)
 
 def set_voice(voice: str) -> bool:
     """Global voice setting function"""
-    tts = FestivalTTS()
-    return tts.set_voice(voice)
+    return get_festival_tts().set_voice(voice)
+
+def refresh_voices() -> List[str]:
+    """Global function to re-detect installed voices"""
+    return get_festival_tts().refresh_voices()
 
 def test_voices():
     """Global test function"""
-    tts = FestivalTTS()
-    tts.test_voices()
+    get_festival_tts().test_voices()
 
 if __name__ == "__main__":
     # Test the Festival TTS system
@@ -5,18 +5,195 @@ Provides multiple voice options with better quality settings
 Uses Festival with MBROLA voices for best quality
 """
 
+import atexit
+import itertools
+import queue
+import shutil
 import subprocess
 import platform
 import os
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Festival child restarts allowed in a row before it is left alone for FESTIVAL_RETRY_DELAY
+FESTIVAL_MAX_RESTARTS = 3
+FESTIVAL_RETRY_DELAY = 60
+FESTIVAL_COMMAND_TIMEOUT = 10
+
+def _scheme_string(text):
+    """Quote text as a Festival (SIOD) string literal"""
+    text = ' '.join(str(text).split())
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+class FestivalPipe:
+    """
+    One long-lived `festival --pipe` child that keeps its voice loaded
+
+    Commands are written to the child's stdin; after each one a marker is printed
+    and flushed, so a command counts as done (and audio as played, since Festival
+    plays synchronously) once its marker comes back. Error output before the marker
+    means the command failed. The child is restarted if it dies or stops answering;
+    after FESTIVAL_MAX_RESTARTS failed starts in a row it is not retried for
+    FESTIVAL_RETRY_DELAY seconds.
+    """
+    
+    def __init__(self, command_timeout=FESTIVAL_COMMAND_TIMEOUT):
+        self.command_timeout = command_timeout
+        self.process = None
+        self.voice = None
+        self.restarts = 0
+        self._started = False
+        self._failed_starts = 0
+        self._retry_after = 0.0
+        self._lines = None
+        self._markers = itertools.count(1)
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+    
+    @property
+    def available(self):
+        """False while Festival is missing or keeps failing"""
+        return self.process is not None or time.time() >= self._retry_after
+    
+    def _start(self):
+        festival = shutil.which('festival')
+        if festival is None:
+            raise FileNotFoundError("festival not found")
+        
+        # Festival's stdout is a pipe, so make sure the markers are not stuck in its stdio buffer
+        cmd = [festival, '--pipe']
+        if shutil.which('stdbuf'):
+            cmd = ['stdbuf', '-oL'] + cmd
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, bufsize=1)
+        self.voice = None
+        if self._started:
+            self.restarts += 1
+        self._started = True
+        
+        # Reader thread: hand output lines to whoever is waiting for a marker
+        lines = self._lines = queue.Queue()
+        def read_output(stream):
+            for line in stream:
+                lines.put(line)
+            lines.put(None)  # EOF: the child exited
+        threading.Thread(target=read_output, args=(self.process.stdout,), name="festival-output",
+                         daemon=True).start()
+        logger.info(f"Started persistent Festival process (pid {self.process.pid})")
+    
+    def _ensure_running(self):
+        if self.process is not None and self.process.poll() is None:
+            return True
+        if self.process is not None:
+            logger.warning(f"Festival process exited with code {self.process.returncode}, restarting")
+            self._kill()
+        if time.time() < self._retry_after:
+            return False
+        try:
+            self._start()
+            return True
+        except OSError as e:
+            self._failed_starts += 1
+            if self._failed_starts >= FESTIVAL_MAX_RESTARTS:
+                self._retry_after = time.time() + FESTIVAL_RETRY_DELAY
+                self._failed_starts = 0
+            logger.debug(f"Could not start Festival: {e}")
+            return False
+    
+    def _run(self, command, timeout):
+        """Send one Scheme command and wait for its marker; True if it ran without errors"""
+        marker = f"jts_done_{next(self._markers)}"
+        try:
+            self.process.stdin.write(f"{command}\n(print '{marker})\n(fflush nil)\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            logger.debug(f"Festival pipe write failed: {e}")
+            self._kill()
+            return False
+        
+        ok = True
+        deadline = time.time() + timeout
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                logger.warning(f"Festival did not answer within {timeout:.0f}s, restarting it")
+                self._kill()
+                return False
+            if line is None:
+                self._kill()
+                return False
+            line = line.strip()
+            if line.strip('"') == marker:
+                if ok:
+                    self._failed_starts = 0
+                return ok
+            if 'error' in line.lower():
+                logger.debug(f"Festival: {line}")
+                ok = False
+    
+    def execute(self, command, voice=None, timeout=None):
+        """Run a Scheme command in the persistent child, starting or restarting it as needed"""
+        with self._lock:
+            if not self._ensure_running():
+                return False
+            if voice and voice != self.voice:
+                # A missing MBROLA voice leaves Festival on its default voice; remember the attempt anyway
+                if not self._run(f"(voice_{voice})", self.command_timeout) and self.process is None:
+                    return False
+                self.voice = voice
+            return self._run(command, timeout or self.command_timeout)
+    
+    def say(self, text, voice=None):
+        """Speak text, returning once playback has finished"""
+        # Allow for long responses: Festival speaks roughly 15 characters per second
+        timeout = self.command_timeout + len(text) / 15
+        return self.execute(f"(SayText {_scheme_string(text)})", voice, timeout)
+    
+    def save_wave(self, text, wav_path, voice=None):
+        """Render text to a RIFF WAV file without playing it"""
+        command = (f"(utt.save.wave (utt.synth (Utterance Text {_scheme_string(text)})) "
+                   f"{_scheme_string(wav_path)} 'riff)")
+        timeout = self.command_timeout + len(text) / 15
+        return self.execute(command, voice, timeout) and os.path.exists(wav_path)
+    
+    def _kill(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+        self.voice = None
+    
+    def close(self):
+        """Stop the child process"""
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                try:
+                    self.process.stdin.write("(quit)\n")
+                    self.process.stdin.flush()
+                    self.process.wait(timeout=2)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
 class TTSManager:
     def __init__(self, voice_preference="mb-us1"):
         self.voice_preference = voice_preference
         self.system = platform.system()
+        self.festival = FestivalPipe()
         
+    def speak_festival_pipe(self, text):
+        """Use the persistent Festival process (no interpreter or voice startup per utterance)"""
+        if self.festival.say(text, voice=self.voice_preference):
+            logger.info(f"Persistent Festival voice {self.voice_preference} used successfully")
+            return True
+        return False
+    
     def speak_festival_mbrola(self, text):
         """Use Festival with MBROLA voices (best quality)"""
         try:
@@ -97,13 +274,16 @@ class TTSManager:
     
     def speak(self, text):
         """Main speak function that tries multiple TTS options in quality order"""
-        # 1. Try Festival with MBROLA first (best quality)
-        if self.speak_festival_mbrola(text):
+        # 1. Try the persistent Festival process with the preferred (MBROLA) voice
+        if self.speak_festival_pipe(text):
             return True
         
-        # 2. Try Festival TTS (good quality)
-        if self.speak_festival(text):
-            return True
+        # 2. Festival one-shot commands, unless the persistent process just showed Festival is missing
+        if self.festival.available:
+            if self.speak_festival_mbrola(text):
+                return True
+            if self.speak_festival(text):
+                return True
         
         # 3. Try enhanced macOS say (better than default)
         if self.speak_enhanced_say(text):
@@ -121,6 +301,57 @@ class TTSManager:
         print(f"SPEAK: {text}")
         return False
 
+    def synthesize_to_file(self, text, wav_path):
+        """Render speech to a WAV file instead of the speaker, in the same quality order"""
+        if self.festival.save_wave(text, wav_path, voice=self.voice_preference):
+            return True
+        
+        commands = [
+            # Festival with MBROLA, then Festival's default voice
+            ['text2wave', '-o', wav_path, '-eval', f'(voice_{self.voice_preference})'],
+            ['text2wave', '-o', wav_path],
+        ]
+        if self.system == "Darwin":
+            commands.append(["say", "-v", "Samantha", "-r", "130", "-o", wav_path,
+                             "--data-format=LEI16@22050", text])
+        commands.append(["espeak-ng", "-v", self.voice_preference, "-s", "140", "-p", "60",
+                         "-a", "120", "-g", "5", "-k", "5", "-w", wav_path, text])
+        commands.append(["espeak-ng", "-w", wav_path, text])
+        
+        for cmd in commands:
+            try:
+                # text2wave reads the text from stdin; the others take it as an argument
+                stdin_text = text if cmd[0] == 'text2wave' else None
+                subprocess.run(cmd, input=stdin_text, text=True, check=True, capture_output=True, timeout=15)
+                if os.path.exists(wav_path) and os.path.getsize(wav_path) > 0:
+                    return True
+            except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
+                logger.debug(f"{cmd[0]} synthesis failed: {e}")
+        return False
+    
+    def play_file(self, wav_path, cancel=None):
+        """Play a rendered WAV file; stops early (returning False) once the cancel event is set"""
+        player = ["afplay", wav_path] if self.system == "Darwin" else ["aplay", "-q", wav_path]
+        try:
+            process = subprocess.Popen(player, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError as e:
+            logger.debug(f"Playback of {wav_path} failed: {e}")
+            return False
+        
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                returncode = process.wait(timeout=0.05)
+            except subprocess.TimeoutExpired:
+                if (cancel is not None and cancel.is_set()) or time.monotonic() > deadline:
+                    process.kill()
+                    process.wait()
+                    return False
+                continue
+            if returncode != 0:
+                logger.debug(f"Playback of {wav_path} failed with exit code {returncode}")
+            return returncode == 0
+
 # Global TTS manager instance with MBROLA preference
 tts_manager = TTSManager("mb-us1")
 
@@ -128,6 +359,14 @@ def speak(text):
     """Global speak function for easy use"""
     return tts_manager.speak(text)
 
+def synthesize_to_file(text, wav_path):
+    """Global function to render speech to a WAV file"""
+    return tts_manager.synthesize_to_file(text, wav_path)
+
+def play_file(wav_path, cancel=None):
+    """Global function to play a rendered WAV file"""
+    return tts_manager.play_file(wav_path, cancel)
+
 def set_voice(voice_name):
     """Change the voice preference"""
     global tts_manager
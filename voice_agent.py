@@ -13,7 +13,7 @@ from typing import Dict, List, Optional
 # Import our modules
 from pdf_processor import PDFProcessor
 from text_indexer import TextIndexer
-from tts_utils import speak
+from playback_queue import PlaybackQueue
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +21,7 @@ class VoiceAgent:
     def __init__(self):
         self.pdf_processor = PDFProcessor()
         self.text_indexer = TextIndexer()
+        self.playback = PlaybackQueue()  # Answers play while the next query is typed
         self.is_initialized = False
         
     def initialize(self) -> bool:
@@ -29,8 +30,7 @@ class VoiceAgent:
             logger.info("Initializing Voice Agent...")
             
             # Check if processed data exists
-            processed_data_file = Path("processed_data/extracted_texts.json")
-            if not processed_data_file.exists():
+            if not self.pdf_processor.extracted_texts_path.exists():
                 logger.info("Processed data not found. Processing PDFs...")
                 self.pdf_processor.process_pdf_directory()
             
@@ -166,7 +166,7 @@ class VoiceAgent:
             return
         
         print("Voice Agent ready! Speak your query or type 'quit' to exit.")
-        speak("Voice Agent ready. How can I help you?")
+        self.playback.speak_async("Voice Agent ready. How can I help you?")
         
         while True:
             try:
@@ -182,9 +182,10 @@ class VoiceAgent:
                 # Process query
                 response = self.process_query(user_input)
                 
-                # Display and speak response
+                # Display and speak response; a new query supersedes an answer still playing
                 print(f"Response: {response}")
-                speak(response)
+                self.playback.interrupt()
+                self.playback.speak_async(response)
                 
             except KeyboardInterrupt:
                 print("\nExiting...")
@@ -192,6 +193,8 @@ class VoiceAgent:
             except Exception as e:
                 logger.error(f"Error in interactive mode: {e}")
                 print("I encountered an error. Please try again.")
+        
+        self.playback.close()
 
 def main():
     """Main entry point"""
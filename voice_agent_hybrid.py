@@ -14,6 +14,7 @@ from typing import Dict, List, Optional
 from pdf_processor import PDFProcessor
 from text_indexer import TextIndexer
 from tts_festival import speak  # Use Festival TTS for better quality
+from playback_queue import PlaybackQueue
 
 # Import the proven JTS decision engine
 sys.path.append('/Users/andrew/Library/Python/3.9/lib/python/site-packages')
@@ -26,6 +27,8 @@ class HybridVoiceAgent:
         self.pdf_processor = PDFProcessor()
         self.text_indexer = TextIndexer()
         self.jts_engine = JTSDecisionEngine()  # Use the proven decision engine
+        # Answers play while the next query is typed; Festival cannot be cut short mid-utterance
+        self.playback = PlaybackQueue(speak_fn=lambda text, cancel: speak(text))
         self.is_initialized = False
         
     def initialize(self) -> bool:
@@ -34,8 +37,7 @@ class HybridVoiceAgent:
             logger.info("Initializing Hybrid Voice Agent...")
             
             # Check if processed data exists
-            processed_data_file = Path("processed_data/extracted_texts.json")
-            if not processed_data_file.exists():
+            if not self.pdf_processor.extracted_texts_path.exists():
                 logger.info("Processed data not found. Processing PDFs...")
                 self.pdf_processor.process_pdf_directory()
             
@@ -186,7 +188,7 @@ class HybridVoiceAgent:
             return
         
         print("Hybrid Voice Agent ready! Speak your query or type 'quit' to exit.")
-        speak("Hybrid Voice Agent ready. How can I help you?")
+        self.playback.speak_async("Hybrid Voice Agent ready. How can I help you?")
         
         while True:
             try:
@@ -202,9 +204,10 @@ class HybridVoiceAgent:
                 # Process query
                 response = self.process_query(user_input)
                 
-                # Display and speak response
+                # Display and speak response; a new query supersedes an answer still playing
                 print(f"Response: {response}")
-                speak(response)
+                self.playback.interrupt()
+                self.playback.speak_async(response)
                 
             except KeyboardInterrupt:
                 print("\nExiting...")
@@ -212,6 +215,8 @@ class HybridVoiceAgent:
             except Exception as e:
                 logger.error(f"Error in interactive mode: {e}")
                 print("I encountered an error. Please try again.")
+        
+        self.playback.close()
 
 def main():
     """Main entry point"""